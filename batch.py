@@ -0,0 +1,317 @@
+# batch.py
+
+"""
+Headless batch rendering: run every image of a folder through one or more styles on the
+ComfyUI backends, then write the outputs and a throughput/latency report.
+
+    python batch.py INPUT_DIR [--styles clay "oil paint"] [--concurrency 4] [--output DIR]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from PySide6.QtGui import QImage
+
+from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper
+from comfy_classes.comfy_class_pool import ComfyBackendPool
+from prompts import dico_styles
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+# Jobs prepared ahead of the workers, per worker
+PREFETCH_PER_WORKER = 2
+
+
+def list_images(input_dir: str) -> List[str]:
+    """
+    Return the image files of input_dir, sorted by name.
+    """
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(input_dir, name))
+    )
+
+
+def output_path(output_dir: str, style: str, image_path: str) -> str:
+    """
+    Output path of image_path rendered in style, without extension.
+    """
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(output_dir, style.replace(' ', '_'), stem)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of values.
+    """
+    ordered = sorted(values)
+    index = min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered)))) - 1
+    return ordered[index]
+
+
+class BatchRunner:
+    """
+    Renders (image, style) jobs with a fixed number of workers sharing one backend pool.
+    A loader thread decodes the images ahead of the workers, so reading and decoding the next
+    inputs and uploading them overlap the renders already queued on ComfyUI.
+    """
+
+    def __init__(
+        self,
+        images: List[str],
+        styles: List[str],
+        output_dir: str,
+        concurrency: int = 1,
+        endpoints: Optional[List[str]] = None,
+        timeout_ms: Optional[int] = None,
+        skip_existing: bool = False
+    ) -> None:
+        """
+        Initialize the runner; nothing is submitted before run().
+        """
+        self.images = images
+        self.styles = styles
+        self.output_dir = output_dir
+        self.concurrency = max(1, concurrency)
+        self.timeout_ms = timeout_ms
+        self.skip_existing = skip_existing
+        self.pool = ComfyBackendPool(endpoints)
+        self.results: List[dict] = []
+        self._results_lock = threading.Lock()
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=self.concurrency * PREFETCH_PER_WORKER)
+        self._stop = threading.Event()
+        self._wrappers: List[ImageGeneratorAPIWrapper] = []
+
+    def _load(self) -> None:
+        """
+        Loader thread: decode each image once and queue one job per style.
+        """
+        try:
+            for path in self.images:
+                if self._stop.is_set():
+                    break
+                styles = [
+                    s for s in self.styles
+                    if not (self.skip_existing and self._existing_output(s, path))
+                ]
+                if not styles:
+                    continue
+                qimg = QImage(path)
+                if qimg.isNull():
+                    for style in styles:
+                        self._record({'image': path, 'style': style, 'status': 'error', 'error': 'unreadable image'})
+                    continue
+                for style in styles:
+                    if self._stop.is_set():
+                        break
+                    self._jobs.put((path, qimg, style))
+        finally:
+            for _ in range(self.concurrency):
+                self._jobs.put(None)
+
+    def _existing_output(self, style: str, image_path: str) -> bool:
+        """
+        True when image_path already has an output for style.
+        """
+        base = output_path(self.output_dir, style, image_path)
+        return any(os.path.exists(base + ext) for ext in IMAGE_EXTENSIONS)
+
+    def _work(self, wrapper: ImageGeneratorAPIWrapper) -> None:
+        """
+        Worker thread: render jobs until the loader signals the end.
+        """
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            path, qimg, style = job
+            if self._stop.is_set():
+                continue
+            result = {'image': path, 'style': style}
+            started = time.monotonic()
+            try:
+                if wrapper.qimg is not qimg:
+                    # Encoded and uploaded once per image, reused by the next styles of this worker
+                    wrapper.set_img(qimg)
+                wrapper.set_style(style)
+                wrapper.generate_image(timeout=self.timeout_ms)
+                target = output_path(self.output_dir, style, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                result['output'] = wrapper.save_result(target)
+                wrapper.delete_generated_image()
+                result['status'] = 'ok'
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = repr(e)
+                logger.info(f"[BatchRunner] {os.path.basename(path)} / {style} failed: {e!r}")
+            result['latency'] = round(time.monotonic() - started, 3)
+            result['backend'] = wrapper.backend.name
+            result['stages'] = {k: round(v, 3) for k, v in wrapper.stage_timings.items()}
+            self._record(result)
+
+    def _record(self, result: dict) -> None:
+        """
+        Store one job result and log the progress.
+        """
+        with self._results_lock:
+            self.results.append(result)
+            done = len(self.results)
+        total = len(self.images) * len(self.styles)
+        logger.info(
+            f"[BatchRunner] {done}/{total} {os.path.basename(result['image'])} / {result['style']}: "
+            f"{result['status']} ({result.get('latency', 0):.2f}s)"
+        )
+
+    def run(self) -> dict:
+        """
+        Render every job and return the report.
+        """
+        started = time.monotonic()
+        loader = threading.Thread(target=self._load, name="BatchLoader", daemon=True)
+        workers = []
+        for i in range(self.concurrency):
+            wrapper = ImageGeneratorAPIWrapper(pool=self.pool)
+            self._wrappers.append(wrapper)
+            workers.append(threading.Thread(target=self._work, args=(wrapper,), name=f"BatchWorker-{i}", daemon=True))
+        loader.start()
+        for t in workers:
+            t.start()
+        try:
+            for t in workers:
+                while t.is_alive():
+                    t.join(0.5)
+        except KeyboardInterrupt:
+            logger.info("[BatchRunner] Interrupted, cancelling the generations in flight.")
+            self.cancel()
+            for t in workers:
+                t.join(5)
+        finally:
+            wall = time.monotonic() - started
+            self.pool.close()
+        return self.report(wall)
+
+    def cancel(self) -> None:
+        """
+        Stop feeding jobs and cancel the generations in flight.
+        """
+        self._stop.set()
+        for wrapper in self._wrappers:
+            wrapper.cancel()
+
+    def report(self, wall: float) -> dict:
+        """
+        Summarize throughput, latency and per-stage timings of the finished jobs.
+        """
+        ok = [r for r in self.results if r['status'] == 'ok']
+        latencies = [r['latency'] for r in ok]
+        summary = {
+            'jobs': len(self.results),
+            'ok': len(ok),
+            'failed': len(self.results) - len(ok),
+            'wall_seconds': round(wall, 3),
+            'images_per_minute': round(len(ok) / wall * 60, 2) if wall > 0 else 0.0,
+        }
+        if latencies:
+            summary['latency'] = {
+                'mean': round(statistics.mean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p90': round(percentile(latencies, 90), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+            }
+        stages: Dict[str, List[float]] = {}
+        for r in ok:
+            for stage, seconds in r.get('stages', {}).items():
+                stages.setdefault(stage, []).append(seconds)
+        return {
+            'config': {
+                'images': len(self.images),
+                'styles': self.styles,
+                'concurrency': self.concurrency,
+                'backends': [b.name for b in self.pool.backends],
+            },
+            'summary': summary,
+            'stages_mean': {stage: round(statistics.mean(values), 3) for stage, values in stages.items()},
+            'backends': self.pool.stats(),
+            'jobs': sorted(self.results, key=lambda r: (r['image'], r['style'])),
+        }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command line.
+    """
+    parser = argparse.ArgumentParser(description="Render a folder of photos through PhotoBooth styles without the GUI.")
+    parser.add_argument('input_dir', help="folder containing the input photos")
+    parser.add_argument('--styles', nargs='+', default=list(dico_styles), metavar='STYLE',
+                        help=f"styles to render (default: all). Available: {', '.join(dico_styles)}")
+    parser.add_argument('--concurrency', '-j', type=int, default=2,
+                        help="jobs in flight at once (default: 2)")
+    parser.add_argument('--output', '-o', default=None,
+                        help="output folder (default: INPUT_DIR/batch_output)")
+    parser.add_argument('--endpoint', action='append', default=None, metavar='URL',
+                        help="ComfyUI HTTP URL, repeat for several backends (default: COMFY_BACKENDS)")
+    parser.add_argument('--timeout', type=int, default=None, metavar='MS',
+                        help="deadline per job in milliseconds (default: GENERATION_TIMEOUT_MS)")
+    parser.add_argument('--report', default=None,
+                        help="report file (default: OUTPUT/report.json)")
+    parser.add_argument('--skip-existing', action='store_true',
+                        help="skip (image, style) pairs that already have an output")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.styles if s not in dico_styles]
+    if unknown:
+        parser.error(f"unknown style(s): {', '.join(unknown)}")
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a folder: {args.input_dir}")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    output_dir = args.output or os.path.join(args.input_dir, 'batch_output')
+    images = list_images(args.input_dir)
+    if not images:
+        logger.error(f"No images found in {args.input_dir}")
+        return 2
+    os.makedirs(output_dir, exist_ok=True)
+
+    runner = BatchRunner(
+        images, args.styles, output_dir,
+        concurrency=args.concurrency,
+        endpoints=args.endpoint,
+        timeout_ms=args.timeout,
+        skip_existing=args.skip_existing
+    )
+    report = runner.run()
+    report_path = args.report or os.path.join(output_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report['summary']
+    print(f"{summary['ok']}/{summary['jobs']} jobs ok in {summary['wall_seconds']:.1f}s "
+          f"({summary['images_per_minute']:.2f} images/min)")
+    if 'latency' in summary:
+        lat = summary['latency']
+        print(f"latency mean {lat['mean']:.2f}s, p50 {lat['p50']:.2f}s, p90 {lat['p90']:.2f}s, "
+              f"p99 {lat['p99']:.2f}s, max {lat['max']:.2f}s")
+    if report['stages_mean']:
+        print("mean stage times: " + ", ".join(f"{k} {v:.2f}s" for k, v in report['stages_mean'].items()))
+    print(f"report written to {report_path}")
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
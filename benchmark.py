@@ -0,0 +1,202 @@
+# benchmark.py
+
+"""
+End-to-end client benchmark against the bundled mock ComfyUI server (no GPU needed).
+
+Measures, per generation:
+  - client overhead: wall time of generate_image minus the time the server spent executing
+  - time to first progress: from generate_image to the first progress_changed signal, and
+    from the server starting the prompt to that signal
+  - result to screen: from the server producing the image to the result painted in a QLabel
+    by the ImageGenerationThread -> finished signal path used by the GUI
+
+    python benchmark.py [--runs 20] [--steps 20] [--step-delay 0.0] [--style clay] [--json out.json]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QColor, QImage, QPixmap
+from PySide6.QtWidgets import QApplication, QLabel
+
+from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper
+from comfy_classes.comfy_class_mock import MockComfyServer
+from comfy_classes.comfy_class_workflow import workflow_registry
+from gui_classes.gui_manager.thread_manager import ImageGenerationThread
+from prompts import dico_styles
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of values.
+    """
+    ordered = sorted(values)
+    index = min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered)))) - 1
+    return ordered[index]
+
+
+def describe(values: List[float]) -> Dict[str, float]:
+    """
+    mean / p50 / p90 / max of values, in milliseconds.
+    """
+    if not values:
+        return {}
+    return {
+        'mean': round(statistics.mean(values) * 1000, 2),
+        'p50': round(percentile(values, 50) * 1000, 2),
+        'p90': round(percentile(values, 90) * 1000, 2),
+        'max': round(max(values) * 1000, 2),
+    }
+
+
+def with_steps(style: str, steps: Optional[int]) -> Optional[dict]:
+    """
+    Custom prompt of the style's workflow with every sampler set to steps (None keeps the workflow).
+    """
+    if steps is None:
+        return None
+    graph = {}
+    for nid, node in workflow_registry.get(style).graph.items():
+        if isinstance(node.get('inputs', {}).get('steps'), (int, float)):
+            node = {**node, 'inputs': {**node['inputs'], 'steps': steps}}
+        graph[nid] = node
+    return graph
+
+
+def bench_client(server: MockComfyServer, image: QImage, style: str, runs: int, steps: Optional[int]) -> dict:
+    """
+    Sequential generate_image calls: client overhead and time to first progress.
+    """
+    wrapper = ImageGeneratorAPIWrapper(style=style, qimg=image, endpoints=[server.endpoint])
+    mark = {'start': 0.0, 'first': None}
+
+    def on_progress(_: float) -> None:
+        if mark['first'] is None:
+            mark['first'] = time.monotonic()
+
+    wrapper.progress_changed.connect(on_progress, Qt.DirectConnection)
+    custom = with_steps(style, steps)
+    walls, overheads, to_first, transport = [], [], [], []
+    stages: Dict[str, List[float]] = {}
+    for i in range(runs + 1):
+        mark['first'] = None
+        mark['start'] = time.monotonic()
+        wrapper.generate_image(custom)
+        end = time.monotonic()
+        if i == 0:
+            # Warm-up: opens the WebSocket session and the HTTP keep-alive connection
+            continue
+        server_times = server.timings[wrapper.prompt_id]
+        walls.append(end - mark['start'])
+        overheads.append((end - mark['start']) - (server_times['finished'] - server_times['started']))
+        if mark['first'] is not None:
+            to_first.append(mark['first'] - mark['start'])
+            transport.append(mark['first'] - server_times['started'])
+        for stage, seconds in wrapper.stage_timings.items():
+            stages.setdefault(stage, []).append(seconds)
+    wrapper.close()
+    return {
+        'wall': describe(walls),
+        'client_overhead': describe(overheads),
+        'time_to_first_progress': describe(to_first),
+        'server_start_to_first_progress': describe(transport),
+        'stages': {stage: describe(values) for stage, values in stages.items()},
+    }
+
+
+def bench_screen(server: MockComfyServer, image: QImage, style: str, runs: int) -> dict:
+    """
+    Generations through ImageGenerationThread with a Qt event loop: result-to-screen latency.
+    """
+    app = QApplication.instance() or QApplication(sys.argv)
+    wrapper = ImageGeneratorAPIWrapper(endpoints=[server.endpoint])
+    label = QLabel()
+    label.resize(image.width(), image.height())
+    label.show()
+    latencies: List[float] = []
+    state = {'run': 0, 'task': None}
+
+    def start_next() -> None:
+        if state['run'] > runs:
+            app.quit()
+            return
+        task = ImageGenerationThread(style=style, input_image=image, api=wrapper)
+        task.finished.connect(on_finished)
+        state['task'] = task
+        task.start()
+
+    def on_finished(qimg: QImage) -> None:
+        if qimg is not None and not qimg.isNull():
+            label.setPixmap(QPixmap.fromImage(qimg))
+            label.repaint()
+        shown = time.monotonic()
+        server_times = server.timings.get(wrapper.prompt_id, {})
+        ready = server_times.get('result')
+        if state['run'] > 0 and ready is not None:
+            latencies.append(shown - ready)
+        state['run'] += 1
+        QTimer.singleShot(0, start_next)
+
+    QTimer.singleShot(0, start_next)
+    app.exec()
+    label.close()
+    wrapper.close()
+    return {'result_to_screen': describe(latencies)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ComfyUI client path against a mock server.")
+    parser.add_argument('--runs', type=int, default=20, help="measured generations per scenario (default: 20)")
+    parser.add_argument('--style', default=next(iter(dico_styles)), choices=list(dico_styles))
+    parser.add_argument('--steps', type=int, default=None, help="override the sampler steps of the workflow")
+    parser.add_argument('--step-delay', type=float, default=0.0, help="mock seconds per sampler step (default: 0)")
+    parser.add_argument('--node-delay', type=float, default=0.0, help="mock seconds per other node (default: 0)")
+    parser.add_argument('--size', type=int, nargs=2, default=(1280, 720), metavar=('W', 'H'), help="input image size")
+    parser.add_argument('--json', default=None, help="write the results to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    server = MockComfyServer(step_delay=args.step_delay, default_node_delay=args.node_delay).start()
+    image = QImage(args.size[0], args.size[1], QImage.Format_RGB888)
+    image.fill(QColor(40, 90, 160))
+    try:
+        results = {
+            'config': {
+                'runs': args.runs, 'style': args.style, 'steps': args.steps,
+                'step_delay': args.step_delay, 'node_delay': args.node_delay, 'size': list(args.size),
+            },
+            'client': bench_client(server, image, args.style, args.runs, args.steps),
+            'screen': bench_screen(server, image, args.style, args.runs),
+        }
+    finally:
+        server.stop()
+
+    for section in ('client', 'screen'):
+        for name, stats in results[section].items():
+            if name == 'stages':
+                for stage, s in stats.items():
+                    print(f"  stage {stage:<22} mean {s['mean']:8.2f} ms  p50 {s['p50']:8.2f}  p90 {s['p90']:8.2f}  max {s['max']:8.2f}")
+            elif stats:
+                print(f"{name:<30} mean {stats['mean']:8.2f} ms  p50 {stats['p50']:8.2f}  p90 {stats['p90']:8.2f}  max {stats['max']:8.2f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,129 @@
-import glob
-import json
 import os
-import random
 import time
 import shutil
-from typing import List, Optional
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
 
 import requests
-from websocket import WebSocketConnectionClosedException, WebSocketTimeoutException, create_connection
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRect, Signal
 from PySide6.QtGui import QImage
 
-import traceback
-from websocket import WebSocketConnectionClosedException, WebSocketTimeoutException, create_connection
-
 import logging
 logger = logging.getLogger(__name__)
 
 from constant import DEBUG, DEBUG_FULL
 DEBUG_ImageGeneratorAPIWrapper = DEBUG
 from constant import (
-    WS_URL, HTTP_BASE_URL, BASE_DIR, OUTPUT_IMAGE_PATH, INPUT_IMAGE_PATH, COMFY_WORKFLOW_DIR,
-    PHOTOBOOTH_SAVED_FOLDER, KEEP_INPUT_IMAGE
+    BASE_DIR, OUTPUT_IMAGE_PATH,
+    PHOTOBOOTH_SAVED_FOLDER, KEEP_INPUT_IMAGE, COMFY_CONNECT_TIMEOUT, COMFY_HTTP_TIMEOUT,
+    COMFY_HISTORY_RETRY_INTERVAL, INPUT_IMAGE_FORMAT, INPUT_IMAGE_QUALITY, COMFY_UPLOAD_TYPE,
+    COMFY_OUTPUT_MODE, PREVIEW_MODE, PREVIEW_MAX_FPS, GENERATION_TIMEOUT_MS, FACE_CROP_ENABLED
 )
 from prompts import dico_styles
+from comfy_classes.comfy_class_session import ComfySession, PromptHandle, decode_binary_frame
+from comfy_classes.comfy_class_pool import BackendUnavailableError, ComfyBackend, ComfyBackendPool
+from comfy_classes.comfy_class_workflow import CompiledWorkflow, workflow_registry
+from comfy_classes.comfy_class_progress import PromptProgress, node_weights
+from comfy_classes.comfy_class_watchdog import GenerationTimeoutError, GenerationWatchdog
+from comfy_classes.comfy_class_face import crop_to_faces
+
+class GenerationCancelledError(Exception):
+    """
+    Raised by generate_image when cancel() stopped the generation.
+    """
 
-TOTAL_STEPS: dict[str, float] = {}
-TOTAL_STEPS_SUM: float = 0
-PROGRESS_ACCUM: dict[str, float] = {}
 
 class ImageGeneratorAPIWrapper(QObject):
     progress_changed = Signal(float)
-
-    def __init__(self, style: Optional[str] = None, qimg: Optional[QImage] = None) -> None:
+    preview_changed = Signal(QImage)
+
+    def __init__(
+        self,
+        style: Optional[str] = None,
+        qimg: Optional[QImage] = None,
+        endpoints: Optional[list] = None,
+        pool: Optional[ComfyBackendPool] = None
+    ) -> None:
         """
-        Initialize the ImageGeneratorAPIWrapper with an optional style and input QImage.
+        Initialize the ImageGeneratorAPIWrapper with an optional style, input QImage and
+        list of ComfyUI endpoints (defaults to COMFY_BACKENDS), or an existing pool to share.
         """
         super().__init__()
         os.makedirs(OUTPUT_IMAGE_PATH, exist_ok=True)
         if DEBUG_ImageGeneratorAPIWrapper:
             logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Initializing with style={style}")
-        self.server_url = HTTP_BASE_URL
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else ComfyBackendPool(endpoints)
+        self.backend: ComfyBackend = self.pool.backends[0]
+        self.server_url = self.backend.http_url
+        self._http = self.backend.http
         self._styles_prompts = dico_styles
         self._output_folder = OUTPUT_IMAGE_PATH
-        self._workflow_dir = COMFY_WORKFLOW_DIR
         self._style = style if style in self._styles_prompts else next(iter(self._styles_prompts))
         self.generated_image_path = None
         self.qimg = None
-
-        path = self.find_json_by_name(self._workflow_dir, self._style)
-        with open(path, encoding='utf-8') as f:
-            self._base_prompt = json.load(f)
-
-        global TOTAL_STEPS, TOTAL_STEPS_SUM
-        TOTAL_STEPS = {
-            nid: node['inputs']['steps']
-            for nid, node in self._base_prompt.items()
-            if isinstance(node.get('inputs', {}).get('steps'), (int, float))
-        }
-        TOTAL_STEPS_SUM = sum(TOTAL_STEPS.values())
+        self.prompt_id: Optional[str] = None
+        self.result_image: Optional[QImage] = None
+        self._result_bytes: Optional[bytes] = None
+        self._result_filename: Optional[str] = None
+        self._output_mode = COMFY_OUTPUT_MODE
+        self._ws_save_nodes: set = set()
+        self._preview_interval = 1.0 / PREVIEW_MAX_FPS if PREVIEW_MAX_FPS > 0 else 0.0
+        self._last_preview = 0.0
+        self._input_bytes: Optional[bytes] = None
+        self._input_name: Optional[str] = None
+        self._input_ref: Optional[str] = None
+        self._input_refs: Dict[str, str] = {}
+        # Size the input was cropped and resized to for the workflow, None when sent as captured
+        self._input_size: Optional[Tuple[int, int]] = None
+        self.input_faces: List[QRect] = []
+
+        self._workflow: CompiledWorkflow = workflow_registry.get(self._style)
+        self._progress: Optional[PromptProgress] = None
+        self._active_lock = threading.Lock()
+        self._active: Dict[str, tuple] = {}
+        # Set by cancel() and kept until the run it stops ends, so a cancel that arrives before
+        # the prompt is submitted still stops it; cleared when a new job is set up by set_img()
+        self._cancel_requested = False
+        # True once the submitted prompt started executing (it is no longer just queued)
+        self.execution_started = False
+        # Submit at the head of the ComfyUI queue (ahead of speculative renders)
+        self.front = False
+        self._watchdog: Optional[GenerationWatchdog] = None
+        self.last_timeout_stage: Optional[str] = None
+        self.stage_timings: Dict[str, float] = {}
 
         self._negative_prompt = 'watermark, text'
         if qimg is not None:
             self.set_img(qimg)
             self.qimg = qimg
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Initialized. Total steps sum = {TOTAL_STEPS_SUM}")
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Initialized with workflow {self._workflow.name}")
             
     def set_img(self, qimg: QImage) -> None:
         """
-        Set the input image for the workflow by saving the provided QImage.
+        Set the input image for the workflow, encoding it in memory under a unique upload name.
+        With FACE_CROP_ENABLED it is first cropped around the faces to the workflow's sampling size.
+        This sets up a new job: a cancel() of the previous one no longer applies.
         """
+        with self._active_lock:
+            self._cancel_requested = False
         self.qimg = qimg
         if DEBUG_ImageGeneratorAPIWrapper:
             logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Setting input image.")
-        self.save_qimage(os.path.dirname(INPUT_IMAGE_PATH), qimg)
+        image = qimg
+        self._input_size = self._workflow.sampling_size if FACE_CROP_ENABLED else None
+        self.input_faces = []
+        if self._input_size is not None:
+            image, self.input_faces = crop_to_faces(qimg, self._input_size)
+        self._input_bytes = self.encode_qimage(image)
+        ext = INPUT_IMAGE_FORMAT.lower()
+        self._input_name = f"photobooth_{uuid.uuid4().hex}.{'jpg' if ext == 'jpeg' else ext}"
+        self._input_ref = None
+        self._input_refs = {}
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Input image set at {INPUT_IMAGE_PATH}")
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Input image encoded as {self._input_name} ({len(self._input_bytes)} bytes)")
 
     def set_style(self, style: str) -> None:
         """
@@ -87,49 +134,15 @@ class ImageGeneratorAPIWrapper(QObject):
         if style not in self._styles_prompts:
             raise ValueError(f"Style '{style}' not found.")
         self._style = style
-        path = self.find_json_by_name(self._workflow_dir, self._style)
-        with open(path, encoding='utf-8') as f:
-            self._base_prompt = json.load(f)
-
-        global TOTAL_STEPS, TOTAL_STEPS_SUM
-        TOTAL_STEPS = {
-            nid: node['inputs']['steps']
-            for nid, node in self._base_prompt.items()
-            if isinstance(node.get('inputs', {}).get('steps'), (int, float))
-        }
-        TOTAL_STEPS_SUM = sum(TOTAL_STEPS.values())
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Style set to {style}. Total steps = {TOTAL_STEPS_SUM}")
-        
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Workflow reloaded for style {style}.")
-
-    @staticmethod
-    def find_json_by_name(directory: str, name: str) -> str:
-        """
-        Find and return the path to the workflow JSON file by style name.
-        """
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Searching for JSON file for style '{name}' in {directory}")
-        target = f"{name}.json"
-        default = "default.json"
-        found_default = None
-        for fname in os.listdir(directory):
-            if fname.endswith('.json'):
-                if fname == target:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Found JSON: {fname}")
-                    return os.path.join(directory, fname)
-                if fname == default:
-                    found_default = os.path.join(directory, fname)
-        if found_default:
-            if DEBUG_ImageGeneratorAPIWrapper:
-                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Using default JSON: {found_default}")
-            return found_default
+        self._workflow = workflow_registry.get(style)
+        if (
+            FACE_CROP_ENABLED and self.qimg is not None and self._input_bytes is not None
+            and self._workflow.sampling_size != self._input_size
+        ):
+            # The input was prepared for another sampling size
+            self.set_img(self.qimg)
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] No JSON found for style '{name}', raising FileNotFoundError")
-        raise FileNotFoundError(f"No JSON found for {name}")
-    
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Style set to {style} (workflow {self._workflow.name}).")
 
     def delete_generated_image(self) -> None:
         """
@@ -150,269 +163,437 @@ class ImageGeneratorAPIWrapper(QObject):
         Prepare the full prompt dictionary with all required inputs set.
         """
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Preparing prompt with custom_prompt={custom_prompt}")
-        prompt = json.loads(json.dumps(custom_prompt or self._base_prompt))
-        for nid, node in prompt.items():
-            ctype = node.get('class_type', '')
-            inputs = node.setdefault('inputs', {})
-            if DEBUG_ImageGeneratorAPIWrapper:
-                logger.info(f"[DEBUG][DEBUG_ImageGeneratorAPIWrapper] Treatment node {nid} ({ctype})")
-                
-            if ctype.lower().replace(' ', '') in ('textmultiline', 'textmultilinewidget', 'textmultilineprompt') or ctype in ('Text Multiline', 'TextMultiLine'):
-                if DEBUG_ImageGeneratorAPIWrapper:
-                    logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Remplacement inputs['text'] pour node {nid} (Text Multiline)")
-
-                inputs['text'] = self._styles_prompts[self._style]
-            elif ctype in ('KSampler', 'KSampler (Efficient)'):
-                inputs['seed'] = random.randint(0, 2**32 - 1)
-                
-                if 'preview_method' in inputs:
-                    old_preview = inputs['preview_method']
-                    inputs['preview_method'] = 'auto'
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Changed preview_method for node {nid} from {old_preview} to 'auto'")
-            elif ctype == 'LoadImage':
-                inputs['image'] = INPUT_IMAGE_PATH
-            elif ctype == 'SaveImage':
-                inputs['filename_prefix'] = 'output'
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info("[DEBUG_ImageGeneratorAPIWrapper] Prompt sent:")
-            logger.info(json.dumps(prompt, indent=2, ensure_ascii=False))
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Preparing prompt with custom_prompt={custom_prompt is not None}")
+        workflow = CompiledWorkflow('custom', custom_prompt) if custom_prompt else self._workflow
+        prompt, self._ws_save_nodes = workflow.build(
+            self._styles_prompts[self._style],
+            self._input_ref,
+            self._output_mode,
+            latent_size=self._input_size
+        )
         if DEBUG_ImageGeneratorAPIWrapper:
             logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Prepared prompt for generation: {prompt}")
         return prompt
 
+    def get_session(self) -> ComfySession:
+        """
+        Return the long-lived ComfyUI session of the current backend, starting it on first use.
+        """
+        return self.backend.get_session()
 
-    def generate_image(self, custom_prompt: Optional[dict] = None, timeout: int = 30000) -> None:
+    def close(self) -> None:
         """
-        Generate an image synchronously, blocking until completion.
+        Close the ComfyUI sessions and release their reader threads.
         """
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG] Starting image generation…")
-
-        # Get the list of images before generation
-        images_before = self.get_image_paths()
-
-        prompt = self._prepare_prompt(custom_prompt)
-
-
-        ws = create_connection(WS_URL, timeout=None)
-        ws.settimeout(None)
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Closing ComfyUI sessions.")
+        if self._owns_pool:
+            self.pool.close()
 
+    def _use_backend(self, backend: ComfyBackend) -> None:
+        """
+        Route the next requests of this wrapper to backend.
+        """
+        self.backend = backend
+        self.server_url = backend.http_url
+        self._http = backend.http
+        self._input_ref = self._input_refs.get(backend.http_url)
 
-        import threading
-        def _keep_alive():
+    def generate_image(self, custom_prompt: Optional[dict] = None, timeout: Optional[int] = None) -> None:
+        """
+        Generate an image synchronously on the least-loaded backend, blocking until completion.
+        If the backend dies, the job is resubmitted to the next one.
+        timeout is the overall deadline in milliseconds (GENERATION_TIMEOUT_MS by default); each
+        stage is also bounded by GENERATION_STAGE_TIMEOUTS and raises GenerationTimeoutError on breach.
+        """
+        if DEBUG_ImageGeneratorAPIWrapper:
+            logger.info(f"[DEBUG] Starting image generation…")
+        self.last_timeout_stage = None
+        watchdog = GenerationWatchdog((timeout or GENERATION_TIMEOUT_MS) / 1000.0, self._on_deadline)
+        self._watchdog = watchdog
+        watchdog.start('connect')
+        tried: List[ComfyBackend] = []
+        try:
+            self._raise_if_stopped()
             while True:
+                backend = self.pool.select(exclude=tried)
+                self._use_backend(backend)
+                watchdog.stage('connect')
                 try:
-                    ws.ping()
+                    self._generate_on_backend(custom_prompt, watchdog)
+                    return
+                except (BackendUnavailableError, requests.ConnectionError, requests.Timeout) as e:
+                    self._raise_if_stopped(e)
+                    backend.mark_failed()
+                    tried.append(backend)
                     if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info("[DEBUG][KEEPALIVE] ping sent successfully.")
-                except Exception as e:
-                    logger.info(f"[DEBUG][KEEPALIVE] Exception ping: {e!r}")
-                    break
-                time.sleep(15)
-        threading.Thread(target=_keep_alive, daemon=True).start()
+                        logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Backend {backend.name} failed ({e!r}), failing over")
+                    if len(tried) >= len(self.pool.backends):
+                        raise
+        finally:
+            # Waits for a breach callback in progress, so its cancel() cannot land after the reset
+            watchdog.stop()
+            # The cancel (or deadline) that stopped this run has been served
+            with self._active_lock:
+                self._cancel_requested = False
+            self.stage_timings = dict(watchdog.timings)
+            if DEBUG_ImageGeneratorAPIWrapper:
+                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Stage timings: { {k: round(v, 3) for k, v in self.stage_timings.items()} }")
 
+    def _generate_on_backend(self, custom_prompt: Optional[dict], watchdog: GenerationWatchdog) -> None:
+        """
+        Upload the input, submit the prompt and wait for its result on the current backend.
+        """
+        self.prompt_id = None
+        self.result_image = None
+        self._result_bytes = None
+        self._result_filename = None
+        self.generated_image_path = None
+        self.execution_started = False
 
-        welcome = ws.recv()
-        try:
-            welcome_data = json.loads(welcome)
-        except Exception:
-            welcome_data = {}
-        client_id = welcome_data.get('data', {}).get('sid') or welcome_data.get('data', {}).get('client_id')
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG] Received welcome, client_id={client_id!r}")
+        session = self.get_session()
+        if not session.wait_connected(min(COMFY_CONNECT_TIMEOUT, watchdog.remaining())):
+            raise BackendUnavailableError(f"Cannot connect to ComfyUI at {session.ws_url}")
 
+        self._raise_if_stopped()
+        self.upload_input_image()
+        prompt = self._prepare_prompt(custom_prompt)
+        # Last chance to drop the job before it reaches the GPU queue
+        self._raise_if_stopped()
 
-        payload = {'client_id': client_id, 'prompt': prompt, 'outputs': [['8', 0]], 'force': True}
-        resp = requests.post(f"{self.server_url}/prompt", json=payload)
+        payload = {'client_id': session.client_id, 'prompt': prompt}
+        if self.front:
+            payload['front'] = True
+        resp = self._http.post(f"{self.server_url}/prompt", json=payload, timeout=COMFY_HTTP_TIMEOUT)
         resp.raise_for_status()
+        prompt_id = resp.json().get('prompt_id')
+        self.prompt_id = prompt_id
+        watchdog.stage('queue')
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info("[DEBUG] Prompt sent via HTTP.")
+            logger.info(f"[DEBUG] Prompt sent to {self.backend.name}, prompt_id={prompt_id!r}")
+
+        progress = PromptProgress(prompt_id, node_weights(prompt))
+        self._progress = progress
+        handle = session.register(prompt_id)
+        backend = self.backend
+        with self._active_lock:
+            self._active[prompt_id] = (backend, handle)
+            cancelled = self._cancel_requested
+        if cancelled:
+            handle.close('cancelled')
+            self._cancel_remote(backend, prompt_id)
+        backend.job_started()
+        started = time.monotonic()
+        success = False
+        try:
+            success = self._consume_events(handle, progress, watchdog)
+        finally:
+            session.unregister(prompt_id)
+            with self._active_lock:
+                self._active.pop(prompt_id, None)
+            backend.job_finished(time.monotonic() - started if success else None)
 
+        self._raise_if_stopped()
 
-        MAX_LOG_LEN = 500
-        try:
-            while True:
-                if DEBUG_ImageGeneratorAPIWrapper:
-                    logger.info(f"[DEBUG] Before ws.recv() — connected={ws.connected}")
-                try:
-                    msg = ws.recv()
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] After ws.recv() — connected={ws.connected}, raw type: {type(msg).__name__}")
-                except WebSocketTimeoutException:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info("[DEBUG] WebSocketTimeoutException: no message, we continue.")
-                    continue
-                except WebSocketConnectionClosedException as e:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] WebSocketConnectionClosedException: {e!r}")
-                        traceback.logger.info_exc()
-                    break
-                except Exception as e:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] Unexpected exception on ws.recv(): {type(e).__name__}: {e!r}")
-                        traceback.logger.info_exc()
-                    traceback.logger.info_exc()
-                    break
+        if success and self.result_image is None:
+            watchdog.stage('fetch')
+            try:
+                self._fetch_result(prompt_id, watchdog.remaining())
+            except TimeoutError as e:
+                self.last_timeout_stage = 'fetch'
+                raise GenerationTimeoutError('fetch') from e
+            if self.result_image is None:
+                self._raise_if_stopped()
+
+    def _on_deadline(self, stage: str) -> None:
+        """
+        Watchdog callback: remember the stage that overran and cancel the generation.
+        """
+        self.last_timeout_stage = stage
+        self.cancel()
+
+    def _raise_if_stopped(self, cause: Optional[BaseException] = None) -> None:
+        """
+        Raise GenerationTimeoutError or GenerationCancelledError if the job was stopped.
+        """
+        if self.last_timeout_stage is not None:
+            raise GenerationTimeoutError(self.last_timeout_stage) from cause
+        if self._cancel_requested:
+            raise GenerationCancelledError(f"Generation {self.prompt_id} cancelled") from cause
 
+    def cancel(self) -> None:
+        """
+        Cancel the generations in flight: unblock their event loops now, then remove them
+        from the ComfyUI queue or interrupt them in the background.
+        """
+        if DEBUG_ImageGeneratorAPIWrapper:
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Cancelling generation(s).")
+        with self._active_lock:
+            self._cancel_requested = True
+            jobs = list(self._active.items())
+        for prompt_id, (backend, handle) in jobs:
+            handle.close('cancelled')
+            threading.Thread(
+                target=self._cancel_remote, args=(backend, prompt_id),
+                name=f"ComfyCancel-{prompt_id[:8]}", daemon=True
+            ).start()
 
-                if isinstance(msg, (bytes, bytearray)):
-                    continue
-                
-                if len(msg) > MAX_LOG_LEN:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        snippet = msg[:MAX_LOG_LEN].replace('\n', '\\n')
-                        logger.info(f"[DEBUG] msg too long, snippet:\n{snippet}…")
-                else:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] Message text received ({len(msg)} chars.)")
+    @staticmethod
+    def _cancel_remote(backend: ComfyBackend, prompt_id: str) -> None:
+        """
+        Delete prompt_id from the pending queue of backend, and interrupt it if it is already running.
+        """
+        try:
+            backend.http.post(f"{backend.http_url}/queue", json={'delete': [prompt_id]}, timeout=COMFY_HTTP_TIMEOUT)
+            resp = backend.http.get(f"{backend.http_url}/queue", timeout=COMFY_HTTP_TIMEOUT)
+            resp.raise_for_status()
+            running = [item[1] for item in resp.json().get('queue_running', []) if len(item) > 1]
+            if prompt_id in running:
+                # prompt_id limits the interrupt to our job on servers that support it
+                backend.http.post(f"{backend.http_url}/interrupt", json={'prompt_id': prompt_id}, timeout=COMFY_HTTP_TIMEOUT)
+            if DEBUG_ImageGeneratorAPIWrapper:
+                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Cancelled {prompt_id} on {backend.name} (was running: {prompt_id in running})")
+        except (requests.RequestException, ValueError) as e:
+            logger.info(f"[ImageGeneratorAPIWrapper] Failed to cancel {prompt_id} on {backend.name}: {e!r}")
 
+    def _fetch_result(self, prompt_id: str, timeout: float = COMFY_HTTP_TIMEOUT) -> None:
+        """
+        Look up the saved output of prompt_id in /history and download it from /view.
+        """
+        if DEBUG_ImageGeneratorAPIWrapper:
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Fetching result of prompt_id={prompt_id}")
+        images = self._get_history_images(prompt_id, timeout)
+        if not images:
+            if DEBUG_ImageGeneratorAPIWrapper:
+                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] No output image in history for {prompt_id}")
+            return
+        info = images[-1]
+        resp = self._http.get(
+            f"{self.server_url}/view",
+            params={'filename': info['filename'], 'subfolder': info.get('subfolder', ''), 'type': info.get('type', 'output')},
+            timeout=COMFY_HTTP_TIMEOUT
+        )
+        resp.raise_for_status()
+        qimg = QImage.fromData(resp.content)
+        if qimg.isNull():
+            raise ValueError(f"ComfyUI returned an undecodable image for {info['filename']}")
+        self._set_result(resp.content, info['filename'], qimg)
+
+        # Only meaningful when ComfyUI shares our filesystem; used by delete/move.
+        local = os.path.join(self._output_folder, info.get('subfolder', ''), info['filename'])
+        self.generated_image_path = local if os.path.exists(local) else None
+        if DEBUG_ImageGeneratorAPIWrapper:
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Fetched {info['filename']} ({len(resp.content)} bytes), local path={self.generated_image_path}")
 
-                try:
-                    data = json.loads(msg)
-                except json.JSONDecodeError:
-                    continue
-
-                t = data.get('type', '')
-                d = data.get('data', {})
-                node = d.get('node')
-
-                if t == 'progress' and node in TOTAL_STEPS:
-                    raw = d.get('value', 0)
-                    max_steps = TOTAL_STEPS[node]
-                    PROGRESS_ACCUM[node] = raw
-                    done = sum(PROGRESS_ACCUM.values())
-                    pct = done / TOTAL_STEPS_SUM * 100 if TOTAL_STEPS_SUM else 0
-                    self.progress_changed.emit(pct)
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG][PROG] {pct:.2f}% — node {node}: {raw}/{max_steps}")
-                elif t == 'progress':
+    def _set_result(self, data: bytes, filename: str, qimg: QImage) -> None:
+        """
+        Store the encoded result and its decoded QImage.
+        """
+        self._result_bytes = data
+        self._result_filename = filename
+        self.result_image = qimg
 
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] Ignored progress for unknown node {node!r}")
-                    continue
+    def _get_history_entry(self, prompt_id: str) -> Optional[dict]:
+        """
+        Return the /history entry of prompt_id, or None while it is not finished.
+        """
+        resp = self._http.get(f"{self.server_url}/history/{prompt_id}", timeout=COMFY_HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json().get(prompt_id)
 
-                elif t.lower() in ('done', 'execution_success', 'execution_complete', 'execution_end'):
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG][EVENT] GGeneration terminated (type={t})")
-                    break
+    def _get_history_images(self, prompt_id: str, timeout: float) -> List[dict]:
+        """
+        Return the 'output' type images listed in /history/<prompt_id>, retrying until the entry exists.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = self._get_history_entry(prompt_id)
+            if entry is not None:
+                images = []
+                for node_output in entry.get('outputs', {}).values():
+                    for info in node_output.get('images', []):
+                        if info.get('type', 'output') == 'output':
+                            images.append(info)
+                return images
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"No history entry for prompt {prompt_id}")
+            time.sleep(COMFY_HISTORY_RETRY_INTERVAL)
+
+    def _consume_events(self, handle: PromptHandle, progress: PromptProgress, watchdog: Optional[GenerationWatchdog] = None) -> bool:
+        """
+        Read the event stream of one prompt until it completes, emitting progress.
+        Returns True when the prompt executed successfully.
+        """
+        while True:
+            t, d = handle.get()
+            if t in ('execution_start', 'execution_cached', 'executing', 'progress'):
+                self.execution_started = True
+                if watchdog is not None:
+                    watchdog.stage('execution')
+            if t == 'binary':
+                if progress.executing in self._ws_save_nodes:
+                    self._on_result_frame(d)
+                elif PREVIEW_MODE != 'off':
+                    self._on_preview_frame(d)
+                continue
+
+            pct = progress.update(t, d)
+            if pct is not None:
+                self.progress_changed.emit(pct)
+                if DEBUG_ImageGeneratorAPIWrapper:
+                    logger.info(f"[DEBUG][PROG] {pct:.2f}% — {t} node {d.get('node')}")
 
-                elif t == 'execution_error':
-                    self.progress_changed.emit(100.0)
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG] Failed to generate image: Face not detected")
-                    break
+            if t == 'execution_success' or (t == 'executing' and d.get('node') is None):
+                if DEBUG_ImageGeneratorAPIWrapper:
+                    logger.info(f"[DEBUG][EVENT] Generation terminated (type={t})")
+                return True
 
-        finally:
-            code = getattr(getattr(ws, 'sock', None), 'close_code', None)
-            reason = getattr(getattr(ws, 'sock', None), 'close_reason', None)
-            if DEBUG_ImageGeneratorAPIWrapper:
-                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Before closing ws — connected={ws.connected}, close_code={code}, close_reason={reason!r}")
-            ws.close()
-            if DEBUG_ImageGeneratorAPIWrapper:
-                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] After ws.close() — connected={ws.connected}")
+            elif t in ('execution_error', 'execution_interrupted'):
+                if DEBUG_ImageGeneratorAPIWrapper:
+                    logger.info(f"[DEBUG] Failed to generate image ({t}): {d.get('exception_message', 'Face not detected')}")
+                return False
 
-        # After generation, find the new image
-        images_after = self.get_image_paths()
-        new_images = [p for p in images_after if p not in images_before]
-        if new_images:
-            self.generated_image_path = new_images[-1]
-            if DEBUG_ImageGeneratorAPIWrapper:
-                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] New image generated at: {self.generated_image_path}")
+            elif t == 'disconnected':
+                # Socket dropped: keep waiting if the server still answers, fail over otherwise
+                if not self.backend.check_health():
+                    raise BackendUnavailableError(f"ComfyUI backend {self.backend.name} went down during generation")
 
+            elif t == 'reconnected':
+                # Events sent while we were offline are lost; the prompt may already be done
+                if self._get_history_entry(handle.prompt_id) is not None:
+                    return True
 
+            elif t == 'closed':
+                if DEBUG_ImageGeneratorAPIWrapper:
+                    logger.info(f"[DEBUG] Event stream closed: {d.get('reason')}")
+                return False
 
-    def get_progress_percentage(self) -> float:
+    def _on_preview_frame(self, frame: bytes) -> None:
         """
-        Get the current global progress percentage.
+        Decode a sampler preview frame and emit it, dropping frames above PREVIEW_MAX_FPS.
         """
+        now = time.monotonic()
+        if now - self._last_preview < self._preview_interval:
+            return
+        _, fmt, data = decode_binary_frame(frame)
+        if fmt is None:
+            return
+        qimg = QImage.fromData(data)
+        if qimg.isNull():
+            return
+        self._last_preview = now
+        self.preview_changed.emit(qimg)
+
+    def _on_result_frame(self, frame: bytes) -> None:
+        """
+        Build the result QImage from a binary frame emitted by the SaveImageWebsocket node.
+        """
+        _, fmt, data = decode_binary_frame(frame)
+        if fmt is None:
+            return
+        qimg = QImage.fromData(data)
+        if qimg.isNull():
+            if DEBUG_ImageGeneratorAPIWrapper:
+                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Undecodable {fmt} frame from save node ({len(data)} bytes)")
+            return
+        self._set_result(data, 'output.jpg' if fmt == 'JPEG' else 'output.png', qimg)
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Getting progress percentage.")
-        done = sum(PROGRESS_ACCUM.values())
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Progress done: {done}, Total steps sum: {TOTAL_STEPS_SUM}")
-        return (done / TOTAL_STEPS_SUM * 100) if TOTAL_STEPS_SUM else 0.0
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Result received over WebSocket ({fmt}, {len(data)} bytes)")
 
-    def get_image_paths(self) -> List[str]:
+    def get_progress_percentage(self) -> float:
         """
-        Get a sorted list of generated image file paths.
+        Get the progress percentage of the last submitted prompt.
         """
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Getting image paths from output folder: {self._output_folder}")
-        return sorted(
-            glob.glob(os.path.join(self._output_folder, '*.png')),
-            key=os.path.getmtime
-        )
+        return self._progress.percent if self._progress is not None else 0.0
 
-    def save_qimage(self, directory: str, image: QImage) -> None:
+    @staticmethod
+    def encode_qimage(image: QImage, fmt: str = INPUT_IMAGE_FORMAT, quality: int = INPUT_IMAGE_QUALITY) -> bytes:
         """
-        Save a QImage to the specified directory as 'input.png'.
+        Encode a QImage in memory with the given format and quality.
         """
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Saving QImage to {directory}/input.png")
         if image.isNull():
-            raise ValueError("QImage is empty, cannot save.")
-        
-        os.makedirs(directory, exist_ok=True)
-        save_path = os.path.join(directory, "input.png")
-        success = image.save(save_path)
-        
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Image saved at: {save_path if success else 'Save failed'}")
-        
+            raise ValueError("QImage is empty, cannot encode.")
+        data = QByteArray()
+        buf = QBuffer(data)
+        buf.open(QIODevice.WriteOnly)
+        success = image.save(buf, fmt, quality)
+        buf.close()
         if not success:
-            raise IOError(f"Backup failed for image at {save_path}")
+            raise IOError(f"Encoding image as {fmt} failed")
+        return bytes(data)
+
+    def upload_input_image(self) -> str:
+        """
+        Post the encoded input image to /upload/image and return the name to use in LoadImage.
+        """
+        if self._input_bytes is None:
+            raise ValueError("No input image set, call set_img first.")
+        if self._input_ref is not None:
+            return self._input_ref
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Image saved successfully at {save_path}")
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Uploading {self._input_name} to {self.server_url}/upload/image")
+        mime = 'image/jpeg' if INPUT_IMAGE_FORMAT.upper() in ('JPG', 'JPEG') else f"image/{INPUT_IMAGE_FORMAT.lower()}"
+        resp = self._http.post(
+            f"{self.server_url}/upload/image",
+            files={'image': (self._input_name, self._input_bytes, mime)},
+            data={'type': COMFY_UPLOAD_TYPE, 'overwrite': 'true'},
+            timeout=COMFY_HTTP_TIMEOUT
+        )
+        resp.raise_for_status()
+        info = resp.json()
+        ref = f"{info['subfolder']}/{info['name']}" if info.get('subfolder') else info['name']
+        if info.get('type', 'input') != 'input':
+            # LoadImage resolves "name [temp]" / "name [output]" annotations outside the input folder
+            ref = f"{ref} [{info['type']}]"
+        self._input_ref = ref
+        self._input_refs[self.server_url] = ref
+        if DEBUG_ImageGeneratorAPIWrapper:
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Uploaded input image as {ref!r}")
+        return ref
 
     def wait_for_and_load_image(self, timeout: float = 10.0, poll_interval: float = 0.5) -> QImage:
         """
-        Wait until the output image file is fully written, then load it into a QImage.
+        Return the image fetched for the last prompt, fetching it from ComfyUI if not done yet.
+        poll_interval is kept for compatibility and no longer used.
         """
         if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Waiting for image file to be ready (timeout={timeout}s, poll_interval={poll_interval}s)")
-        start = time.time()
-        paths_prev = []
-        while time.time() - start < timeout:
-            paths = self.get_image_paths()
-            if paths and paths != paths_prev:
-                latest = paths[-1]
-
-                size1 = os.path.getsize(latest)
-                time.sleep(poll_interval)
-                size2 = os.path.getsize(latest)
-                if size1 == size2 and size1 > 0:
-                    if DEBUG_ImageGeneratorAPIWrapper:
-                        logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Image file ready: {latest}")
-                    return QImage(latest)
-                paths_prev = paths
-            time.sleep(poll_interval)
-        if DEBUG_ImageGeneratorAPIWrapper:
-            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Timeout reached, no image file found.")
-        raise TimeoutError("Failed to load image within timeout period.")
-    
+            logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Loading result image (timeout={timeout}s)")
+        if self.result_image is None and self.prompt_id:
+            self._fetch_result(self.prompt_id, timeout)
+        if self.result_image is None:
+            if DEBUG_ImageGeneratorAPIWrapper:
+                logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] No result image available.")
+            raise TimeoutError("Failed to load image within timeout period.")
+        return self.result_image
+
+    def save_result(self, path: str) -> str:
+        """
+        Write the last generated image to path as the bytes ComfyUI produced (no re-encoding).
+        The extension of the ComfyUI file is used when path has none; returns the written path.
+        """
+        if self._result_bytes is None:
+            raise ValueError("No generated image to save.")
+        if not os.path.splitext(path)[1]:
+            path += os.path.splitext(self._result_filename or '')[1] or '.png'
+        with open(path, 'wb') as f:
+            f.write(self._result_bytes)
+        return path
+
     def get_latest_image_path(self) -> Optional[str]:
         """
-        Get the path of the most recently created image file.
+        Get the local path of the last generated image, if ComfyUI shares our filesystem.
         """
-        paths = self.get_image_paths()
-        return paths[-1] if paths else None
+        return self.generated_image_path
 
     def delete_input_and_output_images(self) -> None:
         """
-        Delete the input image and all output images from disk.
+        Drop the in-memory input image and delete the output image from disk.
         """
         if DEBUG_ImageGeneratorAPIWrapper:
             logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Deleting input and output images.")
-        if os.path.exists(INPUT_IMAGE_PATH):
-            try:
-                os.remove(INPUT_IMAGE_PATH)
-                if DEBUG_ImageGeneratorAPIWrapper:
-                    logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Deleted input image: {INPUT_IMAGE_PATH}")
-            except OSError as e:
-                if DEBUG_ImageGeneratorAPIWrapper:
-                    logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Failed to delete input image: {e}")
+        self._input_bytes = None
+        self._input_name = None
+        self._input_ref = None
 
         self.delete_generated_image()
 
@@ -424,7 +605,7 @@ class ImageGeneratorAPIWrapper(QObject):
         if DEBUG_ImageGeneratorAPIWrapper:
             logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Moving output image.")
 
-        if self.generated_image_path and os.path.exists(self.generated_image_path):
+        if self._result_bytes is not None or (self.generated_image_path and os.path.exists(self.generated_image_path)):
             # Create a unique folder for this session using a timestamp
             timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
             session_folder_name = f"photobooth_{timestamp}"
@@ -438,12 +619,17 @@ class ImageGeneratorAPIWrapper(QObject):
                 if DEBUG_ImageGeneratorAPIWrapper:
                     logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Saved input image to: {input_image_path}")
 
-            # Move the generated image
-            unique_filename = "output.png"
+            # Move the generated image, or write the downloaded bytes when ComfyUI is remote
+            ext = os.path.splitext(self._result_filename or self.generated_image_path or '')[1] or '.png'
+            unique_filename = f"output{ext}"
             new_path = os.path.join(session_save_folder, unique_filename)
 
             try:
-                shutil.move(self.generated_image_path, new_path)
+                if self.generated_image_path and os.path.exists(self.generated_image_path):
+                    shutil.move(self.generated_image_path, new_path)
+                else:
+                    with open(new_path, 'wb') as f:
+                        f.write(self._result_bytes)
                 if DEBUG_ImageGeneratorAPIWrapper:
                     logger.info(f"[DEBUG_ImageGeneratorAPIWrapper] Moved generated image to: {new_path}")
                 # Update the path to the new location
@@ -455,7 +641,8 @@ class ImageGeneratorAPIWrapper(QObject):
             logger.info("[DEBUG_ImageGeneratorAPIWrapper] No generated image found to move.")
 
 if __name__ == '__main__':
-    wrapper = ImageGeneratorAPIWrapper(style='oil paint')
+    from constant import INPUT_IMAGE_PATH
+    wrapper = ImageGeneratorAPIWrapper(style='oil paint', qimg=QImage(INPUT_IMAGE_PATH))
     wrapper.generate_image()
     img = wrapper.wait_for_and_load_image()
     wrapper.delete_input_and_output_images()
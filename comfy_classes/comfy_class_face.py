@@ -0,0 +1,237 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtGui import QImage
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_FaceDetector = DEBUG
+DEBUG_FaceCrop = DEBUG
+
+from constant import (
+    FACE_CASCADE_PATH, EYE_CASCADE_PATH, FACE_DETECT_MAX_SIDE,
+    FACE_CROP_SIDE_MARGIN, FACE_CROP_TOP_MARGIN, FACE_CROP_BOTTOM_MARGIN
+)
+
+# Faces narrower than this fraction of the largest one are treated as false positives
+MIN_FACE_RATIO = 0.35
+# The upper half of a face is scaled to this width before looking for eyes
+EYE_ROI_WIDTH = 96
+
+
+def qimage_to_gray(qimg: QImage) -> np.ndarray:
+    """
+    Return a grayscale numpy copy of qimg, honouring the scanline padding of QImage.
+    """
+    gray = qimg.convertToFormat(QImage.Format_Grayscale8)
+    w, h, bpl = gray.width(), gray.height(), gray.bytesPerLine()
+    arr = np.frombuffer(gray.constBits(), np.uint8, count=bpl * h).reshape(h, bpl)
+    return arr[:, :w].copy()
+
+
+class FaceDetector:
+    """
+    OpenCV Haar cascade face detector, loaded on first use and shared by all threads.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> "FaceDetector":
+        """
+        Return the singleton instance of FaceDetector.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(
+        self,
+        cascade_path: Optional[str] = FACE_CASCADE_PATH,
+        max_side: int = FACE_DETECT_MAX_SIDE,
+        eye_cascade_path: Optional[str] = EYE_CASCADE_PATH
+    ) -> None:
+        """
+        Initialize the detector; the cascade files are read on first use.
+        """
+        if DEBUG_FaceDetector:
+            logger.info(f"[DEBUG][FaceDetector] Entering __init__: args={{'cascade_path':{cascade_path!r}, 'max_side':{max_side}, 'eye_cascade_path':{eye_cascade_path!r}}}")
+        self._cascade_path = cascade_path
+        self._eye_cascade_path = eye_cascade_path
+        self._max_side = max_side
+        self._cascades = {}
+        self._lock = threading.Lock()
+        self._eye_lock = threading.Lock()
+        # Faces of the last image, keyed by QImage.cacheKey(): the presence gate and the
+        # crop before upload look at the same capture
+        self._last: Tuple[Optional[int], List[QRect]] = (None, [])
+        if DEBUG_FaceDetector:
+            logger.info(f"[DEBUG][FaceDetector] Exiting __init__: return=None")
+
+    def _load(self, path: Optional[str] = None, default_name: str = 'haarcascade_frontalface_default.xml') -> Optional["cv2.CascadeClassifier"]:
+        """
+        Load a cascade once; None when it is not available. Call with the cascade's lock held.
+        """
+        if default_name in self._cascades:
+            return self._cascades[default_name]
+        if path is None:
+            path = self._cascade_path
+        if path is None:
+            base = getattr(getattr(cv2, 'data', None), 'haarcascades', '')
+            path = os.path.join(base, default_name)
+        # OpenCV 5 moved the cascade classifier to the contrib modules
+        cascade = cv2.CascadeClassifier(path) if hasattr(cv2, 'CascadeClassifier') and os.path.exists(path) else None
+        if cascade is None or cascade.empty():
+            logger.info(f"[FaceDetector] Cascade not found at {path}, {default_name} will not be used.")
+            cascade = None
+        self._cascades[default_name] = cascade
+        return cascade
+
+    def _load_eyes(self) -> Optional["cv2.CascadeClassifier"]:
+        """
+        Load the eye cascade once, next to the face cascade unless a path is configured.
+        """
+        path = self._eye_cascade_path
+        if path is None and self._cascade_path is not None:
+            path = os.path.join(os.path.dirname(self._cascade_path), 'haarcascade_eye.xml')
+        return self._load(path, 'haarcascade_eye.xml')
+
+    @property
+    def available(self) -> bool:
+        """
+        True when the cascade could be loaded.
+        """
+        with self._lock:
+            return self._load() is not None
+
+    def warm_up(self) -> None:
+        """
+        Load the face and eye cascades ahead of the first detection.
+        """
+        with self._lock:
+            self._load()
+        with self._eye_lock:
+            self._load_eyes()
+
+    def detect_gray(self, gray: np.ndarray, min_size: Optional[int] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Return the faces (x, y, w, h) of an equalized grayscale array, at its own scale.
+        """
+        min_side = min_size or max(20, min(gray.shape) // 20)
+        with self._lock:
+            cascade = self._load()
+            if cascade is None:
+                return []
+            found = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+        return [tuple(int(v) for v in f) for f in (found if len(found) else [])]
+
+    def count_eyes(self, gray: np.ndarray, face: Tuple[int, int, int, int]) -> int:
+        """
+        Number of open eyes (0 to 2) found in the upper half of face; the eye cascade
+        does not respond to closed eyes. Returns 2 when no eye cascade is available.
+        """
+        x, y, w, h = face
+        roi = gray[max(0, y):y + h // 2, max(0, x):x + w]
+        if roi.size == 0:
+            return 0
+        if roi.shape[1] != EYE_ROI_WIDTH:
+            roi = cv2.resize(
+                roi, (EYE_ROI_WIDTH, max(1, roi.shape[0] * EYE_ROI_WIDTH // roi.shape[1])),
+                interpolation=cv2.INTER_AREA if roi.shape[1] > EYE_ROI_WIDTH else cv2.INTER_LINEAR
+            )
+        min_side = max(5, roi.shape[1] // 6)
+        with self._eye_lock:
+            cascade = self._load_eyes()
+            if cascade is None:
+                return 2
+            found = cascade.detectMultiScale(roi, scaleFactor=1.1, minNeighbors=4, minSize=(min_side, min_side))
+        return min(2, len(found))
+
+    def detect(self, qimg: QImage) -> List[QRect]:
+        """
+        Return the faces of qimg in image coordinates, largest first.
+        """
+        if qimg is None or qimg.isNull():
+            return []
+        key = qimg.cacheKey()
+        with self._lock:
+            if self._last[0] == key:
+                return list(self._last[1])
+        scale = min(1.0, self._max_side / max(qimg.width(), qimg.height()))
+        small = qimg.scaled(
+            max(1, round(qimg.width() * scale)), max(1, round(qimg.height() * scale)),
+            Qt.IgnoreAspectRatio, Qt.FastTransformation
+        ) if scale < 1.0 else qimg
+        gray = cv2.equalizeHist(qimage_to_gray(small))
+        faces = [
+            QRect(round(x / scale), round(y / scale), round(w / scale), round(h / scale))
+            for (x, y, w, h) in self.detect_gray(gray)
+        ]
+        faces.sort(key=lambda r: r.width() * r.height(), reverse=True)
+        if faces:
+            faces = [r for r in faces if r.width() >= faces[0].width() * MIN_FACE_RATIO]
+        with self._lock:
+            self._last = (key, list(faces))
+        if DEBUG_FaceDetector:
+            logger.info(f"[DEBUG][FaceDetector] {len(faces)} face(s) in {qimg.width()}x{qimg.height()} image")
+        return faces
+
+
+def portrait_crop_rect(width: int, height: int, faces: List[QRect], aspect: float) -> QRect:
+    """
+    Rectangle of aspect ratio aspect (w/h) inside a width x height image: a padded portrait
+    around the union of faces, or the largest centred rectangle when there is no face.
+    """
+    # Largest rectangle of the target aspect that fits in the image
+    max_w, max_h = (width, round(width / aspect)) if width / height <= aspect else (round(height * aspect), height)
+    if faces:
+        union = QRect(faces[0])
+        for face in faces[1:]:
+            union = union.united(face)
+        left = union.left() - union.width() * FACE_CROP_SIDE_MARGIN
+        right = union.right() + union.width() * FACE_CROP_SIDE_MARGIN
+        top = union.top() - union.height() * FACE_CROP_TOP_MARGIN
+        bottom = union.bottom() + union.height() * FACE_CROP_BOTTOM_MARGIN
+        w, h = right - left, bottom - top
+        if w / h < aspect:
+            w = h * aspect
+        else:
+            h = w / aspect
+        if w > max_w:
+            w, h = max_w, max_h
+        cx = (left + right) / 2
+        cy = top + h / 2 if h > bottom - top else (top + bottom) / 2
+    else:
+        w, h = max_w, max_h
+        cx, cy = width / 2, height / 2
+    w, h = max(1, round(w)), max(1, round(h))
+    x = min(max(0, round(cx - w / 2)), width - w)
+    y = min(max(0, round(cy - h / 2)), height - h)
+    return QRect(x, y, w, h)
+
+
+def crop_to_faces(
+    qimg: QImage,
+    size: Tuple[int, int],
+    detector: Optional[FaceDetector] = None
+) -> Tuple[QImage, List[QRect]]:
+    """
+    Crop qimg to a padded portrait around the detected faces and resize it to size (w, h).
+    Returns the prepared image and the faces found in qimg.
+    """
+    detector = detector or FaceDetector.get_instance()
+    faces = detector.detect(qimg)
+    target_w, target_h = size
+    rect = portrait_crop_rect(qimg.width(), qimg.height(), faces, target_w / target_h)
+    result = qimg.copy(rect).scaled(target_w, target_h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    if DEBUG_FaceCrop:
+        logger.info(
+            f"[DEBUG][FaceCrop] {qimg.width()}x{qimg.height()} -> crop {rect.x()},{rect.y()} "
+            f"{rect.width()}x{rect.height()} -> {target_w}x{target_h} ({len(faces)} face(s))"
+        )
+    return result, faces
@@ -0,0 +1,699 @@
+import argparse
+import base64
+import collections
+import email
+import email.policy
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PySide6.QtGui import QColor, QImage
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_MockComfyServer = DEBUG
+DEBUG_MockComfyServer_FULL = DEBUG_FULL
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+# Binary frame header of ComfyUI: >I event type (1 = preview image), >I format (1 = JPEG, 2 = PNG)
+BINARY_PREVIEW_IMAGE = 1
+FORMAT_JPEG, FORMAT_PNG = 1, 2
+PREVIEW_SIZE = 128
+RESULT_SIZE = (512, 512)
+
+
+def encode_image(image: QImage, fmt: str, quality: int = -1) -> bytes:
+    """
+    Encode a QImage in memory.
+    """
+    data = QByteArray()
+    buf = QBuffer(data)
+    buf.open(QIODevice.WriteOnly)
+    image.save(buf, fmt, quality)
+    buf.close()
+    return bytes(data)
+
+
+def topological_order(graph: dict) -> List[str]:
+    """
+    Order the nodes of an API-format graph so every node comes after the nodes it reads from.
+    """
+    order: List[str] = []
+    state: Dict[str, int] = {}
+
+    def visit(nid: str) -> None:
+        if state.get(nid):
+            return
+        state[nid] = 1
+        for value in graph[nid].get('inputs', {}).values():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in graph:
+                visit(str(value[0]))
+        state[nid] = 2
+        order.append(nid)
+
+    for nid in graph:
+        visit(nid)
+    return order
+
+
+class _WebSocketClient:
+    """
+    Server side of one /ws connection: thread-safe frame writer.
+    """
+
+    def __init__(self, sock: socket.socket, client_id: str) -> None:
+        self.sock = sock
+        self.client_id = client_id
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def send_frame(self, opcode: int, payload: bytes) -> None:
+        """
+        Send one unmasked frame; a dead socket just marks the client closed.
+        """
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, message: dict) -> None:
+        self.send_frame(WS_TEXT, json.dumps(message).encode('utf-8'))
+
+    def send_binary(self, payload: bytes) -> None:
+        self.send_frame(WS_BINARY, payload)
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class MockComfyServer:
+    """
+    In-process stand-in for a ComfyUI server, for running the client without a GPU.
+    Speaks /prompt, /history, /view, /upload/image, /queue, /interrupt, /system_stats and the
+    /ws event protocol on one port. Prompts run one at a time in queue order: samplers emit
+    'progress' and JPEG previews per step, SaveImage outputs an inverted copy of the input,
+    SaveImageWebsocket sends it as a PNG frame. Delays and failures are configurable.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        step_delay: float = 0.01,
+        node_delays: Optional[Dict[str, float]] = None,
+        default_node_delay: float = 0.0,
+        previews: bool = True,
+        preview_every: int = 1,
+        fail_rate: float = 0.0,
+        fail_class_types: Iterable[str] = (),
+        seed: Optional[int] = None
+    ) -> None:
+        """
+        Configure the server; it listens once start() is called (port 0 picks a free port).
+        node_delays maps class_type to seconds spent in nodes of that type, step_delay is the
+        time per sampler step, fail_rate the probability that a prompt ends in execution_error
+        and fail_class_types the node types that always fail.
+        """
+        if DEBUG_MockComfyServer:
+            logger.info(f"[DEBUG][MockComfyServer] Entering __init__: args={{'host':{host!r}, 'port':{port}, 'step_delay':{step_delay}}}")
+        self.host = host
+        self.port = port
+        self.step_delay = step_delay
+        self.node_delays = dict(node_delays or {})
+        self.default_node_delay = default_node_delay
+        self.previews = previews
+        self.preview_every = max(1, preview_every)
+        self.fail_rate = fail_rate
+        self.fail_class_types = set(fail_class_types)
+        self._random = random.Random(seed)
+
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._clients: Dict[str, _WebSocketClient] = {}
+        self._connections: set = set()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending: "collections.deque[tuple]" = collections.deque()
+        self._running: Optional[tuple] = None
+        self._interrupt = False
+        self._stopped = False
+        self._number = 0
+        self._counter = 0
+        self.uploads: Dict[str, bytes] = {}
+        self.files: Dict[Tuple[str, str, str], bytes] = {}
+        self.history: Dict[str, dict] = {}
+        # Per prompt_id monotonic timestamps: queued, started, first_progress,
+        # result (image available to the client) and finished
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.interrupts = 0
+        self.deleted: List[str] = []
+        if DEBUG_MockComfyServer:
+            logger.info(f"[DEBUG][MockComfyServer] Exiting __init__: return=None")
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    @property
+    def endpoint(self) -> dict:
+        """
+        Endpoint dict for ComfyBackendPool / ImageGeneratorAPIWrapper(endpoints=[...]).
+        """
+        return {'http': self.http_url, 'ws': self.ws_url, 'name': f"mock:{self.port}"}
+
+    def start(self) -> "MockComfyServer":
+        """
+        Bind the port and start serving and executing prompts.
+        """
+        server = self
+
+        class Handler(_MockHandler):
+            mock = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, name="MockComfyHTTP", daemon=True).start()
+        threading.Thread(target=self._execute_loop, name="MockComfyExecutor", daemon=True).start()
+        logger.info(f"[MockComfyServer] Listening on {self.http_url}")
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and drop every WebSocket connection, like a crashed server.
+        """
+        with self._cond:
+            self._stopped = True
+            self._interrupt = True
+            clients = list(self._clients.values())
+            self._clients.clear()
+            connections = list(self._connections)
+            self._cond.notify_all()
+        for client in clients:
+            client.close()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        # Keep-alive connections would otherwise still be served by their handler threads
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def track_connection(self, conn: socket.socket, open_: bool) -> None:
+        with self._lock:
+            if open_:
+                self._connections.add(conn)
+            else:
+                self._connections.discard(conn)
+
+    # --- queue -----------------------------------------------------------------------------
+
+    def queue_prompt(self, prompt: dict, client_id: Optional[str], front: bool = False) -> Tuple[str, int]:
+        """
+        Validate and enqueue a prompt; return (prompt_id, number).
+        """
+        for nid, node in prompt.items():
+            if node.get('class_type') == 'LoadImage':
+                name = self._upload_name(node.get('inputs', {}).get('image'))
+                if name not in self.uploads:
+                    raise ValueError(f"Node {nid}: invalid image file {node.get('inputs', {}).get('image')!r}")
+        prompt_id = uuid.uuid4().hex
+        with self._cond:
+            self._number += 1
+            number = -self._number if front else self._number
+            item = (number, prompt_id, prompt, client_id)
+            if front:
+                self._pending.appendleft(item)
+            else:
+                self._pending.append(item)
+            self.timings[prompt_id] = {'queued': time.monotonic()}
+            self._cond.notify_all()
+        self._broadcast_status()
+        return prompt_id, number
+
+    def queue_state(self) -> dict:
+        """
+        Body of GET /queue.
+        """
+        with self._lock:
+            running = [[n, pid, p, {'client_id': cid}, []] for n, pid, p, cid in ([self._running] if self._running else [])]
+            pending = [[n, pid, p, {'client_id': cid}, []] for n, pid, p, cid in self._pending]
+        return {'queue_running': running, 'queue_pending': pending}
+
+    def delete_pending(self, prompt_ids: Iterable[str]) -> None:
+        """
+        Remove prompt_ids from the pending queue.
+        """
+        ids = set(prompt_ids)
+        with self._cond:
+            self._pending = collections.deque(item for item in self._pending if item[1] not in ids)
+            self.deleted.extend(ids)
+        self._broadcast_status()
+
+    def clear_pending(self) -> None:
+        with self._cond:
+            self.deleted.extend(item[1] for item in self._pending)
+            self._pending.clear()
+        self._broadcast_status()
+
+    def interrupt(self, prompt_id: Optional[str] = None) -> None:
+        """
+        Interrupt the running prompt (only if it is prompt_id, when given).
+        """
+        with self._cond:
+            self.interrupts += 1
+            if self._running is not None and (prompt_id is None or self._running[1] == prompt_id):
+                self._interrupt = True
+
+    def queue_remaining(self) -> int:
+        with self._lock:
+            return len(self._pending) + (1 if self._running else 0)
+
+    # --- WebSocket -------------------------------------------------------------------------
+
+    def add_client(self, client: _WebSocketClient) -> None:
+        with self._lock:
+            self._clients[client.client_id] = client
+        client.send_json({'type': 'status', 'data': {'status': {'exec_info': {'queue_remaining': self.queue_remaining()}}, 'sid': client.client_id}})
+
+    def remove_client(self, client: _WebSocketClient) -> None:
+        with self._lock:
+            if self._clients.get(client.client_id) is client:
+                del self._clients[client.client_id]
+
+    def _send(self, client_id: Optional[str], event_type: str, data: dict) -> None:
+        """
+        Send an event to the client that queued the prompt.
+        """
+        client = self._clients.get(client_id) if client_id else None
+        if client is not None:
+            client.send_json({'type': event_type, 'data': data})
+
+    def _send_binary(self, client_id: Optional[str], fmt: int, payload: bytes) -> None:
+        client = self._clients.get(client_id) if client_id else None
+        if client is not None:
+            client.send_binary(struct.pack('>II', BINARY_PREVIEW_IMAGE, fmt) + payload)
+
+    def _broadcast_status(self) -> None:
+        message = {'type': 'status', 'data': {'status': {'exec_info': {'queue_remaining': self.queue_remaining()}}}}
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client.send_json(message)
+
+    # --- execution -------------------------------------------------------------------------
+
+    def _execute_loop(self) -> None:
+        """
+        Executor thread: run the queued prompts one at a time.
+        """
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                item = self._pending.popleft()
+                self._running = item
+                self._interrupt = False
+            try:
+                self._execute(*item)
+            except Exception as e:
+                logger.info(f"[MockComfyServer] Prompt {item[1]} crashed: {e!r}")
+            finally:
+                with self._cond:
+                    self._running = None
+                self._broadcast_status()
+
+    def _execute(self, number: int, prompt_id: str, prompt: dict, client_id: Optional[str]) -> None:
+        """
+        Simulate the execution of one prompt, emitting the events ComfyUI would.
+        """
+        timings = self.timings.setdefault(prompt_id, {})
+        timings['started'] = time.monotonic()
+        self._send(client_id, 'execution_start', {'prompt_id': prompt_id, 'timestamp': int(time.time() * 1000)})
+        self._send(client_id, 'execution_cached', {'nodes': [], 'prompt_id': prompt_id, 'timestamp': int(time.time() * 1000)})
+
+        fail_node = None
+        order = topological_order(prompt)
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            fail_node = self._random.choice(order)
+        source = self._input_image(prompt)
+        preview = encode_image(source.scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.KeepAspectRatio), 'JPEG', 80) if self.previews else b''
+        outputs: Dict[str, dict] = {}
+        executed: List[str] = []
+
+        for nid in order:
+            node = prompt[nid]
+            class_type = node.get('class_type', '')
+            if self._interrupt:
+                self._finish(prompt_id, client_id, number, prompt, outputs, 'execution_interrupted', {
+                    'prompt_id': prompt_id, 'node_id': nid, 'node_type': class_type, 'executed': executed
+                })
+                return
+            self._send(client_id, 'executing', {'node': nid, 'display_node': nid, 'prompt_id': prompt_id})
+            if nid == fail_node or class_type in self.fail_class_types:
+                self._finish(prompt_id, client_id, number, prompt, outputs, 'execution_error', {
+                    'prompt_id': prompt_id, 'node_id': nid, 'node_type': class_type, 'executed': executed,
+                    'exception_message': 'Simulated failure', 'exception_type': 'RuntimeError', 'traceback': []
+                })
+                return
+
+            steps = node.get('inputs', {}).get('steps')
+            if isinstance(steps, (int, float)) and steps > 0:
+                for step in range(1, int(steps) + 1):
+                    if self._interrupt:
+                        break
+                    if self.step_delay:
+                        time.sleep(self.step_delay)
+                    timings.setdefault('first_progress', time.monotonic())
+                    self._send(client_id, 'progress', {'value': step, 'max': int(steps), 'prompt_id': prompt_id, 'node': nid})
+                    if preview and step % self.preview_every == 0:
+                        self._send_binary(client_id, FORMAT_JPEG, preview)
+                if self._interrupt:
+                    continue
+            else:
+                delay = self.node_delays.get(class_type, self.default_node_delay)
+                if delay:
+                    time.sleep(delay)
+
+            if class_type in ('SaveImage', 'PreviewImage'):
+                folder = 'output' if class_type == 'SaveImage' else 'temp'
+                prefix = node.get('inputs', {}).get('filename_prefix', 'ComfyUI') if folder == 'output' else 'ComfyUI_temp'
+                image = self._store(folder, prefix, encode_image(self._result_image(source), 'PNG'))
+                outputs[nid] = {'images': [image]}
+                self._send(client_id, 'executed', {'node': nid, 'display_node': nid, 'output': outputs[nid], 'prompt_id': prompt_id})
+            elif class_type == 'SaveImageWebsocket':
+                data = encode_image(self._result_image(source), 'PNG')
+                timings.setdefault('result', time.monotonic())
+                self._send_binary(client_id, FORMAT_PNG, data)
+            executed.append(nid)
+
+        self._finish(prompt_id, client_id, number, prompt, outputs, 'execution_success', {
+            'prompt_id': prompt_id, 'timestamp': int(time.time() * 1000)
+        })
+
+    def _finish(
+        self,
+        prompt_id: str,
+        client_id: Optional[str],
+        number: int,
+        prompt: dict,
+        outputs: Dict[str, dict],
+        event_type: str,
+        data: dict
+    ) -> None:
+        """
+        Send the terminal event, then record /history and send 'executing' None, in ComfyUI's order.
+        """
+        self._send(client_id, event_type, data)
+        success = event_type == 'execution_success'
+        self.history[prompt_id] = {
+            'prompt': [number, prompt_id, prompt, {'client_id': client_id}, list(outputs)],
+            'outputs': outputs,
+            'status': {
+                'status_str': 'success' if success else 'error',
+                'completed': success,
+                'messages': [[event_type, data]],
+            },
+        }
+        timings = self.timings[prompt_id]
+        timings['finished'] = time.monotonic()
+        if success:
+            # SaveImage outputs can be fetched once /history lists them
+            timings.setdefault('result', timings['finished'])
+        self._send(client_id, 'executing', {'node': None, 'prompt_id': prompt_id})
+        if DEBUG_MockComfyServer:
+            logger.info(f"[DEBUG][MockComfyServer] Prompt {prompt_id} finished with {event_type}")
+
+    # --- files -----------------------------------------------------------------------------
+
+    @staticmethod
+    def _upload_name(ref: Optional[str]) -> Optional[str]:
+        """
+        Uploaded file name from a LoadImage reference ('sub/name.png [temp]' -> 'name.png').
+        """
+        if not isinstance(ref, str):
+            return None
+        if ref.endswith(']') and ' [' in ref:
+            ref = ref.rsplit(' [', 1)[0]
+        return ref.rsplit('/', 1)[-1]
+
+    def _input_image(self, prompt: dict) -> QImage:
+        """
+        Decode the image of the first LoadImage node, or a plain grey image.
+        """
+        for node in prompt.values():
+            if node.get('class_type') == 'LoadImage':
+                data = self.uploads.get(self._upload_name(node.get('inputs', {}).get('image')))
+                if data:
+                    image = QImage.fromData(data)
+                    if not image.isNull():
+                        return image
+        image = QImage(RESULT_SIZE[0], RESULT_SIZE[1], QImage.Format_RGB888)
+        image.fill(QColor(128, 128, 128))
+        return image
+
+    @staticmethod
+    def _result_image(source: QImage) -> QImage:
+        """
+        The 'generated' image: the input with inverted colours.
+        """
+        image = source.convertToFormat(QImage.Format_RGB888)
+        image.invertPixels()
+        return image
+
+    def _store(self, folder: str, prefix: str, data: bytes) -> dict:
+        """
+        Keep an output file for /view and return its history entry.
+        """
+        with self._lock:
+            self._counter += 1
+            filename = f"{prefix}_{self._counter:05d}_.png"
+        self.files[(folder, '', filename)] = data
+        return {'filename': filename, 'subfolder': '', 'type': folder}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """
+    HTTP and WebSocket endpoints of MockComfyServer.
+    """
+    protocol_version = 'HTTP/1.1'
+    mock: MockComfyServer = None
+
+    def setup(self) -> None:
+        super().setup()
+        # Headers and body are written separately; without TCP_NODELAY each response waits for a delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.mock.track_connection(self.connection, True)
+
+    def finish(self) -> None:
+        self.mock.track_connection(self.connection, False)
+        super().finish()
+
+    def log_message(self, format: str, *args) -> None:
+        if DEBUG_MockComfyServer_FULL:
+            logger.info(f"[DEBUG][MockComfyServer] {self.address_string()} {format % args}")
+
+    def _send_json(self, obj: object, status: int = 200) -> None:
+        self._send_bytes(json.dumps(obj).encode('utf-8'), 'application/json', status)
+
+    def _send_bytes(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _read_json(self) -> dict:
+        body = self._read_body()
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {}
+        return data if isinstance(data, dict) else {}
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        path = url.path
+        if path == '/ws':
+            return self._websocket(parse_qs(url.query).get('clientId', [None])[0])
+        if path == '/system_stats':
+            return self._send_json({'system': {'os': 'mock', 'comfyui_version': 'mock'}, 'devices': []})
+        if path == '/queue':
+            return self._send_json(self.mock.queue_state())
+        if path == '/history':
+            return self._send_json(self.mock.history)
+        if path.startswith('/history/'):
+            prompt_id = path[len('/history/'):]
+            entry = self.mock.history.get(prompt_id)
+            return self._send_json({prompt_id: entry} if entry is not None else {})
+        if path == '/view':
+            query = parse_qs(url.query)
+            key = (query.get('type', ['output'])[0], query.get('subfolder', [''])[0], query.get('filename', [''])[0])
+            data = self.mock.files.get(key)
+            if data is None and key[0] == 'input':
+                data = self.mock.uploads.get(key[2])
+            if data is None:
+                return self._send_json({'error': 'not found'}, 404)
+            return self._send_bytes(data, 'image/png')
+        self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path
+        if path == '/prompt':
+            body = self._read_json()
+            try:
+                prompt_id, number = self.mock.queue_prompt(body.get('prompt') or {}, body.get('client_id'), bool(body.get('front')))
+            except ValueError as e:
+                return self._send_json({'error': {'type': 'prompt_outputs_failed_validation', 'message': str(e)}, 'node_errors': {}}, 400)
+            return self._send_json({'prompt_id': prompt_id, 'number': number, 'node_errors': {}})
+        if path == '/upload/image':
+            return self._upload()
+        if path == '/queue':
+            body = self._read_json()
+            if body.get('clear'):
+                self.mock.clear_pending()
+            if body.get('delete'):
+                self.mock.delete_pending(body['delete'])
+            return self._send_json({})
+        if path == '/interrupt':
+            self.mock.interrupt(self._read_json().get('prompt_id'))
+            return self._send_json({})
+        self._read_body()
+        self._send_json({'error': 'not found'}, 404)
+
+    def _upload(self) -> None:
+        """
+        POST /upload/image: multipart form with 'image', 'type' and 'subfolder'.
+        """
+        raw = b'Content-Type: ' + self.headers.get('Content-Type', '').encode('latin-1') + b'\r\n\r\n' + self._read_body()
+        message = email.message_from_bytes(raw, policy=email.policy.HTTP)
+        fields: Dict[str, str] = {}
+        name, data = None, None
+        for part in message.iter_parts():
+            field = part.get_param('name', header='content-disposition')
+            if field == 'image':
+                name, data = part.get_filename(), part.get_payload(decode=True)
+            elif field:
+                fields[field] = part.get_payload(decode=True).decode('utf-8', 'replace')
+        if not name or data is None:
+            return self._send_json({'error': 'no image'}, 400)
+        self.mock.uploads[name] = data
+        self._send_json({'name': name, 'subfolder': fields.get('subfolder', ''), 'type': fields.get('type', 'input')})
+
+    def _websocket(self, client_id: Optional[str]) -> None:
+        """
+        Upgrade to a WebSocket and serve it until the client or the server closes it.
+        """
+        key = self.headers.get('Sec-WebSocket-Key')
+        if not key or 'websocket' not in self.headers.get('Upgrade', '').lower():
+            return self._send_json({'error': 'expected a WebSocket upgrade'}, 400)
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        client = _WebSocketClient(self.connection, client_id or uuid.uuid4().hex)
+        self.mock.add_client(client)
+        try:
+            while not client.closed:
+                opcode, payload = self._read_frame()
+                if opcode is None or opcode == WS_CLOSE:
+                    client.send_frame(WS_CLOSE, payload or b'')
+                    break
+                if opcode == WS_PING:
+                    client.send_frame(WS_PONG, payload)
+        except OSError:
+            pass
+        finally:
+            self.mock.remove_client(client)
+            client.close()
+
+    def _read_frame(self) -> Tuple[Optional[int], bytes]:
+        """
+        Read one (masked) client frame; (None, b'') when the socket closed.
+        """
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return None, b''
+        opcode = header[0] & 0x0F
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if header[1] & 0x80 else b''
+        payload = self.rfile.read(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a mock ComfyUI server for PhotoBooth development.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--step-delay', type=float, default=0.05, help="seconds per sampler step")
+    parser.add_argument('--node-delay', type=float, default=0.0, help="seconds per non-sampler node")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="probability of a simulated execution_error")
+    parser.add_argument('--no-previews', action='store_true', help="do not send binary previews")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = MockComfyServer(
+        args.host, args.port,
+        step_delay=args.step_delay,
+        default_node_delay=args.node_delay,
+        previews=not args.no_previews,
+        fail_rate=args.fail_rate
+    ).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
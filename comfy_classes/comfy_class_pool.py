@@ -0,0 +1,229 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import requests
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_ComfyBackend = DEBUG
+DEBUG_ComfyBackendPool = DEBUG
+
+from constant import (
+    COMFY_BACKENDS, COMFY_HEALTH_CHECK_INTERVAL, COMFY_HEALTH_TIMEOUT, COMFY_JOB_SECONDS_ESTIMATE
+)
+from comfy_classes.comfy_class_session import ComfySession
+
+JOB_TIME_SMOOTHING = 0.3
+
+
+class BackendUnavailableError(ConnectionError):
+    """
+    Raised when a ComfyUI backend stops answering while a job depends on it.
+    """
+
+
+def ws_url_from_http(http_url: str) -> str:
+    """
+    Derive the WebSocket endpoint of a ComfyUI server from its HTTP base URL.
+    """
+    if http_url.startswith('https://'):
+        return 'wss://' + http_url[len('https://'):].rstrip('/') + '/ws'
+    return 'ws://' + http_url.split('://', 1)[-1].rstrip('/') + '/ws'
+
+
+class ComfyBackend:
+    """
+    One ComfyUI server: HTTP client, lazily opened WebSocket session, health and load estimate.
+    """
+
+    def __init__(self, http_url: str, ws_url: Optional[str] = None, name: Optional[str] = None) -> None:
+        """
+        Initialize the backend for the given endpoints.
+        """
+        if DEBUG_ComfyBackend:
+            logger.info(f"[DEBUG][ComfyBackend] Entering __init__: args={{'http_url':{http_url!r}, 'ws_url':{ws_url!r}}}")
+        self.http_url = http_url.rstrip('/')
+        self.ws_url = ws_url or ws_url_from_http(self.http_url)
+        self.name = name or self.http_url
+        self.http = requests.Session()
+        self._session: Optional[ComfySession] = None
+        self._lock = threading.Lock()
+        self.alive = True
+        self.last_check = 0.0
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.avg_job_seconds = float(COMFY_JOB_SECONDS_ESTIMATE)
+        self.failures = 0
+        if DEBUG_ComfyBackend:
+            logger.info(f"[DEBUG][ComfyBackend] Exiting __init__: return=None")
+
+    def get_session(self) -> ComfySession:
+        """
+        Return the WebSocket session of this backend, starting it on first use.
+        """
+        with self._lock:
+            if self._session is None:
+                self._session = ComfySession(self.ws_url)
+            session = self._session
+        session.start()
+        return session
+
+    def check_health(self, timeout: float = COMFY_HEALTH_TIMEOUT) -> bool:
+        """
+        Query /system_stats and /queue; update alive and queue_depth.
+        """
+        try:
+            self.http.get(f"{self.http_url}/system_stats", timeout=timeout).raise_for_status()
+            resp = self.http.get(f"{self.http_url}/queue", timeout=timeout)
+            resp.raise_for_status()
+            queue = resp.json()
+            self.queue_depth = len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+            self.alive = True
+            self.failures = 0
+        except (requests.RequestException, ValueError) as e:
+            self.alive = False
+            self.failures += 1
+            if DEBUG_ComfyBackend:
+                logger.info(f"[DEBUG][ComfyBackend] {self.name} unhealthy: {e!r}")
+        self.last_check = time.monotonic()
+        return self.alive
+
+    def expected_wait(self) -> float:
+        """
+        Estimated seconds before a new job would finish on this backend.
+        The live queue size pushed over the WebSocket is preferred over the last /queue poll.
+        """
+        depth = self.queue_depth
+        session = self._session
+        if session is not None and session.is_connected() and session.queue_remaining is not None:
+            depth = session.queue_remaining
+        return (max(depth, self.in_flight) + 1) * self.avg_job_seconds
+
+    def job_started(self) -> None:
+        """
+        Count a job submitted by us that has not finished yet.
+        """
+        with self._lock:
+            self.in_flight += 1
+
+    def job_finished(self, seconds: Optional[float] = None) -> None:
+        """
+        Release an in-flight job and fold its duration into the running average.
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if seconds is not None and seconds > 0:
+                self.avg_job_seconds += JOB_TIME_SMOOTHING * (seconds - self.avg_job_seconds)
+
+    def mark_failed(self) -> None:
+        """
+        Take the backend out of rotation until its next successful health check.
+        """
+        if DEBUG_ComfyBackend:
+            logger.info(f"[DEBUG][ComfyBackend] Marking {self.name} as failed")
+        self.alive = False
+        self.failures += 1
+        self.last_check = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Close the WebSocket session of this backend.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+class ComfyBackendPool:
+    """
+    A set of ComfyUI backends; each job goes to the live backend with the shortest expected wait.
+    """
+
+    def __init__(self, endpoints: Optional[Iterable[Union[str, dict]]] = None) -> None:
+        """
+        Initialize the pool from HTTP URLs or {'http': ..., 'ws': ..., 'name': ...} dicts.
+        """
+        if DEBUG_ComfyBackendPool:
+            logger.info(f"[DEBUG][ComfyBackendPool] Entering __init__: args={{'endpoints':{endpoints!r}}}")
+        self.backends: List[ComfyBackend] = []
+        for endpoint in (endpoints if endpoints is not None else COMFY_BACKENDS):
+            if isinstance(endpoint, str):
+                self.backends.append(ComfyBackend(endpoint))
+            else:
+                self.backends.append(ComfyBackend(endpoint['http'], endpoint.get('ws'), endpoint.get('name')))
+        if not self.backends:
+            raise ValueError("At least one ComfyUI backend is required.")
+        self._lock = threading.Lock()
+        if DEBUG_ComfyBackendPool:
+            logger.info(f"[DEBUG][ComfyBackendPool] Exiting __init__: {len(self.backends)} backends")
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Health-check, in parallel, the backends whose last check is older than COMFY_HEALTH_CHECK_INTERVAL.
+        """
+        now = time.monotonic()
+        stale = [b for b in self.backends if force or now - b.last_check >= COMFY_HEALTH_CHECK_INTERVAL]
+        if not stale:
+            return
+        if len(stale) == 1:
+            stale[0].check_health()
+            return
+        threads = [threading.Thread(target=b.check_health, daemon=True) for b in stale]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(COMFY_HEALTH_TIMEOUT * 2 + 1)
+
+    def select(self, exclude: Iterable[ComfyBackend] = ()) -> ComfyBackend:
+        """
+        Return the live backend with the shortest expected wait, re-checking all of them if none is live.
+        """
+        excluded = set(id(b) for b in exclude)
+        with self._lock:
+            self.refresh()
+            candidates = [b for b in self.backends if b.alive and id(b) not in excluded]
+            if not candidates:
+                self.refresh(force=True)
+                candidates = [b for b in self.backends if b.alive and id(b) not in excluded]
+            if not candidates:
+                raise BackendUnavailableError("No ComfyUI backend available.")
+            backend = min(candidates, key=lambda b: b.expected_wait())
+        if DEBUG_ComfyBackendPool:
+            waits = {b.name: round(b.expected_wait(), 1) for b in candidates}
+            logger.info(f"[DEBUG][ComfyBackendPool] Selected {backend.name} (expected waits: {waits})")
+        return backend
+
+    def peek(self) -> Optional[ComfyBackend]:
+        """
+        Backend select() would pick now, from the last known loads and without any health check
+        or request; None when no backend is known to be alive.
+        """
+        with self._lock:
+            candidates = [b for b in self.backends if b.alive]
+        return min(candidates, key=lambda b: b.expected_wait()) if candidates else None
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Return a snapshot of health and load per backend.
+        """
+        return {
+            b.name: {
+                'alive': b.alive,
+                'queue_depth': b.queue_depth,
+                'in_flight': b.in_flight,
+                'avg_job_seconds': round(b.avg_job_seconds, 2),
+                'expected_wait': round(b.expected_wait(), 2),
+            }
+            for b in self.backends
+        }
+
+    def close(self) -> None:
+        """
+        Close the sessions of every backend.
+        """
+        for backend in self.backends:
+            backend.close()
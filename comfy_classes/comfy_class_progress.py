@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_PromptProgress = DEBUG
+DEBUG_PromptProgress_FULL = DEBUG_FULL
+
+from constant import COMFY_NODE_WEIGHTS, COMFY_NODE_WEIGHT_DEFAULT
+
+
+def node_weights(graph: dict) -> Dict[str, float]:
+    """
+    Estimate the relative cost of every node of an API-format graph.
+    Sampler nodes weigh their step count, other nodes use COMFY_NODE_WEIGHTS by class_type.
+    """
+    weights: Dict[str, float] = {}
+    for nid, node in graph.items():
+        steps = node.get('inputs', {}).get('steps')
+        if isinstance(steps, (int, float)):
+            weights[nid] = float(steps)
+        else:
+            weights[nid] = float(COMFY_NODE_WEIGHTS.get(node.get('class_type', ''), COMFY_NODE_WEIGHT_DEFAULT))
+    return weights
+
+
+class PromptProgress:
+    """
+    Progress of one prompt_id, computed from its own execution events.
+    Finished nodes count their full weight, the running node counts value/max of its weight.
+    """
+
+    def __init__(self, prompt_id: Optional[str], weights: Dict[str, float]) -> None:
+        """
+        Initialize the tracker with the per-node weights of the submitted graph.
+        """
+        if DEBUG_PromptProgress:
+            logger.info(f"[DEBUG][PromptProgress] Entering __init__: args={{'prompt_id':{prompt_id!r}, 'nodes':{len(weights)}}}")
+        self.prompt_id = prompt_id
+        self._weights = dict(weights)
+        self._total = sum(self._weights.values())
+        self._done: Set[str] = set()
+        self._done_weight = 0.0
+        self._partial = 0.0
+        self._lock = threading.Lock()
+        self.executing: Optional[str] = None
+        self.finished = False
+        self._percent = 0.0
+        if DEBUG_PromptProgress:
+            logger.info(f"[DEBUG][PromptProgress] Exiting __init__: total weight={self._total}")
+
+    @property
+    def percent(self) -> float:
+        """
+        Current progress in percent (0-100), never decreasing.
+        """
+        return self._percent
+
+    def update(self, event_type: str, data: dict) -> Optional[float]:
+        """
+        Apply one event and return the new percent if it changed, else None.
+        """
+        with self._lock:
+            if event_type == 'execution_cached':
+                self._mark_done(data.get('nodes', []))
+            elif event_type == 'executing':
+                node = data.get('node')
+                if self.executing is not None and self.executing != node:
+                    self._mark_done([self.executing])
+                self.executing = node
+                self._partial = 0.0
+                if node is None:
+                    self.finished = True
+            elif event_type == 'progress':
+                node = data.get('node') or self.executing
+                if node is not None and node not in self._done:
+                    if node != self.executing:
+                        self.executing = node
+                    maximum = data.get('max') or 0
+                    self._partial = min(1.0, data.get('value', 0) / maximum) if maximum else 0.0
+            elif event_type == 'executed':
+                self._mark_done([data.get('node')])
+                if data.get('node') == self.executing:
+                    self._partial = 0.0
+            elif event_type in ('execution_success', 'execution_error', 'execution_interrupted'):
+                self.finished = True
+            else:
+                return None
+            return self._refresh()
+
+    def _mark_done(self, nodes: Iterable[Optional[str]]) -> None:
+        """
+        Count the full weight of nodes that finished or were served from cache.
+        """
+        for nid in nodes:
+            if nid is None or nid in self._done:
+                continue
+            self._done.add(nid)
+            self._done_weight += self._weights.get(nid, 0.0)
+
+    def _refresh(self) -> Optional[float]:
+        """
+        Recompute the percentage and return it when it moved forward.
+        """
+        if self.finished:
+            pct = 100.0
+        elif self._total:
+            running = self._weights.get(self.executing, 0.0) * self._partial if self.executing not in self._done else 0.0
+            pct = min(100.0, (self._done_weight + running) / self._total * 100)
+        else:
+            pct = 0.0
+        if pct <= self._percent:
+            return None
+        self._percent = pct
+        if DEBUG_PromptProgress_FULL:
+            logger.info(f"[DEBUG][PromptProgress] {self.prompt_id}: {pct:.2f}% (node {self.executing})")
+        return pct
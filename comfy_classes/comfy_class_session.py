@@ -0,0 +1,315 @@
+import json
+import queue
+import struct
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from websocket import WebSocketConnectionClosedException, WebSocketTimeoutException, create_connection
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_ComfySession = DEBUG
+DEBUG_ComfySession_FULL = DEBUG_FULL
+DEBUG_PromptHandle = DEBUG
+
+from constant import WS_URL, COMFY_PING_INTERVAL, COMFY_RECONNECT_DELAY, COMFY_RECONNECT_DELAY_MAX
+
+TERMINAL_EVENTS = ('execution_success', 'execution_error', 'execution_interrupted')
+ORPHAN_TTL_SECONDS = 60.0
+
+# Binary frame layout sent by ComfyUI: >I event type, then for images >I format and the encoded bytes
+BINARY_PREVIEW_IMAGE = 1
+BINARY_IMAGE_FORMATS = {1: 'JPEG', 2: 'PNG'}
+
+
+def decode_binary_frame(frame: bytes) -> Tuple[int, Optional[str], bytes]:
+    """
+    Split a binary WebSocket frame into (event_type, image_format, payload).
+    image_format is None for non-image events.
+    """
+    if len(frame) < 4:
+        return 0, None, b''
+    event_type = struct.unpack('>I', frame[:4])[0]
+    if event_type == BINARY_PREVIEW_IMAGE and len(frame) >= 8:
+        fmt = struct.unpack('>I', frame[4:8])[0]
+        return event_type, BINARY_IMAGE_FORMATS.get(fmt), frame[8:]
+    return event_type, None, frame[4:]
+
+
+class PromptHandle:
+    """
+    Event stream of a single prompt_id, filled by ComfySession and consumed by one caller.
+    Items are (event_type, data) tuples; binary frames arrive as ('binary', bytes).
+    """
+
+    def __init__(self, prompt_id: str) -> None:
+        """
+        Initialize the handle for the given prompt_id.
+        """
+        if DEBUG_PromptHandle:
+            logger.info(f"[DEBUG][PromptHandle] Entering __init__: args={{'prompt_id':{prompt_id!r}}}")
+        self.prompt_id = prompt_id
+        self.events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        self.done = threading.Event()
+        self.last_event: Optional[str] = None
+        if DEBUG_PromptHandle:
+            logger.info(f"[DEBUG][PromptHandle] Exiting __init__: return=None")
+
+    def put(self, event_type: str, data: object) -> None:
+        """
+        Push an event for this prompt and flag completion on terminal events.
+        """
+        self.last_event = event_type
+        self.events.put((event_type, data))
+        if event_type in TERMINAL_EVENTS:
+            self.done.set()
+
+    def get(self, timeout: Optional[float] = None) -> Tuple[str, object]:
+        """
+        Return the next event, raising queue.Empty when the timeout expires.
+        """
+        return self.events.get(timeout=timeout)
+
+    def close(self, reason: str) -> None:
+        """
+        Unblock any consumer waiting on this handle.
+        """
+        if DEBUG_PromptHandle:
+            logger.info(f"[DEBUG][PromptHandle] Closing handle {self.prompt_id}: reason={reason}")
+        self.events.put(('closed', {'reason': reason}))
+
+
+class ComfySession:
+    """
+    One long-lived ComfyUI WebSocket connection with a stable client_id.
+    A single reader thread receives every frame, keeps the socket alive, reconnects
+    on failure and routes events to the PromptHandle registered for their prompt_id.
+    """
+
+    def __init__(
+        self,
+        ws_url: str = WS_URL,
+        client_id: Optional[str] = None,
+        ping_interval: float = COMFY_PING_INTERVAL,
+        reconnect_delay: float = COMFY_RECONNECT_DELAY,
+        reconnect_delay_max: float = COMFY_RECONNECT_DELAY_MAX
+    ) -> None:
+        """
+        Initialize the session; the connection is opened lazily by start().
+        """
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Entering __init__: args={{'ws_url':{ws_url!r}, 'client_id':{client_id!r}}}")
+        self.ws_url = ws_url
+        self.client_id = client_id or uuid.uuid4().hex
+        self._ping_interval = ping_interval
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_delay_max = reconnect_delay_max
+        self._lock = threading.Lock()
+        self._handles: Dict[str, PromptHandle] = {}
+        self._orphans: Dict[str, List[Tuple[float, str, object]]] = {}
+        self._current_prompt_id: Optional[str] = None
+        self._ws = None
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._connected = threading.Event()
+        self.queue_remaining: Optional[int] = None
+        self.reconnect_count = 0
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Exiting __init__: return=None")
+
+    def start(self) -> None:
+        """
+        Start the reader thread if it is not already running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name=f"ComfySession-{self.client_id[:8]}", daemon=True)
+            self._thread.start()
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Reader thread started for client_id={self.client_id}")
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """
+        Start the session if needed and block until the socket is open.
+        """
+        self.start()
+        return self._connected.wait(timeout)
+
+    def is_connected(self) -> bool:
+        """
+        Return True while the WebSocket is open.
+        """
+        return self._connected.is_set()
+
+    def register(self, prompt_id: str) -> PromptHandle:
+        """
+        Create the handle for prompt_id and replay events that arrived before registration.
+        """
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Entering register: args={{'prompt_id':{prompt_id!r}}}")
+        handle = PromptHandle(prompt_id)
+        with self._lock:
+            self._handles[prompt_id] = handle
+            early = self._orphans.pop(prompt_id, [])
+        for _, event_type, data in early:
+            handle.put(event_type, data)
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Exiting register: replayed {len(early)} early events")
+        return handle
+
+    def unregister(self, prompt_id: str) -> None:
+        """
+        Stop routing events to the handle of prompt_id.
+        """
+        with self._lock:
+            self._handles.pop(prompt_id, None)
+            self._orphans.pop(prompt_id, None)
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Unregistered prompt_id={prompt_id}")
+
+    def close(self) -> None:
+        """
+        Close the socket, stop the reader thread and release every waiting consumer.
+        """
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Entering close: args=()")
+        self._closing = True
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+            self._orphans.clear()
+        for handle in handles:
+            handle.close('session closed')
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Exiting close: return=None")
+
+    def _connect(self) -> None:
+        """
+        Open the WebSocket under our client_id so ComfyUI addresses its events to us.
+        """
+        sep = '&' if '?' in self.ws_url else '?'
+        ws = create_connection(f"{self.ws_url}{sep}clientId={self.client_id}", timeout=self._ping_interval)
+        ws.settimeout(self._ping_interval)
+        self._ws = ws
+
+    def _run(self) -> None:
+        """
+        Reader loop: connect, receive, keep alive and reconnect with backoff until closed.
+        """
+        delay = self._reconnect_delay
+        first = True
+        while not self._closing:
+            try:
+                self._connect()
+            except Exception as e:
+                if DEBUG_ComfySession:
+                    logger.info(f"[DEBUG][ComfySession] Connect failed ({e!r}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self._reconnect_delay_max)
+                continue
+            delay = self._reconnect_delay
+            if not first:
+                self.reconnect_count += 1
+                self._broadcast('reconnected', {'count': self.reconnect_count})
+            first = False
+            self._connected.set()
+            if DEBUG_ComfySession:
+                logger.info(f"[DEBUG][ComfySession] Connected to {self.ws_url} as {self.client_id}")
+            try:
+                while not self._closing:
+                    try:
+                        msg = self._ws.recv()
+                    except WebSocketTimeoutException:
+                        self._ws.ping()
+                        if DEBUG_ComfySession_FULL:
+                            logger.info("[DEBUG][ComfySession] Keep-alive ping sent.")
+                        continue
+                    self._dispatch(msg)
+            except (WebSocketConnectionClosedException, OSError) as e:
+                if DEBUG_ComfySession:
+                    logger.info(f"[DEBUG][ComfySession] Connection lost: {e!r}")
+            except Exception as e:
+                logger.info(f"[ComfySession] Unexpected error in reader loop: {type(e).__name__}: {e!r}")
+            finally:
+                self._connected.clear()
+                try:
+                    self._ws.close()
+                except Exception:
+                    pass
+            if not self._closing:
+                self._broadcast('disconnected', {'url': self.ws_url})
+        if DEBUG_ComfySession:
+            logger.info(f"[DEBUG][ComfySession] Reader thread exiting for client_id={self.client_id}")
+
+    def _dispatch(self, msg: object) -> None:
+        """
+        Route one WebSocket frame to the handle of its prompt_id.
+        """
+        if isinstance(msg, (bytes, bytearray)):
+            with self._lock:
+                prompt_id = self._current_prompt_id
+            if prompt_id is not None:
+                self._route(prompt_id, 'binary', bytes(msg))
+            return
+        try:
+            data = json.loads(msg)
+        except (TypeError, json.JSONDecodeError):
+            return
+        event_type = data.get('type', '')
+        payload = data.get('data', {}) or {}
+        if DEBUG_ComfySession_FULL:
+            logger.info(f"[DEBUG][ComfySession] Event {event_type}: {str(payload)[:200]}")
+
+        if event_type == 'status':
+            exec_info = payload.get('status', {}).get('exec_info', {})
+            self.queue_remaining = exec_info.get('queue_remaining', self.queue_remaining)
+            return
+
+        prompt_id = payload.get('prompt_id')
+        with self._lock:
+            if event_type in ('execution_start', 'executing') and prompt_id:
+                self._current_prompt_id = prompt_id
+            if prompt_id is None:
+                prompt_id = self._current_prompt_id
+            if event_type in TERMINAL_EVENTS and prompt_id == self._current_prompt_id:
+                self._current_prompt_id = None
+        if prompt_id is not None:
+            self._route(prompt_id, event_type, payload)
+
+    def _route(self, prompt_id: str, event_type: str, data: object) -> None:
+        """
+        Deliver an event to its handle, or keep it until the prompt is registered.
+        """
+        with self._lock:
+            handle = self._handles.get(prompt_id)
+            if handle is None:
+                now = time.monotonic()
+                for pid in [p for p, evs in self._orphans.items() if evs and now - evs[0][0] > ORPHAN_TTL_SECONDS]:
+                    del self._orphans[pid]
+                self._orphans.setdefault(prompt_id, []).append((now, event_type, data))
+                return
+        handle.put(event_type, data)
+
+    def _broadcast(self, event_type: str, data: object) -> None:
+        """
+        Deliver a session-level event to every registered handle.
+        """
+        with self._lock:
+            handles = list(self._handles.values())
+        for handle in handles:
+            handle.put(event_type, data)
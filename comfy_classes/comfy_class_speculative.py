@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from PySide6.QtGui import QImage
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_SpeculativeJob = DEBUG
+DEBUG_SpeculativeScheduler = DEBUG
+
+from constant import (
+    SPECULATIVE_GENERATION, SPECULATIVE_REGENERATE, SPECULATIVE_OTHER_STYLES, SPECULATIVE_HISTORY_PATH
+)
+from prompts import dico_styles
+from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper, GenerationCancelledError
+from comfy_classes.comfy_class_pool import ComfyBackendPool
+
+
+class SpeculativeJob:
+    """
+    A background render of one style for one capture, run on its own wrapper.
+    The wrapper can be handed to ImageGenerationThread once the guest asks for this style;
+    promote() then moves the render to the head of the ComfyUI queue if it is still waiting.
+    """
+
+    def __init__(self, style: str, input_image: QImage, pool: ComfyBackendPool) -> None:
+        """
+        Create the job; the render starts with start().
+        """
+        if DEBUG_SpeculativeJob:
+            logger.info(f"[DEBUG][SpeculativeJob] Entering __init__: args={{'style':{style!r}}}")
+        self.style = style
+        self.input_image = input_image
+        self.image_key = input_image.cacheKey()
+        # The input (face crop, encoding) is prepared in the job thread, not by the caller
+        self.wrapper = ImageGeneratorAPIWrapper(style=style, pool=pool)
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._discarded = False
+        # Set by promote() when it cancels the queued prompt to submit it again at the front
+        self._requeue = False
+        self._thread: Optional[threading.Thread] = None
+        if DEBUG_SpeculativeJob:
+            logger.info(f"[DEBUG][SpeculativeJob] Exiting __init__: return=None")
+
+    def start(self) -> None:
+        """
+        Submit the render in a background thread.
+        """
+        self._thread = threading.Thread(target=self._run, name=f"Speculative-{self.style}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Prepare the input and generate the image, keeping any error for the consumer.
+        """
+        try:
+            self.wrapper.set_img(self.input_image)
+            while True:
+                # After set_img, which forgets earlier cancels: a later cancel() stops the render
+                if self._discarded:
+                    raise GenerationCancelledError("Speculative render discarded before submission.")
+                try:
+                    self.wrapper.generate_image()
+                    break
+                except GenerationCancelledError:
+                    with self._lock:
+                        requeue, self._requeue = self._requeue and not self._discarded, False
+                    if not requeue:
+                        raise
+                    if DEBUG_SpeculativeJob:
+                        logger.info(f"[DEBUG][SpeculativeJob] Speculative '{self.style}' submitted again at the front")
+            if DEBUG_SpeculativeJob:
+                logger.info(f"[DEBUG][SpeculativeJob] Speculative '{self.style}' ready")
+        except Exception as e:
+            self.error = e
+            if DEBUG_SpeculativeJob:
+                logger.info(f"[DEBUG][SpeculativeJob] Speculative '{self.style}' ended: {e!r}")
+        finally:
+            self.done.set()
+            if self._discarded:
+                self.wrapper.delete_input_and_output_images()
+
+    def is_running_on(self, backend: object) -> bool:
+        """
+        True while the render is executing (not just queued) on backend.
+        """
+        wrapper = self.wrapper
+        return not self.done.is_set() and wrapper.execution_started and wrapper.backend is backend
+
+    def is_ready(self) -> bool:
+        """
+        True when the render finished with an image.
+        """
+        return self.done.is_set() and self.error is None and self.wrapper.result_image is not None
+
+    def wait(self) -> None:
+        """
+        Block until the render ends and re-raise its error, if any.
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def promote(self) -> None:
+        """
+        The guest asked for this style: submit it at the head of the queue from now on, and
+        move it there if it is still waiting behind other prompts. A prompt already executing
+        is left alone, restarting it would cost more than it saves.
+        """
+        wrapper = self.wrapper
+        with self._lock:
+            if self._discarded or self.done.is_set():
+                return
+            wrapper.front = True
+            queued = wrapper.prompt_id is not None and not wrapper.execution_started
+            if queued:
+                self._requeue = True
+        if queued:
+            if DEBUG_SpeculativeJob:
+                logger.info(f"[DEBUG][SpeculativeJob] Moving '{self.style}' to the front of the queue")
+            wrapper.cancel()
+
+    def cancel(self) -> None:
+        """
+        Discard the job: cancel the render on the ComfyUI server and drop its output.
+        """
+        with self._lock:
+            self._discarded = True
+        if self.done.is_set():
+            self.wrapper.delete_input_and_output_images()
+        else:
+            self.wrapper.cancel()
+
+
+class SpeculativeScheduler:
+    """
+    After a capture, queues low-priority renders of the styles the guest is most likely to ask
+    for next (another take of the current style, then the most popular ones) so they can be
+    served without waiting. Popularity is counted from real requests and kept in a JSON file.
+    """
+
+    def __init__(
+        self,
+        api: ImageGeneratorAPIWrapper,
+        history_path: str = SPECULATIVE_HISTORY_PATH,
+        enabled: bool = SPECULATIVE_GENERATION
+    ) -> None:
+        """
+        Initialize the scheduler for the wrapper of the real requests.
+        """
+        if DEBUG_SpeculativeScheduler:
+            logger.info(f"[DEBUG][SpeculativeScheduler] Entering __init__: args={{'history_path':{history_path!r}, 'enabled':{enabled}}}")
+        self.api = api
+        self.enabled = enabled
+        self._history_path = history_path
+        self._counts: Dict[str, int] = self._load_history()
+        self._jobs: Dict[str, SpeculativeJob] = {}
+        self._lock = threading.Lock()
+        if enabled:
+            # Real requests go to the head of the queue, ahead of speculative ones
+            api.front = True
+        if DEBUG_SpeculativeScheduler:
+            logger.info(f"[DEBUG][SpeculativeScheduler] Exiting __init__: counts={self._counts}")
+
+    def _load_history(self) -> Dict[str, int]:
+        """
+        Read the style request counts from disk.
+        """
+        try:
+            with open(self._history_path, encoding='utf-8') as f:
+                data = json.load(f)
+            return {k: int(v) for k, v in data.items() if k in dico_styles}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_history(self) -> None:
+        """
+        Write the style request counts to disk.
+        """
+        try:
+            tmp = self._history_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._counts, f, indent=2)
+            os.replace(tmp, self._history_path)
+        except OSError as e:
+            logger.info(f"[SpeculativeScheduler] Could not save style history: {e}")
+
+    def record_request(self, style: str) -> None:
+        """
+        Count a real request for style.
+        """
+        self._counts[style] = self._counts.get(style, 0) + 1
+        self._save_history()
+
+    def ranked_styles(self) -> List[str]:
+        """
+        Styles ordered by request count, most popular first (ties keep dico_styles order).
+        """
+        order = list(dico_styles)
+        return sorted(order, key=lambda s: (-self._counts.get(s, 0), order.index(s)))
+
+    def candidates(self, current_style: str) -> List[str]:
+        """
+        Styles worth rendering ahead for a capture currently shown in current_style.
+        """
+        styles = [current_style] if SPECULATIVE_REGENERATE else []
+        others = [s for s in self.ranked_styles() if s != current_style]
+        return styles + others[:SPECULATIVE_OTHER_STYLES]
+
+    def fill(self, input_image: QImage, current_style: str) -> None:
+        """
+        Queue the missing speculative renders for input_image.
+        """
+        if not self.enabled or input_image is None or input_image.isNull():
+            return
+        key = input_image.cacheKey()
+        with self._lock:
+            stale = [job for job in self._jobs.values() if job.image_key != key]
+            for job in stale:
+                del self._jobs[job.style]
+            new_jobs = []
+            for style in self.candidates(current_style):
+                if style not in self._jobs:
+                    job = SpeculativeJob(style, input_image, self.api.pool)
+                    self._jobs[style] = job
+                    new_jobs.append(job)
+        for job in stale:
+            job.cancel()
+        for job in new_jobs:
+            job.start()
+        if DEBUG_SpeculativeScheduler:
+            logger.info(f"[DEBUG][SpeculativeScheduler] Speculating {list(self._jobs)} (new: {[j.style for j in new_jobs]})")
+
+    def take(self, style: str, input_image: QImage) -> Optional[SpeculativeJob]:
+        """
+        Hand over the speculative render of style for input_image, if one exists, promoted to
+        the head of the queue so a hit is never slower than a miss. The renders that are no
+        longer useful (another capture, or a style out of the candidates) are cancelled on a
+        miss, and so is any speculative render executing on the backend the real request
+        waits for; the others stay queued behind it instead of being restarted by fill().
+        """
+        if not self.enabled:
+            return None
+        key = input_image.cacheKey() if input_image is not None else None
+        dropped: List[SpeculativeJob] = []
+        with self._lock:
+            job = self._jobs.get(style)
+            if job is not None and job.image_key == key and not (job.done.is_set() and not job.is_ready()):
+                del self._jobs[style]
+                if not job.done.is_set() and not job.wrapper.execution_started:
+                    # Promoted ahead of the queue, it still waits for the prompt executing there
+                    backend = job.wrapper.backend if job.wrapper.prompt_id is not None else self.api.pool.peek()
+                    dropped = [j for j in self._jobs.values() if j.is_running_on(backend)]
+            else:
+                job = None
+                keep = set(self.candidates(style))
+                # The real request goes to the head of the queue, but not ahead of the prompt
+                # already executing on its backend
+                backend = self.api.pool.peek()
+                dropped = [
+                    j for j in self._jobs.values()
+                    if j.image_key != key or j.style not in keep or j.style == style or j.is_running_on(backend)
+                ]
+            for j in dropped:
+                del self._jobs[j.style]
+        for j in dropped:
+            j.cancel()
+        if job is not None:
+            job.promote()
+            if DEBUG_SpeculativeScheduler:
+                logger.info(f"[DEBUG][SpeculativeScheduler] Serving '{style}' from speculation (ready={job.is_ready()})")
+        if dropped and DEBUG_SpeculativeScheduler:
+            logger.info(f"[DEBUG][SpeculativeScheduler] Request for '{style}', cancelled {[j.style for j in dropped]}")
+        return job
+
+    def cancel_all(self) -> None:
+        """
+        Cancel every pending speculative render.
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+        if jobs and DEBUG_SpeculativeScheduler:
+            logger.info(f"[DEBUG][SpeculativeScheduler] Cancelled {len(jobs)} speculative renders")
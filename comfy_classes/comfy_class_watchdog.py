@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_GenerationWatchdog = DEBUG
+
+from constant import GENERATION_STAGE_TIMEOUTS
+
+
+class GenerationTimeoutError(TimeoutError):
+    """
+    Raised when a generation stage overran its deadline; stage names the stage that overran.
+    """
+
+    def __init__(self, stage: str, message: Optional[str] = None) -> None:
+        super().__init__(message or f"Generation timed out during '{stage}'")
+        self.stage = stage
+
+
+class GenerationWatchdog:
+    """
+    Enforces one deadline per generation stage (connect, queue, execution, fetch) and an
+    overall deadline. A monitor thread calls on_breach(stage) as soon as the current stage
+    overruns; the owner is expected to cancel the job from that callback.
+    """
+
+    def __init__(
+        self,
+        total_timeout: float,
+        on_breach: Callable[[str], None],
+        stage_timeouts: Optional[Dict[str, float]] = None
+    ) -> None:
+        """
+        Initialize the watchdog; nothing is enforced before start().
+        """
+        if DEBUG_GenerationWatchdog:
+            logger.info(f"[DEBUG][GenerationWatchdog] Entering __init__: args={{'total_timeout':{total_timeout}}}")
+        self._stage_timeouts = dict(GENERATION_STAGE_TIMEOUTS if stage_timeouts is None else stage_timeouts)
+        self._total_timeout = total_timeout
+        self._on_breach = on_breach
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._started_at = 0.0
+        self._total_deadline = 0.0
+        self._stage: Optional[str] = None
+        self._stage_started = 0.0
+        self._deadline = 0.0
+        self.breached_stage: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        if DEBUG_GenerationWatchdog:
+            logger.info(f"[DEBUG][GenerationWatchdog] Exiting __init__: return=None")
+
+    def start(self, stage: str = 'connect') -> None:
+        """
+        Start the overall deadline and the first stage.
+        """
+        now = time.monotonic()
+        self._started_at = now
+        self._total_deadline = now + self._total_timeout
+        self.stage(stage)
+        self._thread = threading.Thread(target=self._run, name="GenerationWatchdog", daemon=True)
+        self._thread.start()
+
+    def stage(self, name: str) -> None:
+        """
+        Enter stage name: close the timing of the previous stage and arm the new deadline.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if self._stage == name:
+                return
+            if self._stage is not None:
+                self.timings[self._stage] = self.timings.get(self._stage, 0.0) + now - self._stage_started
+            self._stage = name
+            self._stage_started = now
+            limit = self._stage_timeouts.get(name)
+            stage_deadline = now + limit if limit else self._total_deadline
+            self._deadline = min(stage_deadline, self._total_deadline)
+            self._cond.notify_all()
+        if DEBUG_GenerationWatchdog:
+            logger.info(f"[DEBUG][GenerationWatchdog] Stage '{name}' armed for {self._deadline - now:.1f}s")
+
+    @property
+    def current_stage(self) -> Optional[str]:
+        """
+        Name of the stage being timed.
+        """
+        return self._stage
+
+    def remaining(self) -> float:
+        """
+        Seconds left before the current stage overruns (never negative).
+        """
+        return max(0.0, self._deadline - time.monotonic())
+
+    def stop(self) -> None:
+        """
+        Stop monitoring and close the timing of the current stage. Returns once a breach
+        callback that was already running has finished, so the caller can clean up after it.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            if self._stage is not None:
+                self.timings[self._stage] = self.timings.get(self._stage, 0.0) + now - self._stage_started
+            self.timings['total'] = now - self._started_at
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            # Woken up, the monitor exits at once unless it is calling on_breach
+            thread.join()
+
+    def _run(self) -> None:
+        """
+        Monitor loop: wait for the current deadline and report the first breach.
+        """
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                if now >= self._deadline:
+                    self.breached_stage = self._stage
+                    break
+                self._cond.wait(self._deadline - now)
+            stage = self.breached_stage
+        if stage is not None:
+            logger.info(f"[GenerationWatchdog] Stage '{stage}' overran its deadline, cancelling the generation.")
+            try:
+                self._on_breach(stage)
+            except Exception as e:
+                logger.info(f"[GenerationWatchdog] on_breach failed: {e!r}")
@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_CompiledWorkflow = DEBUG
+DEBUG_WorkflowRegistry = DEBUG
+
+from constant import COMFY_WORKFLOW_DIR, WORKFLOW_SAMPLING_SIZES
+from prompts import dico_styles
+
+TEXT_NODE_TYPES = ('textmultiline', 'textmultilinewidget', 'textmultilineprompt')
+SAMPLER_NODE_TYPES = ('KSampler', 'KSampler (Efficient)')
+# Inputs holding the size of the empty latent, per naming scheme (Efficient Loader, EmptyLatentImage)
+LATENT_SIZE_INPUTS = (('empty_latent_width', 'empty_latent_height'), ('width', 'height'))
+
+
+def is_api_workflow(graph: object) -> bool:
+    """
+    Return True for an API-format graph ({node_id: {'class_type', 'inputs'}}), False for UI exports.
+    """
+    if not isinstance(graph, dict) or not graph or 'nodes' in graph:
+        return False
+    return all(isinstance(node, dict) and 'class_type' in node for node in graph.values())
+
+
+class CompiledWorkflow:
+    """
+    An API-format workflow parsed once, with the node ids each prompt has to patch.
+    """
+
+    def __init__(self, name: str, graph: dict) -> None:
+        """
+        Index the nodes of graph by the substitution they need.
+        """
+        if DEBUG_CompiledWorkflow:
+            logger.info(f"[DEBUG][CompiledWorkflow] Entering __init__: args={{'name':{name!r}}}")
+        self.name = name
+        self.graph = graph
+        self.text_nodes: List[str] = []
+        self.seed_nodes: List[str] = []
+        self.preview_nodes: Set[str] = set()
+        self.image_nodes: List[str] = []
+        self.save_nodes: List[str] = []
+        self.latent_size_nodes: Dict[str, Tuple[str, str]] = {}
+        for nid, node in graph.items():
+            ctype = node.get('class_type', '')
+            inputs = node.get('inputs', {})
+            if ctype.lower().replace(' ', '') in TEXT_NODE_TYPES or ctype in ('Text Multiline', 'TextMultiLine'):
+                self.text_nodes.append(nid)
+            elif ctype in SAMPLER_NODE_TYPES:
+                self.seed_nodes.append(nid)
+                if 'preview_method' in inputs:
+                    self.preview_nodes.add(nid)
+            elif ctype == 'LoadImage':
+                self.image_nodes.append(nid)
+            elif ctype == 'SaveImage':
+                self.save_nodes.append(nid)
+            for keys in LATENT_SIZE_INPUTS:
+                if all(k in inputs for k in keys) and (ctype == 'EmptyLatentImage' or keys[0].startswith('empty_latent')):
+                    self.latent_size_nodes[nid] = keys
+                    break
+        # Resolution the input is prepared at; None when the workflow sizes its latent itself
+        size = WORKFLOW_SAMPLING_SIZES.get(name, WORKFLOW_SAMPLING_SIZES.get('default'))
+        self.sampling_size: Optional[Tuple[int, int]] = tuple(size) if size and self.latent_size_nodes else None
+        if DEBUG_CompiledWorkflow:
+            logger.info(
+                f"[DEBUG][CompiledWorkflow] Exiting __init__: text={self.text_nodes}, seed={self.seed_nodes}, "
+                f"image={self.image_nodes}, save={self.save_nodes}, sampling_size={self.sampling_size}"
+            )
+
+    def build(
+        self,
+        text: str,
+        image_ref: Optional[str],
+        output_mode: str = 'history',
+        seed: Optional[int] = None,
+        latent_size: Optional[Tuple[int, int]] = None
+    ) -> Tuple[dict, Set[str]]:
+        """
+        Return (prompt, websocket_save_node_ids): a shallow copy of the graph where only
+        the indexed nodes are replaced by patched copies. latent_size (w, h) replaces the
+        latent size the workflow derives from the input image.
+        """
+        prompt = dict(self.graph)
+
+        def patch(nid: str, **values) -> dict:
+            node = self.graph[nid]
+            patched = dict(node)
+            patched['inputs'] = {**node.get('inputs', {}), **values}
+            prompt[nid] = patched
+            return patched
+
+        for nid in self.text_nodes:
+            patch(nid, text=text)
+        for nid in self.seed_nodes:
+            values = {'seed': seed if seed is not None else random.randint(0, 2**32 - 1)}
+            if nid in self.preview_nodes:
+                values['preview_method'] = 'auto'
+            patch(nid, **values)
+        for nid in self.image_nodes:
+            patch(nid, image=image_ref)
+        if latent_size is not None:
+            for nid, (width_key, height_key) in self.latent_size_nodes.items():
+                patch(nid, **{width_key: int(latent_size[0]), height_key: int(latent_size[1])})
+
+        ws_save_nodes: Set[str] = set()
+        for nid in self.save_nodes:
+            if output_mode == 'websocket':
+                prompt[nid] = {'class_type': 'SaveImageWebsocket', 'inputs': {'images': self.graph[nid]['inputs']['images']}}
+                ws_save_nodes.add(nid)
+            else:
+                patch(nid, filename_prefix='output')
+        return prompt, ws_save_nodes
+
+
+class WorkflowRegistry:
+    """
+    Loads every API-format workflow of COMFY_WORKFLOW_DIR once and maps each style to
+    its '<style>.json' workflow, falling back to 'default.json'.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> "WorkflowRegistry":
+        """
+        Return the singleton instance of WorkflowRegistry.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, directory: str = COMFY_WORKFLOW_DIR) -> None:
+        """
+        Initialize the registry and load the workflows of directory.
+        """
+        if DEBUG_WorkflowRegistry:
+            logger.info(f"[DEBUG][WorkflowRegistry] Entering __init__: args={{'directory':{directory!r}}}")
+        self._directory = directory
+        self._workflows: Dict[str, CompiledWorkflow] = {}
+        self._by_style: Dict[str, CompiledWorkflow] = {}
+        self.reload()
+        if DEBUG_WorkflowRegistry:
+            logger.info(f"[DEBUG][WorkflowRegistry] Exiting __init__: return=None")
+
+    def reload(self) -> None:
+        """
+        (Re)load all workflow files and rebuild the style index.
+        """
+        if DEBUG_WorkflowRegistry:
+            logger.info(f"[DEBUG][WorkflowRegistry] Entering reload: args=()")
+        workflows: Dict[str, CompiledWorkflow] = {}
+        for path in sorted(glob.glob(os.path.join(self._directory, '*.json'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, encoding='utf-8') as f:
+                    graph = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.info(f"[WorkflowRegistry] Skipping unreadable workflow {path}: {e}")
+                continue
+            if not is_api_workflow(graph):
+                if DEBUG_WorkflowRegistry:
+                    logger.info(f"[DEBUG][WorkflowRegistry] Skipping {path}: not an API-format workflow")
+                continue
+            workflows[name] = CompiledWorkflow(name, graph)
+
+        by_style: Dict[str, CompiledWorkflow] = {}
+        for style in dico_styles:
+            workflow = workflows.get(style) or workflows.get('default')
+            if workflow is not None:
+                by_style[style] = workflow
+        self._workflows = workflows
+        self._by_style = by_style
+        if DEBUG_WorkflowRegistry:
+            logger.info(f"[DEBUG][WorkflowRegistry] Exiting reload: {len(workflows)} workflows, styles={ {s: w.name for s, w in by_style.items()} }")
+
+    def get(self, style: str) -> CompiledWorkflow:
+        """
+        Return the compiled workflow used for style.
+        """
+        workflow = self._by_style.get(style) or self._workflows.get(style) or self._workflows.get('default')
+        if workflow is None:
+            raise FileNotFoundError(f"No JSON found for {style}")
+        return workflow
+
+    def names(self) -> List[str]:
+        """
+        Return the names of the loaded workflows.
+        """
+        return list(self._workflows)
+
+
+workflow_registry = WorkflowRegistry.get_instance()
@@ -423,6 +423,57 @@ DEBUG_FULL = False
 WS_URL = "ws://127.0.0.1:8188/ws"
 HTTP_BASE_URL = "http://127.0.0.1:8188"
 
+# ComfyUI backends, each job goes to the one with the shortest expected wait.
+# Entries are HTTP base URLs or {"http": ..., "ws": ..., "name": ...} dicts (ws defaults to <http>/ws).
+COMFY_BACKENDS = [
+    {"http": HTTP_BASE_URL, "ws": WS_URL},
+]
+COMFY_HEALTH_CHECK_INTERVAL = 5
+COMFY_HEALTH_TIMEOUT = 2
+# Initial guess of one job duration (seconds), refined by measured jobs
+COMFY_JOB_SECONDS_ESTIMATE = 20
+
+# Persistent WebSocket session to ComfyUI (seconds)
+COMFY_CONNECT_TIMEOUT = 10
+COMFY_PING_INTERVAL = 15
+COMFY_RECONNECT_DELAY = 1.0
+COMFY_RECONNECT_DELAY_MAX = 10.0
+# How the final image comes back: "history" (SaveImage + /history + /view) or
+# "websocket" (SaveImage swapped for SaveImageWebsocket, image read from the binary frame;
+# needs the websocket_image_save custom node shipped with ComfyUI)
+COMFY_OUTPUT_MODE = "history"
+# Live latent previews sent during sampling: "overlay" (inside OverlayLoading),
+# "background" (as the window background) or "off"
+PREVIEW_MODE = "overlay"
+PREVIEW_MAX_FPS = 20
+# Relative cost of non-sampler nodes for the progress bar (sampler nodes weigh their step count)
+COMFY_NODE_WEIGHTS = {
+    "ImageUpscaleWithModel": 4,
+    "AIO_Preprocessor": 2,
+    "IPAdapterFaceID": 2,
+    "IPAdapterUnifiedLoaderFaceID": 1,
+    "Efficient Loader": 1,
+    "ControlNetLoader": 0.5,
+    "UpscaleModelLoader": 0.5,
+    "SaveImage": 0.5,
+    "SaveImageWebsocket": 0.3,
+    "PreviewImage": 0.3,
+}
+COMFY_NODE_WEIGHT_DEFAULT = 0.1
+# Generation deadlines (seconds) enforced by GenerationWatchdog; on breach the job is cancelled
+# and the photo falls back to the captured input image. GENERATION_TIMEOUT_MS caps the whole run.
+GENERATION_STAGE_TIMEOUTS = {
+    "connect": 10.0,    # WebSocket connection + input upload + /prompt submission
+    "queue": 60.0,      # waiting in the ComfyUI queue until execution starts
+    "execution": 60.0,  # running the workflow
+    "fetch": 10.0,      # /history + /view download of the result
+}
+GENERATION_TIMEOUT_MS = 120000
+# HTTP requests to ComfyUI (/prompt, /history, /view), seconds
+COMFY_HTTP_TIMEOUT = 10
+# /history is written just after execution_success, retry briefly until it appears
+COMFY_HISTORY_RETRY_INTERVAL = 0.05
+
 
 # File paths for images and workflows
 BASE_DIR = os.path.abspath(os.path.dirname(__file__)) # BASE_DIR is the photobooth directory
@@ -445,6 +496,46 @@ INPUT_IMAGE_PATH = os.path.abspath(
     os.path.join(COMFY_FOLDER, "input/input.png")
 )
 
+# The captured photo is encoded in memory and sent to ComfyUI's /upload/image.
+# Format is any Qt image writer format ("JPG", "PNG", "WEBP"), quality is 0-100 (-1 = Qt default).
+INPUT_IMAGE_FORMAT = "JPG"
+INPUT_IMAGE_QUALITY = 95
+# ComfyUI folder the upload goes to: "input" or "temp" (temp is emptied when ComfyUI restarts)
+COMFY_UPLOAD_TYPE = "temp"
+
+# Before upload, the capture is cropped to a padded portrait around the detected face(s) and
+# resized to the sampling resolution of the workflow, which then samples at that size instead of
+# deriving it from the camera resolution. Sizes are (width, height) per workflow name; workflows
+# not listed use "default", and workflows without a latent size input are sent uncropped.
+FACE_CROP_ENABLED = True
+WORKFLOW_SAMPLING_SIZES = {
+    "default": (512, 768),
+}
+# Margins around the union of the faces, as fractions of its width (sides) and height (above/below)
+FACE_CROP_SIDE_MARGIN = 0.8
+FACE_CROP_TOP_MARGIN = 0.6
+FACE_CROP_BOTTOM_MARGIN = 1.4
+# Face detection runs on a copy downscaled to this many pixels on the longest side
+FACE_DETECT_MAX_SIDE = 640
+# Haar cascade used for detection (None = OpenCV's haarcascade_frontalface_default.xml)
+FACE_CASCADE_PATH = None
+# Eye cascade used to tell open eyes (None = haarcascade_eye.xml next to the face cascade)
+EYE_CASCADE_PATH = None
+# Reject captures without a face before starting a generation, instead of letting the FaceID
+# node fail on the GPU. Captures are let through when no detector is available.
+FACE_GATE_ENABLED = True
+
+# Speculative pre-generation: after a capture, render in the background another take of the
+# current style and the SPECULATIVE_OTHER_STYLES most requested other styles, so "regenerate"
+# or a style change can be served at once. Costs GPU time, disabled by default.
+SPECULATIVE_GENERATION = False
+SPECULATIVE_REGENERATE = True
+SPECULATIVE_OTHER_STYLES = 2
+# Style request counts used to rank the styles
+SPECULATIVE_HISTORY_PATH = os.path.abspath(
+    os.path.join(BASE_DIR, "style_history.json")
+)
+
 
 KEEP_GENERATED_IMAGE = False
 KEEP_INPUT_IMAGE = False
@@ -453,6 +544,58 @@ KEEP_INPUT_IMAGE = False
 # Camera settings
 CAMERA_ID = 0
 CAMERA_ROTATE_ANGLE = 270    # Default camera rotation angle (0, 90, 180, 270)
+# Reusable frame buffers shared by the camera thread and the live background; when they are
+# all in use the camera drops frames rather than queueing them
+CAMERA_FRAME_POOL_SIZE = 3
+# The frame clock drives the live view, the countdown, the overlays and the scroll animation.
+# It ticks at FRAME_CLOCK_IDLE_FPS, at FRAME_CLOCK_ANIMATION_FPS during the screen transitions,
+# and stops when nothing is animating. Subscribers get the time since their last call, capped
+# at FRAME_CLOCK_MAX_DT seconds so animations do not jump after a stall.
+FRAME_CLOCK_IDLE_FPS = 20
+FRAME_CLOCK_ANIMATION_FPS = 80
+FRAME_CLOCK_MAX_DT = 0.1
+# Captured and generated backgrounds are composed once per (image, mode, rotation, label size);
+# this many compositions are kept, enough to switch back and forth between the photo and the result
+BACKGROUND_RENDER_CACHE_SIZE = 4
+# At first start the camera's modes are probed (every resolution level in each pixel format,
+# measuring the frame rate it really delivers) and the choice is cached per device. MJPEG is
+# used when it is at least CAMERA_MJPEG_MIN_GAIN times faster than the uncompressed format.
+# Delete the cache file to probe again after changing the camera.
+CAMERA_PROBE_ENABLED = True
+CAMERA_PROBE_FOURCCS = ("YUYV", "MJPG")
+CAMERA_PROBE_FRAMES = 8
+CAMERA_PROBE_MAX_SECONDS = 2.0
+CAMERA_PROBE_REQUEST_FPS = 60
+CAMERA_MJPEG_MIN_GAIN = 1.1
+CAMERA_MODES_CACHE_PATH = os.path.abspath(
+    os.path.join(BASE_DIR, "camera_modes.json")
+)
+# Frames queued in the driver; 1 keeps the preview and the stills as fresh as possible
+CAMERA_BUFFER_SIZE = 1
+
+# Dual-stream capture: the live background runs at CAMERA_PREVIEW_LEVEL (see
+# CameraCaptureThread.RESOLUTIONS), and at the end of the countdown the camera switches to
+# CAMERA_STILL_LEVEL for a short burst of full-resolution stills sent to the workflow. The first
+# CAMERA_STILL_WARMUP_FRAMES after the switch are dropped while the driver and exposure settle.
+# Falls back to the preview frame when no still arrives within CAMERA_STILL_TIMEOUT_MS.
+CAMERA_DUAL_STREAM = True
+CAMERA_PREVIEW_LEVEL = 1
+CAMERA_STILL_LEVEL = 3
+CAMERA_STILL_WARMUP_FRAMES = 3
+CAMERA_STILL_BURST = 3
+CAMERA_STILL_TIMEOUT_MS = 3000
+
+# Best-frame selection: during the countdown the camera thread keeps the last
+# BEST_FRAME_BUFFER_SIZE frames, and the capture takes the best of them (sharpness of the face,
+# face size, open eyes) instead of whatever preview frame came last.
+BEST_FRAME_ENABLED = True
+BEST_FRAME_BUFFER_SIZE = 8
+# Frames are scored on grayscale copies downscaled to this many pixels on the longest side
+BEST_FRAME_SCORE_SIDE = 640
+# Scoring time budget: face and eyes are checked on the sharpest frames first, the rest are skipped
+BEST_FRAME_BUDGET_MS = 12
+# Weights of the score terms (each term is in 0..1)
+BEST_FRAME_WEIGHTS = {"sharpness": 0.5, "face": 0.2, "eyes": 0.3}
 
 
 
@@ -1,11 +1,17 @@
 import sys
-from PySide6.QtCore import Qt, QObject, QMutex, QMutexLocker
-from PySide6.QtGui import QImage, QPixmap, QPainter, QTransform
-from PySide6.QtWidgets import QApplication, QLabel, QWidget, QVBoxLayout
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from PySide6.QtCore import Qt, QObject, QMutex, QMutexLocker, QTimer, QRect
+from PySide6.QtGui import QImage, QPixmap, QTransform
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout
 
 from gui_classes.gui_manager.thread_manager import CameraCaptureThread
+from gui_classes.gui_manager.frame_clock import FrameClock, PRIORITY_VIEW
+from gui_classes.gui_object.camera_view import CameraView
 
-from constant import CAMERA_ID, CAMERA_ROTATE_ANGLE
+from constant import CAMERA_ID, CAMERA_ROTATE_ANGLE, BEST_FRAME_ENABLED
+from constant import CAMERA_DUAL_STREAM, CAMERA_PREVIEW_LEVEL, CAMERA_STILL_TIMEOUT_MS
+from constant import BACKGROUND_RENDER_CACHE_SIZE
 
 import logging
 logger = logging.getLogger(__name__)
@@ -18,81 +24,66 @@ DEBUG_BackgroundManager_FULL = DEBUG_FULL
 class BackgroundManager(QObject):
     def __init__(
         self,
-        label: QLabel,
+        view: CameraView,
         gradient_path: str = './gui_template/gradient/gradient_1.png',
         resolution_level: int = 0,
         rotation: int = CAMERA_ROTATE_ANGLE, # degrees: 0, 90, 180, 270
         parent=None
     ) -> None:
         """
-        Initialize the BackgroundManager with a label, gradient path, resolution, rotation, and optional parent.
+        Initialize the BackgroundManager with a camera view, gradient path, resolution, rotation, and optional parent.
         """
         if DEBUG_BackgroundManager:
-            logger.info(f"[DEBUG][BackgroundManager] Entering __init__: args=({label!r}, {gradient_path!r}, {resolution_level!r}, {rotation!r}, {parent!r})")
+            logger.info(f"[DEBUG][BackgroundManager] Entering __init__: args=({view!r}, {gradient_path!r}, {resolution_level!r}, {rotation!r}, {parent!r})")
         super().__init__(parent)
-        self.label = label
+        self.view = view
         self.rotation = rotation
         self.gradient_path = gradient_path
         self._mutex = QMutex()
         self._show_gradient = True 
 
-        self.label.setAttribute(Qt.WA_OpaquePaintEvent)
-
-        self.gradient_label = QLabel(self.label.parent())
-        self.gradient_label.setAttribute(Qt.WA_TranslucentBackground)
-        self.gradient_label.setStyleSheet("background: transparent;")
         self._init_gradient()
         self.thread = CameraCaptureThread(camera_id=CAMERA_ID)
         self.thread.set_resolution_level(resolution_level)
-        self.thread.frame_ready.connect(self._on_frame_ready)
+        self.thread.still_ready.connect(self._on_still_ready)
+        self._sync_view()
         self.thread.start()
+        self._still_callback: Optional[Callable[[], None]] = None
+        self._still_request = 0
+        # Frame clock pulling the live view from the camera mailbox, from preset() to on_leave()
+        self._clock: Optional[FrameClock] = None
 
         self.last_camera: QPixmap | None = None
         self.captured: QPixmap | None = None
         self.generated: QPixmap | None = None
         self.current: str = 'live'
+        # QImage.cacheKey() of the images captured and generated come from, so setting the
+        # same image again keeps its pixmap (and its cached renderings)
+        self._source_keys = {'captured': None, 'generated': None}
+        # Static modes drawn on the view: the picture scaled to the view height, with the source
+        # and target rects cropping or letterboxing it, keyed by (source, mode, rotation, view size)
+        self._render_cache: "OrderedDict[tuple, Tuple[QPixmap, QRect, QRect]]" = OrderedDict()
+        self._shown_key: Optional[tuple] = None
+        self.render_hits = 0
+        self.render_misses = 0
+        self._update_pulling()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting __init__: return=None")
 
     def _init_gradient(self) -> None:
         """
-        Load and size the gradient overlay once.
+        Load the gradient overlay once; the view draws it over the picture.
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering _init_gradient: args=()")
         pixmap = QPixmap(self.gradient_path)
         if pixmap.isNull():
             return
-        geom = self.label.geometry()
-        self.gradient_label.setGeometry(geom)
-        self._gradient_pixmap = pixmap
-        self._resize_gradient()
-        self.gradient_label.lower()
-        
-        if not self._show_gradient:
-            self.gradient_label.hide()
-        
+        self.view.set_gradient(pixmap)
+        self.view.show_gradient(self._show_gradient)
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting _init_gradient: return=None")
 
-    def _resize_gradient(self) -> None:
-        """
-        Resize the gradient overlay without reloading it.
-        """
-        if DEBUG_BackgroundManager:
-            logger.info(f"[DEBUG][BackgroundManager] Entering _resize_gradient: args=()")
-        if not hasattr(self, '_gradient_pixmap'):
-            return
-        geom = self.label.geometry()
-        scaled = self._gradient_pixmap.scaled(
-            geom.width(), geom.height(),
-            Qt.IgnoreAspectRatio, Qt.SmoothTransformation
-        )
-        self.gradient_label.setPixmap(scaled)
-        self.gradient_label.setGeometry(geom)
-        if DEBUG_BackgroundManager:
-            logger.info(f"[DEBUG][BackgroundManager] Exiting _resize_gradient: return=None")
-
     def show_gradient(self, show: bool) -> None:
         """
         Show or hide the gradient overlay.
@@ -101,10 +92,7 @@ class BackgroundManager(QObject):
             logger.info(f"[DEBUG][BackgroundManager] Entering show_gradient: args=({show})")
         with QMutexLocker(self._mutex):
             self._show_gradient = show
-            if show:
-                self.gradient_label.show()
-            else:
-                self.gradient_label.hide()
+        self.view.show_gradient(show)
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting show_gradient: return=None")
 
@@ -119,21 +107,51 @@ class BackgroundManager(QObject):
                 self.rotation = angle
                 if DEBUG_BackgroundManager:
                     logger.info(f"[DEBUG][BackgroundManager] Rotation set to {angle}°")
+            self._sync_view()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting set_rotation: return=None")
 
-    def _on_frame_ready(self, qimg: QImage) -> None:
+    def _sync_view(self) -> None:
+        """
+        Tell the camera thread the view geometry and rotation to fit live frames to.
+        """
+        self.thread.set_view(self.view.width(), self.view.height(), self.rotation)
+
+    def _update_pulling(self) -> None:
         """
-        Handle a new frame from the camera thread.
+        Pull live frames on the frame clock only while the live view is shown. The captured and
+        generated modes do not animate, and the camera thread stops decoding frames for the view.
         """
+        with QMutexLocker(self._mutex):
+            pulling = self.current == 'live' and self._clock is not None
+        self.thread.set_live_view(pulling)
+        if self._clock is None:
+            return
+        if pulling:
+            self._clock.subscribe(self.pull_frame, PRIORITY_VIEW)
+        else:
+            self._clock.unsubscribe(self.pull_frame)
+
+    def pull_frame(self, dt: float = 0.0) -> None:
+        """
+        Frame clock tick: show the latest camera frame, if a new one arrived since the last tick.
+        Frames that came in between were already dropped by the mailbox.
+        """
+        item = self.thread.mailbox.take()
+        if item is None:
+            return
+        qimg, slot = item
         if DEBUG_BackgroundManager_FULL:
-            logger.info(f"[DEBUG][BackgroundManager] Entering _on_frame_ready: args=({qimg!r})")
-        pix = QPixmap.fromImage(qimg)
+            logger.info(f"[DEBUG][BackgroundManager] Entering pull_frame: frame=({qimg!r}, {slot})")
+        try:
+            pix = QPixmap.fromImage(qimg)
+        finally:
+            self.thread.release_frame(slot)
         with QMutexLocker(self._mutex):
             self.last_camera = pix
         self._update_view()
         if DEBUG_BackgroundManager_FULL:
-            logger.info(f"[DEBUG][BackgroundManager] Exiting _on_frame_ready: return=None")
+            logger.info(f"[DEBUG][BackgroundManager] Exiting pull_frame: return=None")
 
     def set_live(self) -> None:
         """
@@ -141,29 +159,101 @@ class BackgroundManager(QObject):
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering set_live: args=()")
+        self.thread.frame_buffer.disarm()
+        # A still still on its way belongs to a capture that was abandoned
+        self._still_callback = None
         with QMutexLocker(self._mutex):
             self.current = 'live'
+        self._update_pulling()
         self._update_view()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting set_live: return=None")
 
+    def arm_capture(self) -> None:
+        """
+        Start buffering camera frames so the next capture can pick the best one.
+        """
+        if DEBUG_BackgroundManager:
+            logger.info(f"[DEBUG][BackgroundManager] Entering arm_capture: args=()")
+        if BEST_FRAME_ENABLED:
+            self.thread.frame_buffer.arm(self.rotation)
+        if DEBUG_BackgroundManager:
+            logger.info(f"[DEBUG][BackgroundManager] Exiting arm_capture: return=None")
+
     def capture(self, qimage: QImage = None) -> None:
         """
-        Capture the current camera frame.
+        Capture the best buffered camera frame, or the current one when nothing is buffered.
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering capture: args=()")
+        best = None
+        if qimage is None and self.thread.frame_buffer.armed:
+            best = self.thread.frame_buffer.select_best()
+            self.thread.frame_buffer.disarm()
+        if qimage is None and best is None:
+            # The live view only holds frames fitted to the screen
+            best = self.thread.latest_frame()
         with QMutexLocker(self._mutex):
             if qimage is not None:
-                pix = QPixmap.fromImage(qimage)
-                self.captured = pix
-            elif self.last_camera:
-                pix = QPixmap(self.last_camera)
-                self.captured = pix
+                if self.captured is None or qimage.cacheKey() != self._source_keys['captured']:
+                    self.captured = QPixmap.fromImage(qimage)
+                    self._source_keys['captured'] = qimage.cacheKey()
+            elif best is not None:
+                self.captured = QPixmap.fromImage(best)
+                self._source_keys['captured'] = best.cacheKey()
             self.current = 'captured'
+        self._update_pulling()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting capture: return=None")
 
+    def capture_still(self, on_ready: Callable[[], None]) -> None:
+        """
+        Capture a full-resolution still from the camera, then call on_ready in the GUI thread.
+        Without dual-stream capture, or when the still does not come in time, the best
+        preview frame is captured instead.
+        """
+        if DEBUG_BackgroundManager:
+            logger.info(f"[DEBUG][BackgroundManager] Entering capture_still: args=({on_ready})")
+        if not CAMERA_DUAL_STREAM or not self.thread.isRunning():
+            self.capture()
+            on_ready()
+            if DEBUG_BackgroundManager:
+                logger.info(f"[DEBUG][BackgroundManager] Exiting capture_still: return=None (preview frame)")
+            return
+        self._still_request += 1
+        request = self._still_request
+        self._still_callback = on_ready
+        self.thread.request_still()
+        QTimer.singleShot(CAMERA_STILL_TIMEOUT_MS, lambda: self._on_still_timeout(request))
+        if DEBUG_BackgroundManager:
+            logger.info(f"[DEBUG][BackgroundManager] Exiting capture_still: return=None")
+
+    def _on_still_ready(self, qimg: QImage) -> None:
+        """
+        Handle the still from the camera thread; a null image falls back to the preview frame.
+        """
+        callback, self._still_callback = self._still_callback, None
+        if callback is None:
+            # Arrived after the timeout fallback
+            return
+        if qimg.isNull():
+            self.capture()
+        else:
+            self.thread.frame_buffer.disarm()
+            self.capture(qimg)
+        callback()
+
+    def _on_still_timeout(self, request: int) -> None:
+        """
+        Capture the preview frame when the still of request did not arrive in time.
+        """
+        if request != self._still_request or self._still_callback is None:
+            return
+        logger.info(f"[BackgroundManager] No still after {CAMERA_STILL_TIMEOUT_MS} ms, using the preview frame")
+        callback, self._still_callback = self._still_callback, None
+        self.capture()
+        callback()
+
     def set_generated(self, qimage: QImage) -> None:
         """
         Set the generated image and update the view.
@@ -171,8 +261,11 @@ class BackgroundManager(QObject):
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering set_generated: args=({qimage!r})")
         with QMutexLocker(self._mutex):
-            self.generated = QPixmap.fromImage(qimage)
+            if self.generated is None or qimage.cacheKey() != self._source_keys['generated']:
+                self.generated = QPixmap.fromImage(qimage)
+                self._source_keys['generated'] = qimage.cacheKey()
             self.current = 'generated'
+        self._update_pulling()
         self._update_view()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting set_generated: return=None")
@@ -198,7 +291,10 @@ class BackgroundManager(QObject):
         with QMutexLocker(self._mutex):
             self.captured = None
             self.generated = None
+            self._source_keys = {'captured': None, 'generated': None}
             self.current = 'live'
+        self._render_cache.clear()
+        self._update_pulling()
         self._update_view()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting cleanup: return=None")
@@ -232,25 +328,44 @@ class BackgroundManager(QObject):
 
     def _render_camera(self, pix: QPixmap) -> None:
         """
-        Render the given QPixmap to the label, applying rotation and scaling.
+        Show the given QPixmap on the view. Live frames come rotated and fitted to the view by
+        the camera thread and are drawn as they are; captured and generated images are scaled
+        to the view height once, then cropped or letterboxed by the view as it draws them.
         """
         if DEBUG_BackgroundManager_FULL:
             logger.info(f"[DEBUG][BackgroundManager] Entering _render_camera: args=({pix!r})")
         if pix is None:
             if DEBUG_BackgroundManager_FULL:
-                logger.info(f"[DEBUG][BackgroundManager] No pixmap to render, clearing label")
-            self.label.clear()
+                logger.info(f"[DEBUG][BackgroundManager] No pixmap to render, clearing view")
+            self._shown_key = None
+            self.view.clear()
             return
-        apply_rotation = False
         with QMutexLocker(self._mutex):
-            if self.current in ('live'):
-                apply_rotation = True
-        if apply_rotation and self.rotation:
-            pix = pix.transformed(
-                QTransform().rotate(self.rotation),
-                Qt.SmoothTransformation
-            )
-        lw, lh = self.label.width(), self.label.height()
+            live = pix is self.last_camera
+            mode = self.current
+            source = self._source_keys.get(mode)
+        if live:
+            # A frame fitted to the previous geometry is stretched until the camera thread catches up
+            self._shown_key = None
+            self.view.show_pixmap(pix)
+            if DEBUG_BackgroundManager_FULL:
+                logger.info(f"[DEBUG][BackgroundManager] Exiting _render_camera: return=None")
+            return
+        lw, lh = self.view.width(), self.view.height()
+        # The source image identifies the picture even when its pixmap was converted again
+        key = (('image', source) if source is not None else ('pixmap', pix.cacheKey()), mode, self.rotation, lw, lh)
+        if key == self._shown_key:
+            # Already on the view
+            self.render_hits += 1
+            return
+        rendered = self._render_cache.get(key)
+        if rendered is not None:
+            self.render_hits += 1
+            self._render_cache.move_to_end(key)
+            self._shown_key = key
+            self.view.show_pixmap(*rendered)
+            return
+        self.render_misses += 1
         ow, oh = pix.width(), pix.height()
         factor = lh / oh
         nw = int(ow * factor)
@@ -259,25 +374,24 @@ class BackgroundManager(QObject):
             Qt.IgnoreAspectRatio, Qt.SmoothTransformation
         )
         if nw < lw:
-            result = QPixmap(lw, lh)
-            result.fill(Qt.black)
-            painter = QPainter(result)
-            painter.drawPixmap((lw - nw) // 2, 0, scaled)
-            painter.end()
+            rendered = (scaled, scaled.rect(), QRect((lw - nw) // 2, 0, nw, lh))
         else:
-            x = (nw - lw) // 2
-            result = scaled.copy(x, 0, lw, lh)
-        self.label.setPixmap(result)
+            rendered = (scaled, QRect((nw - lw) // 2, 0, lw, lh), QRect(0, 0, lw, lh))
+        self._render_cache[key] = rendered
+        while len(self._render_cache) > BACKGROUND_RENDER_CACHE_SIZE:
+            self._render_cache.popitem(last=False)
+        self._shown_key = key
+        self.view.show_pixmap(*rendered)
         if DEBUG_BackgroundManager_FULL:
             logger.info(f"[DEBUG][BackgroundManager] Exiting _render_camera: return=None")
 
     def resize_event(self) -> None:
         """
-        Should be called on parent resize to adjust gradient and camera view.
+        Should be called on parent resize to adjust the camera view.
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering resize_event: args=()")
-        self._resize_gradient()
+        self._sync_view()
         self._update_view()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting resize_event: return=None")
@@ -298,7 +412,11 @@ class BackgroundManager(QObject):
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering close: args=()")
+        if self._clock is not None:
+            self._clock.unsubscribe(self.pull_frame)
+        self.thread.frame_buffer.close()
         self.thread.stop()
+        self.thread.mailbox.clear()
         self.thread.wait()
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting close: return=None")
@@ -310,7 +428,10 @@ class BackgroundManager(QObject):
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering get_background_image: args=()")
         pix = self.get_pixmap()
-        if pix and self.rotation:
+        with QMutexLocker(self._mutex):
+            # Live frames are already rotated by the camera thread
+            live = pix is self.last_camera
+        if pix and self.rotation and not live:
             if DEBUG_BackgroundManager:
                 logger.info(f"[DEBUG][BackgroundManager] Applying rotation: {self.rotation} degrees")
             return pix.transformed(QTransform().rotate(self.rotation), Qt.SmoothTransformation)            
@@ -343,31 +464,42 @@ class BackgroundManager(QObject):
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] on_enter: gradient ON, resolution 2 (FullHD)")
 
-    def on_leave(self, timer=None) -> None:
+    def on_leave(self, timer: Optional[FrameClock] = None) -> None:
         """
-        Call when leaving the view: hide gradient, set camera to low resolution, and unsubscribe from timer if provided.
+        Call when leaving the view: hide gradient, set camera to low resolution, and stop pulling frames.
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering on_leave: args=({timer})")
         self.show_gradient(False)
         self.set_camera_resolution(0)
+        timer = timer or self._clock
         if timer is not None:
-            timer.unsubscribe(self.update_background)
+            timer.unsubscribe(self.pull_frame)
+        self._clock = None
+        self._update_pulling()
+        self.thread.mailbox.clear()
+        stats = self.thread.mailbox.stats()
+        logger.info(
+            f"[BackgroundManager] Live view frames: {stats['taken']} shown, {stats['dropped']} superseded, "
+            f"{stats['no_buffer']} skipped by the camera; background renders: {self.render_hits} cached, "
+            f"{self.render_misses} composed"
+        )
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] on_leave: gradient OFF, resolution 0 (low)")
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Exiting on_leave: return=None")
 
-    def preset(self, timer=None):
+    def preset(self, timer: Optional[FrameClock] = None):
         """
-        Subscribe update_background to the given timer and set camera to high resolution.
+        Pull live frames on the given frame clock (the shared one by default) and set camera to the preview resolution.
         """
         if DEBUG_BackgroundManager:
             logger.info(f"[DEBUG][BackgroundManager] Entering preset: args=({timer})")
-        self.set_camera_resolution(2)
-        if timer is not None:
-            if DEBUG_BackgroundManager:
-                logger.info(f"[DEBUG][BackgroundManager] Subscribing to timer for background updates")
-            timer.subscribe(self.update_background)
-        if DEBUG_BackgroundManager:
-            logger.info(f"[DEBUG][BackgroundManager] preset: resolution 2 (FullHD), timer subscribed")
+        # With dual-stream capture the photo comes from a full-resolution still, the preview can stay light
+        self.set_camera_resolution(CAMERA_PREVIEW_LEVEL if CAMERA_DUAL_STREAM else 2)
+        if self._clock is not None and self._clock is not timer:
+            self._clock.unsubscribe(self.pull_frame)
+        self._clock = timer or FrameClock.get_instance()
+        self._update_pulling()
+        if DEBUG_BackgroundManager:
+            logger.info(f"[DEBUG][BackgroundManager] preset: preview resolution set, timer subscribed")
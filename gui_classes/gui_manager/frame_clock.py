@@ -0,0 +1,197 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+from PySide6.QtCore import Qt, QObject, QTimer
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_FrameClock = DEBUG
+DEBUG_FrameClock_FULL = DEBUG_FULL
+
+from constant import FRAME_CLOCK_IDLE_FPS, FRAME_CLOCK_MAX_DT
+
+# Subscribers run in priority order, lowest first: timing (countdown) before the views.
+# Requested frames (the coalesced renders) run after all of them, so they see what the
+# others changed during the tick
+PRIORITY_TIMING = 0
+PRIORITY_VIEW = 10
+
+
+class FrameClock(QObject):
+    """
+    The GUI frame clock: one precise timer calling its subscribers, in priority order, with
+    the time elapsed since their previous call, and accounting what each of them costs.
+    The timer stops when nobody is subscribed and no frame is requested, so a screen with
+    nothing to animate does not wake up.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> "FrameClock":
+        """
+        Return the singleton instance of FrameClock.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, fps: int = FRAME_CLOCK_IDLE_FPS, parent: Optional[QObject] = None) -> None:
+        """
+        Initialize an idle clock ticking at fps once something subscribes.
+        """
+        if DEBUG_FrameClock:
+            logger.info(f"[DEBUG][FrameClock] Entering __init__: args={{'fps':{fps!r}}}")
+        super().__init__(parent)
+        self._fps = fps if fps > 0 else FRAME_CLOCK_IDLE_FPS
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(int(1000 / self._fps))
+        self._timer.timeout.connect(self._tick)
+        # Subscriber records (func, priority, order of subscription, time of the last call),
+        # kept sorted by (priority, order); costs are counted per callback name
+        self._subscribers: List[dict] = []
+        self._requests: List[Callable[[float], None]] = []
+        self._order = 0
+        self._costs: Dict[str, List[float]] = {}
+        self._last_tick = None
+        self.ticks = 0
+        self.overruns = 0
+        if DEBUG_FrameClock:
+            logger.info(f"[DEBUG][FrameClock] Exiting __init__: return=None")
+
+    @property
+    def running(self) -> bool:
+        return self._timer.isActive()
+
+    def subscribe(self, func: Callable[[float], None], priority: int = PRIORITY_VIEW) -> None:
+        """
+        Call func(dt) on every tick, dt being the seconds since its previous call.
+        """
+        if any(s['func'] == func for s in self._subscribers):
+            return
+        self._order += 1
+        self._subscribers.append({'func': func, 'priority': priority, 'order': self._order, 'last': None})
+        self._subscribers.sort(key=lambda s: (s['priority'], s['order']))
+        if DEBUG_FrameClock:
+            logger.info(f"[DEBUG][FrameClock] Subscribed: {self._name(func)} (priority {priority})")
+        self._wake()
+
+    def unsubscribe(self, func: Callable[[float], None]) -> None:
+        """
+        Stop calling a subscribed func; the clock goes idle with its last subscriber.
+        """
+        for sub in self._subscribers:
+            if sub['func'] == func:
+                # Not called any more, even later in the tick running now
+                sub['removed'] = True
+                self._subscribers.remove(sub)
+                if DEBUG_FrameClock:
+                    logger.info(f"[DEBUG][FrameClock] Unsubscribed: {self._name(func)}")
+                break
+
+    def request_frame(self, func: Callable[[float], None]) -> None:
+        """
+        Call func(dt) once, on the next tick, after the subscribers. Requesting it again before
+        that tick does not call it twice.
+        """
+        if func not in self._requests:
+            self._requests.append(func)
+        self._wake()
+
+    def set_fps(self, fps: int) -> None:
+        """
+        Set the frames per second of the clock.
+        """
+        if DEBUG_FrameClock:
+            logger.info(f"[DEBUG][FrameClock] Entering set_fps: args={{'fps':{fps!r}}}")
+        self._fps = fps if fps > 0 else FRAME_CLOCK_IDLE_FPS
+        self._timer.setInterval(int(1000 / self._fps))
+
+    def get_fps(self) -> int:
+        """
+        Get the current frames per second value.
+        """
+        return self._fps
+
+    def _wake(self) -> None:
+        """
+        Start an idle clock, with a first tick as soon as the event loop is back.
+        """
+        if not self._timer.isActive():
+            self._last_tick = None
+            self._timer.start(0)
+
+    def _tick(self) -> None:
+        """
+        Call the subscribers, then the requested frames, and go idle when nothing is left.
+        """
+        now = time.perf_counter()
+        interval = 1.0 / self._fps
+        if self._timer.interval() != int(1000 / self._fps):
+            # First tick after waking up
+            self._timer.setInterval(int(1000 / self._fps))
+        self.ticks += 1
+        for sub in list(self._subscribers):
+            if sub.get('removed'):
+                continue
+            dt = min(FRAME_CLOCK_MAX_DT, now - sub['last']) if sub['last'] is not None else interval
+            sub['last'] = now
+            self._call(sub['func'], dt)
+        requests, self._requests = self._requests, []
+        for func in requests:
+            self._call(func, interval if self._last_tick is None else min(FRAME_CLOCK_MAX_DT, now - self._last_tick))
+        self._last_tick = now
+        if time.perf_counter() - now > interval:
+            self.overruns += 1
+            if DEBUG_FrameClock_FULL:
+                logger.info(f"[DEBUG][FrameClock] Tick took {(time.perf_counter() - now) * 1000:.1f} ms, over the {interval * 1000:.1f} ms frame")
+        if not self._subscribers and not self._requests:
+            self._timer.stop()
+            if DEBUG_FrameClock_FULL:
+                logger.info(f"[DEBUG][FrameClock] Nothing to animate, idle")
+
+    def _call(self, func: Callable[[float], None], dt: float) -> None:
+        """
+        Call func(dt), adding its duration to its cost counters.
+        """
+        started = time.perf_counter()
+        try:
+            func(dt)
+        except Exception as e:
+            if DEBUG_FrameClock_FULL:
+                logger.info(f"[DEBUG][FrameClock] Exception in subscriber {func}: {e}")
+        elapsed = time.perf_counter() - started
+        cost = self._costs.setdefault(self._name(func), [0, 0.0, 0.0])
+        cost[0] += 1
+        cost[1] += elapsed
+        cost[2] = max(cost[2], elapsed)
+
+    @staticmethod
+    def _name(func: Callable) -> str:
+        return getattr(func, '__qualname__', repr(func))
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Cost of each subscriber since the last reset: calls, total and worst milliseconds.
+        """
+        return {
+            name: {'calls': calls, 'total_ms': total * 1000, 'max_ms': worst * 1000}
+            for name, (calls, total, worst) in self._costs.items()
+        }
+
+    def log_stats(self, reset: bool = True) -> None:
+        """
+        Log the cost of every subscriber, most expensive first, and optionally reset the counters.
+        """
+        costs = sorted(self.stats().items(), key=lambda item: -item[1]['total_ms'])
+        summary = ', '.join(
+            f"{name} {c['calls']}x avg {c['total_ms'] / c['calls']:.2f} ms max {c['max_ms']:.1f} ms"
+            for name, c in costs if c['calls']
+        )
+        logger.info(f"[FrameClock] {self.ticks} ticks, {self.overruns} over budget: {summary or 'idle'}")
+        if reset:
+            self._costs.clear()
+            self.ticks = 0
+            self.overruns = 0
@@ -1,22 +1,33 @@
 import os
 import glob
+import threading
 import time
 import cv2
+from typing import Optional
 from PySide6.QtCore import Qt, QObject, QThread, Signal, QTimer
 from PySide6.QtGui import QImage, QPixmap, QPainter, QTransform
 from PySide6.QtWidgets import QApplication, QLabel, QPushButton, QVBoxLayout, QWidget, QHBoxLayout, QComboBox
-from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper
+from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper, GenerationCancelledError
+from comfy_classes.comfy_class_watchdog import GenerationTimeoutError
+from comfy_classes.comfy_class_speculative import SpeculativeJob
 from gui_classes.gui_object.overlay import OverlayCountdown, OverlayLoading
+from gui_classes.gui_manager.frame_clock import FrameClock, PRIORITY_TIMING
+from gui_classes.gui_object.frame_buffer import FrameBuffer
+from gui_classes.gui_object.frame_pool import FramePool, FrameMailbox
+from gui_classes.gui_object.frame_fit import FrameFitter
+from gui_classes.gui_object.camera_probe import negotiate_modes, apply_mode
 from gui_classes.gui_object.toolbox import ImageUtils
 from hotspot_classes.hotspot_client import HotspotClient
-from constant import KEEP_GENERATED_IMAGE
+from constant import KEEP_GENERATED_IMAGE, PREVIEW_MODE
+from constant import CAMERA_STILL_LEVEL, CAMERA_STILL_WARMUP_FRAMES, CAMERA_STILL_BURST
+from constant import CAMERA_PROBE_ENABLED, CAMERA_BUFFER_SIZE
 
 import logging
 logger = logging.getLogger(__name__)
 
 from constant import DEBUG, DEBUG_FULL
-DEBUG_CountdownThread = DEBUG
-DEBUG_CountdownThread_FULL = DEBUG_FULL
+DEBUG_CountdownTicker = DEBUG
+DEBUG_CountdownTicker_FULL = DEBUG_FULL
 
 DEBUG_ImageGenerationThread = DEBUG
 DEBUG_ImageGenerationThread_FULL = DEBUG_FULL
@@ -27,172 +38,159 @@ DEBUG_CameraCaptureThread_FULL = DEBUG_FULL
 DEBUG_ThreadShareImage = DEBUG
 DEBUG_ThreadShareImage_FULL = DEBUG_FULL
 
-class CountdownThread(QObject):
+class CountdownTicker(QObject):
+    """
+    Selfie countdown ticked by the GUI frame clock, on the GUI thread (there is no thread of its
+    own): shows start, start - 1, ... 0 a second apart in an OverlayCountdown, then calls the
+    callback one second after 0. Seconds are measured on the monotonic clock, so a late tick
+    never stretches the countdown.
+    """
     overlay_finished = Signal()
 
-    class Thread(QThread):
-        tick = Signal(int)
-        finished = Signal()
-
-        def __init__(self, start: int) -> None:
-            """
-            Initialize the countdown thread with a starting count.
-            """
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Entering __init__: args={{(start,)}}")
-            super().__init__()
-            self._start = start
-            self._running = True
-            self._finished_emitted = False
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Exiting __init__: return=None")
-
-        def run(self) -> None:
-            """
-            Run the countdown, emitting tick and finished signals.
-            """
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Entering run: args=()")
-            count = self._start
-            while self._running and count >= 0:
-                self.tick.emit(count)
-                time.sleep(1)
-                count -= 1
-            if self._running and not self._finished_emitted:
-                self._finished_emitted = True
-                self.finished.emit()
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Exiting run: return=None")
-
-        def stop(self) -> None:
-            """
-            Stop the countdown loop.
-            """
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Entering stop: args=()")
-            self._running = False
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][Thread] Exiting stop: return=None")
-
-    def __init__(self, parent: QObject = None, count: int = 0) -> None:
-        """
-        Initialize the CountdownThread with an optional parent and starting count.
-        """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering __init__: args={{(parent, count)}}")
+    def __init__(self, parent: QObject = None, count: int = 0, clock: Optional[FrameClock] = None) -> None:
+        """
+        Initialize the CountdownTicker with an optional parent, starting count and frame clock.
+        """
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering __init__: args={{(parent, count, clock)}}")
         super().__init__(parent)
         self._parent = parent
         self._count = count
-        self._thread = None
+        self._clock = clock
+        self._started_at = None
+        self._shown = None
         self._overlay = None
         self._user_callback = None
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting __init__: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting __init__: return=None")
+
+    @property
+    def clock(self) -> FrameClock:
+        return self._clock or FrameClock.get_instance()
 
     def start_countdown(self, count: int = None, on_finished: callable = None) -> None:
         """
-        Start the countdown with an optional count and callback for when finished.
+        Show the overlay and subscribe to the frame clock, with an optional count and a callback
+        for when finished. Returns at once; the countdown runs on the clock's ticks.
         """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering start_countdown: args={{(count, on_finished)}}")
-        if self._thread:
-            if DEBUG_CountdownThread: 
-                logger.info(f"[DEBUG][CountdownThread] Exiting start_countdown: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering start_countdown: args={{(count, on_finished)}}")
+        if self._started_at is not None:
+            if DEBUG_CountdownTicker: 
+                logger.info(f"[DEBUG][CountdownTicker] Exiting start_countdown: return=None")
             return
         if count is not None:
             self._count = count
         self._user_callback = on_finished
         self._overlay = OverlayCountdown(self._parent, start=self._count)
         self._overlay.show_overlay()
-        self._thread = self.Thread(self._count)
-        self._thread.tick.connect(self._on_tick)
-        self._thread.finished.connect(self._on_finish)
-        self._thread.start()
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting start_countdown: return=None")
+        self._started_at = time.monotonic()
+        self._shown = None
+        self.clock.subscribe(self._on_frame, PRIORITY_TIMING)
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting start_countdown: return=None")
+
+    def _on_frame(self, dt: float) -> None:
+        """
+        Frame clock tick: show the number of the current second, finish after the last one.
+        """
+        elapsed = time.monotonic() - self._started_at
+        second = int(elapsed)
+        if second > self._count:
+            self._on_finish()
+            return
+        if second != self._shown:
+            self._shown = second
+            self._on_tick(self._count - second)
+
+    def _stop(self) -> None:
+        """
+        Unsubscribe from the frame clock.
+        """
+        self.clock.unsubscribe(self._on_frame)
+        self._started_at = None
 
     def _on_tick(self, count: int) -> None:
         """
         Update the overlay with the current countdown number.
         """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering _on_tick: args={{(count,)}}")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering _on_tick: args={{(count,)}}")
         if self._overlay and getattr(self._overlay, '_is_alive', True):
             if hasattr(self._overlay, 'show_number'):
                 self._overlay.show_number(count)
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting _on_tick: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting _on_tick: return=None")
 
     def _on_finish(self) -> None:
         """
         Handle the end of the countdown, cleanup, and call the callback.
         """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering _on_finish: args=()")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering _on_finish: args=()")
         if self._overlay and getattr(self._overlay, '_is_alive', True):
             self._overlay.clean_overlay()
         self._overlay = None
-        if self._thread:
-            self._thread.stop()
-            self._thread.wait()
-            self._thread.deleteLater()
-            self._thread = None
+        if self._started_at is not None:
+            self._stop()
             self.overlay_finished.emit()
         if self._user_callback:
             self._user_callback()
             self._user_callback = None
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting _on_finish: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting _on_finish: return=None")
 
     def stop_countdown(self) -> None:
         """
-        Stop the countdown and remove the overlay.
+        Unsubscribe from the frame clock without calling the callback, and remove the overlay.
         """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering stop_countdown: args=()")
-        if self._thread:
-            self._thread.stop()
-            self._thread.wait()
-            self._thread.deleteLater()
-            self._thread = None
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering stop_countdown: args=()")
+        self._stop()
         if self._overlay and getattr(self._overlay, '_is_alive', True):
             self._overlay.clean_overlay()
         self._overlay = None
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting stop_countdown: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting stop_countdown: return=None")
 
     def clear_overlay(self, reason: object = None) -> None:
         """
         Forcefully clear the overlay, optionally providing a reason.
         """
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Entering clear_overlay: args={{(reason,)}}")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Entering clear_overlay: args={{(reason,)}}")
         if self._overlay:
             try:
                 self._overlay.blockSignals(True)
-                if hasattr(self._overlay, '_anim_timer'):
-                    self._overlay._anim_timer.stop()
-                    self._overlay._anim_timer.timeout.disconnect()
             except Exception:
                 pass
             self._overlay.clean_overlay()
         self._overlay = None
-        if DEBUG_CountdownThread: 
-            logger.info(f"[DEBUG][CountdownThread] Exiting clear_overlay: return=None")
+        if DEBUG_CountdownTicker: 
+            logger.info(f"[DEBUG][CountdownTicker] Exiting clear_overlay: return=None")
 
 class ImageGenerationThread(QObject):
     finished = Signal(object)
 
-    def __init__(self, style: object, input_image: QImage, api: ImageGeneratorAPIWrapper, parent: QObject = None) -> None:
+    def __init__(
+        self,
+        style: object,
+        input_image: QImage,
+        api: ImageGeneratorAPIWrapper,
+        parent: QObject = None,
+        job: Optional[SpeculativeJob] = None
+    ) -> None:
         """
         Initialize the ImageGenerationThread with style, input image, and optional parent.
+        When job is given, its speculative render is awaited instead of submitting a new one.
         """
         if DEBUG_ImageGenerationThread: 
-            logger.info(f"[DEBUG][ImageGenerationThread] Entering __init__: args={{(style, input_image, parent)}}")
+            logger.info(f"[DEBUG][ImageGenerationThread] Entering __init__: args={{(style, input_image, parent, job)}}")
         super().__init__(parent)
         self.style = style
         self.input_image = input_image
-        self.api = api
+        self.job = job
+        self.api = job.wrapper if job is not None else api
         self._running = True
         self._thread = None
         self._worker = None
@@ -226,6 +224,11 @@ class ImageGenerationThread(QObject):
             except Exception:
                 pass
             self.api.progress_changed.connect(self._on_progress_changed)
+            try:
+                self.api.preview_changed.disconnect()
+            except Exception:
+                pass
+            self.api.preview_changed.connect(self._on_preview_changed)
             self._loading_overlay.show()
             self._loading_overlay.raise_()
         if DEBUG_ImageGenerationThread: 
@@ -243,6 +246,21 @@ class ImageGenerationThread(QObject):
         if DEBUG_ImageGenerationThread:
             logger.info(f"[DEBUG][ImageGenerationThread] Exiting _on_progress_changed: return=None")
 
+    def _on_preview_changed(self, qimg: QImage) -> None:
+        """
+        Show a live sampler preview in the loading overlay or as the window background.
+        """
+        if DEBUG_ImageGenerationThread_FULL:
+            logger.info(f"[DEBUG][ImageGenerationThread] Entering _on_preview_changed: args={{(qimg,)}}")
+        if PREVIEW_MODE == 'background':
+            background_manager = getattr(self.parent(), 'background_manager', None)
+            if background_manager is not None:
+                background_manager.set_generated(qimg)
+        elif self._loading_overlay is not None:
+            self._loading_overlay.set_preview(qimg)
+        if DEBUG_ImageGenerationThread_FULL:
+            logger.info(f"[DEBUG][ImageGenerationThread] Exiting _on_preview_changed: return=None")
+
     def hide_loading(self) -> None:
         """
         Hide and delete the loading overlay.
@@ -319,17 +337,18 @@ class ImageGenerationThread(QObject):
         class ImageGenerationWorker(QObject):
             finished = Signal(object)
 
-            def __init__(self, api: ImageGeneratorAPIWrapper, style: any, input_image: QImage):
+            def __init__(self, api: ImageGeneratorAPIWrapper, style: any, input_image: QImage, job: Optional[SpeculativeJob] = None):
                 """
                 Inputs:
-                    api (ImageGeneratorAPIWrapper), style (any), input_image (QImage)
+                    api (ImageGeneratorAPIWrapper), style (any), input_image (QImage), job (SpeculativeJob or None)
                 Outputs: initializes worker
                 """
-                if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Entering __init__: args={{(api, style, input_image)}}")
+                if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Entering __init__: args={{(api, style, input_image, job)}}")
                 super().__init__()
                 self.api = api
                 self.style = style
                 self.input_image = input_image
+                self.job = job
                 self._running = True
                 if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Exiting __init__: return=None")
 
@@ -340,13 +359,18 @@ class ImageGenerationThread(QObject):
                 """
                 if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Entering run: args=()")
                 try:
-                    self.api.set_style(self.style)
-                    if not self._running:
-                        self.finished.emit(None)
-                        if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Exiting run: return=None")
-                        return
-                    self.api.set_img(self.input_image)
-                    self.api.generate_image()
+                    if self.job is not None:
+                        self.job.wait()
+                    else:
+                        self.api.set_style(self.style)
+                        # set_img starts a new job and forgets earlier cancels: check for a stop
+                        # only after it, a stop() landing later cancels the generation itself
+                        self.api.set_img(self.input_image)
+                        if not self._running:
+                            self.finished.emit(None)
+                            if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Exiting run: return=None")
+                            return
+                        self.api.generate_image()
                     if not self._running:
                         self.finished.emit(None)
                         if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Exiting run: return=None")
@@ -367,6 +391,13 @@ class ImageGenerationThread(QObject):
                         self.api.delete_input_and_output_images()
                     else:
                         self.api.move_output_image()
+                except GenerationCancelledError:
+                    if DEBUG_ImageGenerationThread:
+                        logger.info(f"[DEBUG][ImageGenerationWorker] Generation cancelled.")
+                    self.finished.emit(None)
+                except GenerationTimeoutError as e:
+                    logger.info(f"[ImageGenerationWorker] Generation stage '{e.stage}' timed out, falling back to input image.")
+                    self.finished.emit(self.input_image)
                 except Exception as e:
                     if DEBUG_ImageGenerationThread:
                         logger.info(f"[DEBUG][ImageGenerationWorker] Exception: {e}")
@@ -380,9 +411,14 @@ class ImageGenerationThread(QObject):
                 """
                 if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Entering stop: args=()")
                 self._running = False
+                if self.job is not None:
+                    # Discarding the job also stops a render it has not submitted yet
+                    self.job.cancel()
+                else:
+                    self.api.cancel()
                 if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationWorker] Exiting stop: return=None")
 
-        self._worker = ImageGenerationWorker(self.api, self.style, self.input_image)
+        self._worker = ImageGenerationWorker(self.api, self.style, self.input_image, self.job)
         self._worker.moveToThread(self._thread)
         self._worker.finished.connect(self._on_worker_finished)
         self._thread.started.connect(self._worker.run)
@@ -420,6 +456,8 @@ class ImageGenerationThread(QObject):
         """
         if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationThread] Entering stop: args=()")
         self._running = False
+        if self._worker:
+            self._worker.stop()
         if self._thread:
             if self._thread.isRunning():
                 self._thread.quit()
@@ -433,7 +471,12 @@ class ImageGenerationThread(QObject):
         if DEBUG_ImageGenerationThread: logger.info(f"[DEBUG][ImageGenerationThread] Exiting stop: return=None")
 
 class CameraCaptureThread(QThread):
-    frame_ready = Signal(QImage)
+    """
+    Camera capture loop. Live frames are fitted to the view (rotated, scaled and cropped) and
+    left in `mailbox` for the GUI frame clock to pull (latest frame wins); full-resolution
+    stills are delivered by still_ready.
+    """
+    still_ready = Signal(QImage)
     RESOLUTIONS = {0: (640, 480), 1: (1280, 720), 2: (1920, 1080), 3: (2560, 1440)}
 
     def __init__(self, camera_id: int = 0, parent: QObject = None) -> None:
@@ -447,6 +490,23 @@ class CameraCaptureThread(QThread):
         self._running = True
         self.cap = None
         self.current_res = 0
+        self.frame_buffer = FrameBuffer()
+        self.frame_pool = FramePool()
+        self.mailbox = FrameMailbox(self.frame_pool)
+        self.fitter = FrameFitter()
+        # Camera frames as decoded, in two buffers: the capture reads into one while the
+        # other, the latest, can be copied by latest_frame()
+        self._frames = [None, None]
+        self._latest = 0
+        self._frame_lock = threading.Lock()
+        # False while nobody shows the live view: frames are then only grabbed, not decoded
+        self._live_view = True
+        self._still_requested = False
+        # Mode (size, pixel format, fps) per resolution level, from the startup probe
+        self.modes = {}
+        self._mode_dirty = False
+        self._last_frame_at = 0.0
+        self._last_timestamp = 0.0
         
         self.set_resolution_level(0)
         if DEBUG_CameraCaptureThread: 
@@ -454,7 +514,7 @@ class CameraCaptureThread(QThread):
 
     def set_capture_interval(self, interval_ms: int) -> None:
         """
-        Dynamically change the capture interval in milliseconds.
+        Dynamically change the minimum interval between frames in milliseconds.
         """
 
         if DEBUG_CameraCaptureThread:
@@ -482,10 +542,8 @@ class CameraCaptureThread(QThread):
             logger.info(f"[DEBUG][CameraCaptureThread] Entering set_resolution_level: args={{(level,)}}")
         if level in self.RESOLUTIONS:
             self.current_res = level
-            if self.cap and self.cap.isOpened():
-                w, h = self.RESOLUTIONS[level]
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+            # Applied by the capture loop, so the camera is never reconfigured during a read
+            self._mode_dirty = True
         if DEBUG_CameraCaptureThread: 
             logger.info(f"[DEBUG][CameraCaptureThread] Exiting set_resolution_level: return=None")
 
@@ -501,24 +559,165 @@ class CameraCaptureThread(QThread):
             if DEBUG_CameraCaptureThread: 
                 logger.info(f"[DEBUG][CameraCaptureThread] Exiting run: return=None")
             return
-        self.set_resolution_level(self.current_res)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, CAMERA_BUFFER_SIZE)
+        if CAMERA_PROBE_ENABLED:
+            self.modes = negotiate_modes(self.cap, self.camera_id, self.RESOLUTIONS)
+        self._apply_mode()
         if DEBUG_CameraCaptureThread:
             logger.info(f"[DEBUG][CameraCaptureThread] Camera opened with resolution {self.RESOLUTIONS[self.current_res]} at id={self.camera_id}")
         
         if not hasattr(self, 'capture_interval_ms'):
             self.capture_interval_ms = 10
         while self._running:
-            ret, frame = self.cap.read()
+            if self._mode_dirty:
+                self._apply_mode()
+            if self._still_requested:
+                self._still_requested = False
+                self._grab_still()
+                continue
+            slot = self.frame_pool.acquire() if self._live_view else None
+            if slot is None and not self.frame_buffer.armed:
+                # Live view paused, or every view buffer still being drawn: skip this frame without decoding it
+                self.cap.grab()
+                self._pace()
+                continue
+            index = 1 - self._latest
+            buf = self._frames[index]
+            ret, frame = self.cap.read(buf) if buf is not None else self.cap.read()
             if ret and frame is not None:
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb.shape
-                qimg = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888).copy()
-                self.frame_ready.emit(qimg)
-            self.msleep(self.capture_interval_ms)
+                self._frames[index] = frame
+                with self._frame_lock:
+                    self._latest = index
+                if self.frame_buffer.armed:
+                    # Kept past the next read into this buffer
+                    self.frame_buffer.push(frame, self._to_qimage(frame))
+                if slot is not None:
+                    self._post_view(frame, slot)
+            elif slot is not None:
+                self.frame_pool.release(slot)
+            self._pace()
         self.cap.release()
         if DEBUG_CameraCaptureThread:
             logger.info(f"[DEBUG][CameraCaptureThread] Exiting run: return=None")
 
+    def _apply_mode(self) -> None:
+        """
+        Configure the camera for the current resolution level, with the probed mode when known.
+        """
+        self._mode_dirty = False
+        mode = self.modes.get(self.current_res)
+        if mode:
+            apply_mode(self.cap, mode['width'], mode['height'], mode['fourcc'], round(mode['fps']))
+        else:
+            apply_mode(self.cap, *self.RESOLUTIONS[self.current_res])
+        if DEBUG_CameraCaptureThread:
+            logger.info(f"[DEBUG][CameraCaptureThread] Mode for level {self.current_res}: {mode or self.RESOLUTIONS[self.current_res]}")
+
+    def _pace(self) -> None:
+        """
+        Wait before the next read only when needed: read() already blocks until the camera
+        delivers, so this sleeps just to keep the minimum capture interval, or to follow the
+        frame timestamps of sources that do not block (video files).
+        """
+        now = time.monotonic()
+        since_last = now - self._last_frame_at
+        wait = self.capture_interval_ms / 1000.0 - since_last
+        timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if 0 < self._last_timestamp < timestamp:
+            wait = max(wait, min(0.1, (timestamp - self._last_timestamp) / 1000.0 - since_last))
+        self._last_timestamp = timestamp
+        if wait > 0:
+            self.msleep(int(wait * 1000))
+        self._last_frame_at = time.monotonic()
+
+    def _post_view(self, frame, slot: int) -> None:
+        """
+        Fit frame to the view into the buffer of pool slot and post it to the mailbox.
+        """
+        buf = self.frame_pool.buffer(slot)
+        view = self.fitter.fit(frame, buf)
+        if view is None:
+            # No view geometry yet
+            self.frame_pool.release(slot)
+            return
+        if view is not buf:
+            self.frame_pool.adopt(slot, view)
+        h, w = view.shape[:2]
+        self.mailbox.post(QImage(view.data, w, h, view.strides[0], QImage.Format_BGR888), slot)
+
+    def set_live_view(self, enabled: bool) -> None:
+        """
+        Produce live view frames or not; the camera keeps running for stills and captures.
+        """
+        if enabled != self._live_view and DEBUG_CameraCaptureThread:
+            logger.info(f"[DEBUG][CameraCaptureThread] Live view {'resumed' if enabled else 'paused'}")
+        self._live_view = enabled
+
+    def set_view(self, width: int, height: int, rotation: int = 0) -> None:
+        """
+        Set the geometry and clockwise rotation live frames are fitted to.
+        """
+        self.fitter.set_view(width, height, rotation)
+
+    def latest_frame(self) -> Optional[QImage]:
+        """
+        Copy of the latest camera frame as decoded (full size, not rotated), None before the first one.
+        """
+        with self._frame_lock:
+            frame = self._frames[self._latest]
+            return self._to_qimage(frame) if frame is not None else None
+
+    def release_frame(self, slot: int) -> None:
+        """
+        Give back the buffer of a frame taken from the mailbox.
+        """
+        self.frame_pool.release(slot)
+
+    @staticmethod
+    def _to_qimage(frame) -> QImage:
+        """
+        Wrap a BGR camera frame in a QImage owning a copy of its pixels.
+        """
+        h, w = frame.shape[:2]
+        return QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888).copy()
+
+    def request_still(self) -> None:
+        """
+        Ask the capture loop for a full-resolution still, delivered by still_ready.
+        """
+        if DEBUG_CameraCaptureThread:
+            logger.info(f"[DEBUG][CameraCaptureThread] Entering request_still: args=()")
+        self._still_requested = True
+
+    def _grab_still(self) -> None:
+        """
+        Switch to CAMERA_STILL_LEVEL, grab a short burst, emit the best frame of it and go
+        back to the preview resolution.
+        """
+        preview_level = self.current_res
+        started = time.monotonic()
+        self.set_resolution_level(CAMERA_STILL_LEVEL)
+        self._apply_mode()
+        for _ in range(CAMERA_STILL_WARMUP_FRAMES):
+            self.cap.read()
+        burst = CAMERA_STILL_BURST if self.frame_buffer.armed else 1
+        still = None
+        for _ in range(burst):
+            ret, frame = self.cap.read()
+            if ret and frame is not None:
+                still = self._to_qimage(frame)
+                self.frame_buffer.push(frame, still, still=True)
+        if still is not None and self.frame_buffer.armed:
+            still = self.frame_buffer.select_best(still_only=True) or still
+        self.set_resolution_level(preview_level)
+        self._apply_mode()
+        if still is not None:
+            logger.info(f"[Camera] Still {still.width()}x{still.height()} grabbed in {(time.monotonic() - started) * 1000:.0f} ms")
+        else:
+            logger.info(f"[Camera] Still capture failed, keeping the preview frame")
+        # A null image tells the receiver to fall back to the preview frame
+        self.still_ready.emit(still if still is not None else QImage())
+
     def stop(self) -> None:
         """
         Stop the camera capture and wait for the thread to finish.
@@ -1,95 +1,21 @@
 from typing import Optional, Callable
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QStackedWidget, QApplication
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt
 from PySide6.QtGui import QResizeEvent
 from gui_classes.gui_window.main_window import MainWindow
 from gui_classes.gui_window.sleepscreen_window import SleepScreenWindow
 from gui_classes.gui_object.scroll_widget import ScrollOverlay
+from gui_classes.gui_manager.frame_clock import FrameClock, PRIORITY_VIEW
 
 import logging
 logger = logging.getLogger(__name__)
 
 from constant import DEBUG, DEBUG_FULL
 
-DEBUG_TimerUpdateDisplay: bool = DEBUG
-DEBUG_TimerUpdateDisplay_FULL: bool = DEBUG_FULL
 DEBUG_WindowManager: bool = DEBUG
 DEBUG_WindowManager_FULL: bool = DEBUG_FULL
 
-class TimerUpdateDisplay:
-    def __init__(self, window_manager: QWidget, fps: int = 60) -> None:
-        """
-        Initialize the TimerUpdateDisplay with a window manager and frames per second.
-        """
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Entering __init__: args={{'window_manager':{window_manager!r}, 'fps':{fps!r}}}")
-        self.window_manager: QWidget = window_manager
-        interval_ms: int = int(1000 / fps) if fps > 0 else 1000 // 60
-        self._timer: QTimer = QTimer(self.window_manager)
-        self._timer.setInterval(interval_ms)
-        self._timer.timeout.connect(self.update_frame)
-        self._timer.start()
-        self._fps: int = fps if fps > 0 else 60
-        self._subscribers = []  
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Exiting __init__: return=None")
-
-    def subscribe(self, func: Callable[[], None]) -> None:
-        """
-        Subscribe a callback function to be called on each timer tick.
-        """
-        if func not in self._subscribers:
-            self._subscribers.append(func)
-            if DEBUG_TimerUpdateDisplay:
-                logger.info(f"[DEBUG][TimerUpdateDisplay] Subscribed: {func}")
-
-    def unsubscribe(self, func: Callable[[], None]) -> None:
-        """
-        Unsubscribe a previously subscribed callback function.
-        """
-        if func in self._subscribers:
-            self._subscribers.remove(func)
-            if DEBUG_TimerUpdateDisplay:
-                logger.info(f"[DEBUG][TimerUpdateDisplay] Unsubscribed: {func}")
-
-    def set_fps(self, fps: int) -> None:
-        """
-        Set the frames per second for the timer.
-        """
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Entering set_fps: args={{'fps':{fps!r}}}")
-        fps_value: int = fps if fps > 0 else 60
-        interval_ms: int = int(1000 / fps_value)
-        self._timer.setInterval(interval_ms)
-        self._fps = fps_value
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Exiting set_fps: return=None")
-
-    def get_fps(self) -> int:
-        """
-        Get the current frames per second value.
-        """
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Entering get_fps: args={{}}")
-        result: int = self._fps
-        if DEBUG_TimerUpdateDisplay:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Exiting get_fps: return={result!r}")
-        return result
-
-    def update_frame(self) -> None:
-        """
-        Call all subscribed callback functions for each timer tick.
-        """
-        if DEBUG_TimerUpdateDisplay_FULL:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Entering update_frame: args={{}}")
-        for func in self._subscribers:
-            try:
-                func()
-            except Exception as e:
-                if DEBUG_TimerUpdateDisplay_FULL:
-                    logger.info(f"[DEBUG][TimerUpdateDisplay] Exception in subscriber {func}: {e}")
-        if DEBUG_TimerUpdateDisplay_FULL:
-            logger.info(f"[DEBUG][TimerUpdateDisplay] Exiting update_frame: return=None")
+from constant import FRAME_CLOCK_IDLE_FPS, FRAME_CLOCK_ANIMATION_FPS
 
 class WindowManager(QWidget):
     def __init__(self) -> None:
@@ -119,10 +45,11 @@ class WindowManager(QWidget):
         self._pending_index: Optional[int] = None
         self.scroll_overlay: ScrollOverlay = ScrollOverlay(self)
         self.scroll_overlay.hide_overlay()
-        self.display_timer: TimerUpdateDisplay = TimerUpdateDisplay(self, fps=20)
+        self.frame_clock: FrameClock = FrameClock.get_instance()
+        self.frame_clock.set_fps(FRAME_CLOCK_IDLE_FPS)
         
         if hasattr(self, 'scroll_overlay') and hasattr(self.scroll_overlay, 'update_frame'):
-            self.display_timer.subscribe(self.scroll_overlay.update_frame)
+            self.frame_clock.subscribe(self.scroll_overlay.update_frame, PRIORITY_VIEW)
         self.set_view(0)
         self.scroll_overlay.lower_overlay(on_lowered=lambda: self.scroll_overlay.show_overlay())
 
@@ -171,11 +98,12 @@ class WindowManager(QWidget):
             logger.info(f"[DEBUG][WindowManager] Entering transition_window: args={{'index':{index!r}}}")
         current_index = self.stack.currentIndex()
         if index != current_index:
+            self.frame_clock.log_stats()
             new_widget = self.widgets[index]
             if hasattr(new_widget, 'preset'):
                 if DEBUG_WindowManager:
                     logger.info(f"[DEBUG][WindowManager] Calling preset on {type(new_widget).__name__}")
-                new_widget.preset()
+                new_widget.preset(self.frame_clock)
             current_widget = self.stack.currentWidget()
             if hasattr(current_widget, 'on_leave'):
                 if DEBUG_WindowManager:
@@ -208,7 +136,7 @@ class WindowManager(QWidget):
         if index == 1:
             if DEBUG_WindowManager:
                 logger.info(f"[DEBUG][WindowManager] scroll_animation: index==1, starting scroll animation with stop_speed=30")
-            self.display_timer.set_fps(80)
+            self.frame_clock.set_fps(FRAME_CLOCK_ANIMATION_FPS)
             self.scroll_overlay.start_scroll_animation(
                 stop_speed=30,
                 on_finished=lambda: self.scroll_overlay.hide_overlay(
@@ -216,7 +144,7 @@ class WindowManager(QWidget):
                         on_cleaned=lambda: (
                             callback() if callback else None,
                             
-                            self.display_timer.unsubscribe(self.scroll_overlay.update_frame) if hasattr(self.display_timer, 'unsubscribe') and hasattr(self.scroll_overlay, 'update_frame') else None
+                            self.frame_clock.unsubscribe(self.scroll_overlay.update_frame) if hasattr(self.scroll_overlay, 'update_frame') else None
                         )
                     )
                 )
@@ -229,13 +157,13 @@ class WindowManager(QWidget):
             if DEBUG_WindowManager:
                 logger.info(f"[DEBUG][WindowManager] scroll_animation: index==0, restart scroll animation")
                 
-            if hasattr(self.display_timer, 'subscribe') and hasattr(self.scroll_overlay, 'update_frame'):
-                self.display_timer.subscribe(self.scroll_overlay.update_frame)
+            if hasattr(self.scroll_overlay, 'update_frame'):
+                self.frame_clock.subscribe(self.scroll_overlay.update_frame, PRIORITY_VIEW)
             self.scroll_overlay.restart_scroll_animation(
                 start_speed=30,
                 on_finished=lambda: (
                     (callback() if callback else None),
-                    self.display_timer.set_fps(20)
+                    self.frame_clock.set_fps(FRAME_CLOCK_IDLE_FPS)
                 )
             )
         if DEBUG_WindowManager:
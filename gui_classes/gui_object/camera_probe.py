@@ -0,0 +1,157 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_CameraProbe = DEBUG
+DEBUG_CameraProbe_FULL = DEBUG_FULL
+
+from constant import (
+    CAMERA_PROBE_FOURCCS, CAMERA_PROBE_FRAMES, CAMERA_PROBE_MAX_SECONDS, CAMERA_PROBE_REQUEST_FPS,
+    CAMERA_MJPEG_MIN_GAIN, CAMERA_MODES_CACHE_PATH
+)
+
+
+def fourcc_to_str(value: float) -> str:
+    """
+    Decode a CAP_PROP_FOURCC value ('' when the backend does not report one).
+    """
+    code = int(value)
+    if code <= 0:
+        return ''
+    return ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip('\x00')
+
+
+def device_key(cap: "cv2.VideoCapture", camera_id: object) -> str:
+    """
+    Cache key of an opened camera: capture backend and device id.
+    """
+    try:
+        backend = cap.getBackendName()
+    except cv2.error:
+        backend = 'unknown'
+    return f"{backend}:{camera_id}"
+
+
+def apply_mode(cap: "cv2.VideoCapture", width: int, height: int, fourcc: str = '', fps: float = 0) -> None:
+    """
+    Ask the camera for a mode; the pixel format goes first, most drivers pick the sizes per format.
+    """
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+
+
+def measure_fps(cap: "cv2.VideoCapture", frames: int = CAMERA_PROBE_FRAMES, max_seconds: float = CAMERA_PROBE_MAX_SECONDS) -> float:
+    """
+    Frames per second the camera really delivers, after two frames to settle the new mode.
+    """
+    for _ in range(2):
+        cap.grab()
+    started = time.monotonic()
+    count = 0
+    while count < frames and time.monotonic() - started < max_seconds:
+        if not cap.grab():
+            break
+        count += 1
+    elapsed = time.monotonic() - started
+    return count / elapsed if count and elapsed > 0 else 0.0
+
+
+def probe_modes(cap: "cv2.VideoCapture", resolutions: Dict[int, Tuple[int, int]]) -> List[dict]:
+    """
+    Try every resolution with every pixel format of CAMERA_PROBE_FOURCCS and return the modes
+    the camera accepted, with the size it really delivers and the measured frame rate.
+    """
+    modes = []
+    for level, (width, height) in sorted(resolutions.items()):
+        for fourcc in CAMERA_PROBE_FOURCCS:
+            apply_mode(cap, width, height, fourcc, CAMERA_PROBE_REQUEST_FPS)
+            actual = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            got_fourcc = fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))
+            fps = measure_fps(cap)
+            mode = {
+                'level': level, 'width': actual[0], 'height': actual[1],
+                'fourcc': got_fourcc or fourcc, 'requested_fourcc': fourcc, 'fps': round(fps, 1),
+            }
+            if DEBUG_CameraProbe:
+                logger.info(f"[DEBUG][CameraProbe] {width}x{height} {fourcc}: got {mode}")
+            if fps > 0 and actual == (width, height):
+                modes.append(mode)
+    return modes
+
+
+def choose_modes(modes: List[dict]) -> Dict[int, dict]:
+    """
+    Mode per resolution level: the uncompressed format, unless MJPEG is at least
+    CAMERA_MJPEG_MIN_GAIN times faster (USB bandwidth often caps uncompressed formats).
+    """
+    by_level: Dict[int, List[dict]] = {}
+    for mode in modes:
+        by_level.setdefault(mode['level'], []).append(mode)
+    chosen: Dict[int, dict] = {}
+    for level, candidates in by_level.items():
+        mjpeg = next((m for m in candidates if m['requested_fourcc'] == 'MJPG'), None)
+        other = next((m for m in candidates if m['requested_fourcc'] != 'MJPG'), None)
+        if other is None or (mjpeg is not None and mjpeg['fps'] >= other['fps'] * CAMERA_MJPEG_MIN_GAIN):
+            chosen[level] = mjpeg
+        else:
+            chosen[level] = other
+    return chosen
+
+
+def load_cached_modes(key: str, path: str = CAMERA_MODES_CACHE_PATH) -> Optional[Dict[int, dict]]:
+    """
+    Modes chosen for device key by an earlier probe, None when it was never probed.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+    if not entry:
+        return None
+    return {int(level): mode for level, mode in entry.get('chosen', {}).items()}
+
+
+def save_cached_modes(key: str, modes: List[dict], chosen: Dict[int, dict], path: str = CAMERA_MODES_CACHE_PATH) -> None:
+    """
+    Store the probed and chosen modes of device key.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[key] = {'modes': modes, 'chosen': {str(level): mode for level, mode in chosen.items()}}
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+    except OSError as e:
+        logger.info(f"[CameraProbe] Could not write {path}: {e}")
+
+
+def negotiate_modes(cap: "cv2.VideoCapture", camera_id: object, resolutions: Dict[int, Tuple[int, int]]) -> Dict[int, dict]:
+    """
+    Modes to use per resolution level for this camera, probed once and then read from the cache.
+    """
+    key = device_key(cap, camera_id)
+    chosen = load_cached_modes(key)
+    if chosen is not None:
+        logger.info(f"[CameraProbe] Using cached modes for {key}")
+        return chosen
+    started = time.monotonic()
+    modes = probe_modes(cap, resolutions)
+    chosen = choose_modes(modes)
+    save_cached_modes(key, modes, chosen)
+    summary = ', '.join(f"{m['width']}x{m['height']} {m['fourcc']} {m['fps']} fps" for _, m in sorted(chosen.items()))
+    logger.info(f"[CameraProbe] Probed {key} in {time.monotonic() - started:.1f}s: {summary or 'no mode'}")
+    return chosen
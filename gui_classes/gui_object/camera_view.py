@@ -0,0 +1,122 @@
+from typing import Optional
+
+from PySide6.QtCore import Qt, QRect, QSize
+from PySide6.QtGui import QPainter, QPixmap, QPaintEvent, QResizeEvent
+from PySide6.QtWidgets import QWidget
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_CameraView = DEBUG
+DEBUG_CameraView_FULL = DEBUG_FULL
+
+
+class CameraView(QWidget):
+    """
+    Background view of the camera, the captured photo or the generated image. Keeps the
+    latest picture and draws it in paintEvent from a source rect (crop) to a target rect
+    (scale), with the gradient overlay drawn in the same pass. Repaints only when the
+    picture, the gradient or the geometry changes.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        """
+        Initialize an empty, black view.
+        """
+        if DEBUG_CameraView:
+            logger.info(f"[DEBUG][CameraView] Entering __init__: args=({parent!r})")
+        super().__init__(parent)
+        # Every pixel is painted, nothing behind the view needs drawing
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WA_NoSystemBackground)
+        self._pixmap: Optional[QPixmap] = None
+        self._source = QRect()
+        self._target: Optional[QRect] = None
+        self._gradient: Optional[QPixmap] = None
+        self._gradient_scaled: Optional[QPixmap] = None
+        self._show_gradient = True
+        if DEBUG_CameraView:
+            logger.info(f"[DEBUG][CameraView] Exiting __init__: return=None")
+
+    def pixmap(self) -> Optional[QPixmap]:
+        """
+        Return the picture currently shown, None when the view is empty.
+        """
+        return self._pixmap
+
+    def show_pixmap(self, pixmap: QPixmap, source: Optional[QRect] = None, target: Optional[QRect] = None) -> None:
+        """
+        Show the source rect of pixmap (all of it by default) in the target rect of the view
+        (all of it by default, following resizes); the rest of the view is black.
+        """
+        if DEBUG_CameraView_FULL:
+            logger.info(f"[DEBUG][CameraView] Entering show_pixmap: args=({pixmap!r}, {source}, {target})")
+        self._pixmap = pixmap
+        self._source = QRect(source) if source is not None else pixmap.rect()
+        self._target = QRect(target) if target is not None else None
+        self.update()
+
+    def clear(self) -> None:
+        """
+        Show nothing but black.
+        """
+        self._pixmap = None
+        self.update()
+
+    def set_gradient(self, pixmap: Optional[QPixmap]) -> None:
+        """
+        Set the gradient drawn over the picture, stretched to the view.
+        """
+        self._gradient = pixmap if pixmap is not None and not pixmap.isNull() else None
+        self._gradient_scaled = None
+        self.update()
+
+    def show_gradient(self, show: bool) -> None:
+        """
+        Show or hide the gradient overlay.
+        """
+        if show != self._show_gradient:
+            self._show_gradient = show
+            self.update()
+
+    def _scaled_gradient(self, size: QSize) -> Optional[QPixmap]:
+        """
+        Gradient stretched to size, scaled again only when the size changes.
+        """
+        if self._gradient is None:
+            return None
+        if self._gradient_scaled is None or self._gradient_scaled.size() != size:
+            self._gradient_scaled = self._gradient.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        return self._gradient_scaled
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        """
+        Drop the scaled gradient, it is scaled again on the next paint.
+        """
+        self._gradient_scaled = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        """
+        Draw the picture and the gradient over it, within the region to repaint.
+        """
+        painter = QPainter(self)
+        if not painter.isActive():
+            return
+        rect = self.rect()
+        target = self._target if self._target is not None else rect
+        if self._pixmap is None or self._pixmap.isNull():
+            painter.fillRect(rect, Qt.black)
+        else:
+            if target != rect:
+                # Letterboxed picture
+                painter.fillRect(rect, Qt.black)
+            if target.size() != self._source.size():
+                painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawPixmap(target, self._pixmap, self._source)
+        if self._show_gradient:
+            gradient = self._scaled_gradient(rect.size())
+            if gradient is not None:
+                painter.drawPixmap(0, 0, gradient)
+        painter.end()
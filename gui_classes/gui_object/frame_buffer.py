@@ -0,0 +1,213 @@
+import collections
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QImage
+
+from comfy_classes.comfy_class_face import FaceDetector
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_FrameBuffer = DEBUG
+DEBUG_FrameBuffer_FULL = DEBUG_FULL
+
+from constant import BEST_FRAME_BUFFER_SIZE, BEST_FRAME_SCORE_SIDE, BEST_FRAME_BUDGET_MS, BEST_FRAME_WEIGHTS
+
+# Faces are located at half the scoring resolution, and are at least this fraction of its short side
+LOCATE_MIN_FACE = 1 / 8
+
+
+class FrameBuffer:
+    """
+    Ring buffer of the last camera frames, filled while armed (during the countdown),
+    from which the capture picks the best frame instead of the last one.
+
+    Faces are located by a background thread while the countdown runs, so the capture
+    itself only scores sharpness and open eyes inside the face, well within a frame time.
+    """
+
+    def __init__(
+        self,
+        size: int = BEST_FRAME_BUFFER_SIZE,
+        score_side: int = BEST_FRAME_SCORE_SIDE,
+        detector: Optional[FaceDetector] = None
+    ) -> None:
+        """
+        Initialize an empty, disarmed buffer.
+        """
+        # Entries are [qimg, gray, face, still] with face None (not located yet), () (no face)
+        # or (x, y, w, h), and still True for full-resolution stills
+        self._frames = collections.deque(maxlen=max(1, size))
+        self._score_side = score_side
+        self._detector = detector
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._armed = False
+        self._rotation = 0
+        self._session = 0
+        self._locator: Optional[threading.Thread] = None
+
+    @property
+    def armed(self) -> bool:
+        return self._armed
+
+    @property
+    def detector(self) -> FaceDetector:
+        return self._detector or FaceDetector.get_instance()
+
+    def arm(self, rotation: int = 0) -> None:
+        """
+        Start keeping frames. rotation (clockwise degrees) is the one applied to the capture,
+        so faces are upright for the detector.
+        """
+        if DEBUG_FrameBuffer:
+            logger.info(f"[DEBUG][FrameBuffer] Entering arm: args=({rotation})")
+        with self._lock:
+            self._frames.clear()
+            self._rotation = rotation
+            self._armed = True
+            self._session += 1
+            session = self._session
+        self._locator = threading.Thread(target=self._locate_faces, args=(session,), name="FrameBufferFaces", daemon=True)
+        self._locator.start()
+        if DEBUG_FrameBuffer:
+            logger.info(f"[DEBUG][FrameBuffer] Exiting arm: return=None")
+
+    def disarm(self) -> None:
+        """
+        Stop keeping frames and drop the buffered ones.
+        """
+        with self._lock:
+            self._armed = False
+            self._frames.clear()
+        self._new_frame.set()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """
+        Disarm and wait for the face locating thread to finish.
+        """
+        self.disarm()
+        locator = self._locator
+        if locator is not None and locator.is_alive():
+            locator.join(timeout)
+
+    def push(self, frame: np.ndarray, qimg: QImage, still: bool = False) -> None:
+        """
+        Called by the camera thread for every frame: keep qimg with a small upright grayscale
+        copy of the BGR frame for scoring. Does nothing when the buffer is not armed.
+        """
+        if not self._armed:
+            return
+        h, w = frame.shape[:2]
+        scale = min(1.0, self._score_side / max(w, h))
+        small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        k = -(self._rotation // 90) % 4
+        if k:
+            gray = np.ascontiguousarray(np.rot90(gray, k))
+        with self._lock:
+            if self._armed:
+                self._frames.append([qimg, gray, None, still])
+        self._new_frame.set()
+
+    def _locate_faces(self, session: int) -> None:
+        """
+        Background thread: locate the face in the newest frame not looked at yet, until disarmed.
+        """
+        detector = self.detector
+        detector.warm_up()
+        while True:
+            self._new_frame.wait(0.5)
+            self._new_frame.clear()
+            with self._lock:
+                if not self._armed or self._session != session:
+                    return
+                entry = next((e for e in reversed(self._frames) if e[2] is None), None)
+            if entry is None:
+                continue
+            entry[2] = self._locate(entry[1], detector)
+
+    @staticmethod
+    def _locate(gray: np.ndarray, detector: FaceDetector) -> tuple:
+        """
+        Largest face (x, y, w, h) of gray, () when there is none.
+        """
+        half = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        faces = detector.detect_gray(half, min_size=max(20, round(min(half.shape) * LOCATE_MIN_FACE)))
+        if not faces:
+            return ()
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return (2 * x, 2 * y, 2 * w, 2 * h)
+
+    def select_best(self, still_only: bool = False) -> Optional[QImage]:
+        """
+        Return the best buffered frame, None when the buffer is empty. With still_only, only
+        stills are candidates; the preview frames still lend them the face they located.
+        """
+        with self._lock:
+            frames = [list(e) for e in self._frames]
+        if not frames:
+            return None
+        started = time.perf_counter()
+        detector = self.detector
+        # A resolution change of another aspect ratio leaves frames of another size: keep the newest
+        shape = frames[-1][1].shape
+        frames = [e for e in frames if e[1].shape == shape]
+        if not any(e[2] for e in frames) and frames[-1][2] is None:
+            # Countdown shorter than the first face lookup
+            frames[-1][2] = self._locate(frames[-1][1], detector)
+        located = [i for i, e in enumerate(frames) if e[2]]
+        # Faces located on other frames are lent to the nearest frames not looked at yet
+        faces = [frames[min(located, key=lambda j: abs(j - i))][2] if e[2] is None and located else e[2] for i, e in enumerate(frames)]
+        if still_only and any(e[3] for e in frames):
+            faces = [f for f, e in zip(faces, frames) if e[3]]
+            frames = [e for e in frames if e[3]]
+            located = [i for i, f in enumerate(faces) if f]
+
+        # Sharpness (variance of the Laplacian) of every frame at once, inside the face region
+        # when there is one, on a subsampled whole frame otherwise
+        if located:
+            x0 = min(faces[i][0] for i in located)
+            y0 = min(faces[i][1] for i in located)
+            x1 = max(faces[i][0] + faces[i][2] for i in located)
+            y1 = max(faces[i][1] + faces[i][3] for i in located)
+            stack = np.stack([e[1][y0:y1, x0:x1] for e in frames]).astype(np.float32)
+        else:
+            stack = np.stack([e[1][::2, ::2] for e in frames]).astype(np.float32)
+        lap = (
+            stack[:, :-2, 1:-1] + stack[:, 2:, 1:-1] + stack[:, 1:-1, :-2] + stack[:, 1:-1, 2:]
+            - 4.0 * stack[:, 1:-1, 1:-1]
+        )
+        sharpness = lap.var(axis=(1, 2))
+        order = [int(i) for i in np.argsort(-sharpness)]
+        if not located:
+            best = order[0]
+        else:
+            max_sharp = float(sharpness.max()) or 1.0
+            max_area = max(f[2] * f[3] for f in faces if f) or 1
+            # Eyes on the sharpest frames first, within the time budget
+            deadline = started + BEST_FRAME_BUDGET_MS / 1000.0
+            scores: List[Tuple[float, int]] = []
+            for n, i in enumerate(order):
+                if n and time.perf_counter() > deadline:
+                    break
+                face = faces[i]
+                eyes = detector.count_eyes(frames[i][1], face) if face else 0
+                scores.append((
+                    BEST_FRAME_WEIGHTS["sharpness"] * float(sharpness[i]) / max_sharp
+                    + BEST_FRAME_WEIGHTS["face"] * (face[2] * face[3] / max_area if face else 0.0)
+                    + BEST_FRAME_WEIGHTS["eyes"] * eyes / 2.0,
+                    i
+                ))
+            best = max(scores)[1]
+        if DEBUG_FrameBuffer:
+            logger.info(
+                f"[DEBUG][FrameBuffer] Picked frame {best + 1}/{len(frames)} "
+                f"({len(located)} located) in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        return frames[best][0]
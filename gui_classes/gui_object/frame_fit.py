@@ -0,0 +1,93 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_FrameFitter = DEBUG
+DEBUG_FrameFitter_FULL = DEBUG_FULL
+
+# Clockwise rotations, as QTransform().rotate() applies them on screen
+ROTATE_CODES = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+
+class FrameFitter:
+    """
+    Turns camera frames into display-ready ones in the capture thread: rotated, scaled to the
+    height of the view and centre-cropped to its width (letterboxed when narrower), the way
+    the live background shows them, so the GUI thread only has to blit the result.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize a fitter without a view; fit() returns None until set_view() is called.
+        """
+        self._view: Tuple[int, int, int] = (0, 0, 0)
+        # Scaled frame before rotation, reused while the geometry does not change
+        self._scaled: Optional[np.ndarray] = None
+
+    @property
+    def view(self) -> Tuple[int, int, int]:
+        return self._view
+
+    def set_view(self, width: int, height: int, rotation: int = 0) -> None:
+        """
+        Set the target geometry (width, height) and the clockwise rotation (0, 90, 180, 270).
+        Called from the GUI thread; the next fitted frame uses it.
+        """
+        view = (int(width), int(height), int(rotation) % 360)
+        if view != self._view:
+            if DEBUG_FrameFitter:
+                logger.info(f"[DEBUG][FrameFitter] View set to {view[0]}x{view[1]}, rotation {view[2]}")
+            self._view = view
+
+    def fit(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Fit a BGR frame to the view, into out when it has the view's shape (a new array
+        otherwise). Returns None when no view is set.
+        """
+        width, height, rotation = self._view
+        if width < 1 or height < 1:
+            return None
+        h, w = frame.shape[:2]
+        transposed = rotation in (90, 270)
+        ow, oh = (h, w) if transposed else (w, h)
+        factor = height / oh
+        nw = max(1, round(ow * factor))
+        if out is None or out.shape != (height, width, 3):
+            out = np.empty((height, width, 3), np.uint8)
+        if nw >= width:
+            # Crop before scaling; a centred crop is the same whichever way the frame turns
+            crop = min(ow, max(1, round(width / factor)))
+            start = (ow - crop) // 2
+            src = frame[start:start + crop] if transposed else frame[:, start:start + crop]
+            return self._scale_rotate(src, width, height, rotation, factor, out)
+        x = (width - nw) // 2
+        out[:, :x] = 0
+        out[:, x + nw:] = 0
+        out[:, x:x + nw] = self._scale_rotate(frame, nw, height, rotation, factor)
+        return out
+
+    def _scale_rotate(
+        self,
+        src: np.ndarray,
+        width: int,
+        height: int,
+        rotation: int,
+        factor: float,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Scale src so that, once rotated, it is width x height, and rotate it into out.
+        """
+        interpolation = cv2.INTER_AREA if factor < 1.0 else cv2.INTER_LINEAR
+        code = ROTATE_CODES.get(rotation)
+        if code is None:
+            return cv2.resize(src, (width, height), dst=out, interpolation=interpolation)
+        size = (height, width) if rotation in (90, 270) else (width, height)
+        scratch = self._scaled if self._scaled is not None and self._scaled.shape[1::-1] == size else None
+        self._scaled = cv2.resize(src, size, dst=scratch, interpolation=interpolation)
+        return cv2.rotate(self._scaled, code, dst=out)
@@ -0,0 +1,127 @@
+import collections
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PySide6.QtGui import QImage
+
+import logging
+logger = logging.getLogger(__name__)
+
+from constant import DEBUG, DEBUG_FULL
+DEBUG_FramePool = DEBUG
+DEBUG_FramePool_FULL = DEBUG_FULL
+
+from constant import CAMERA_FRAME_POOL_SIZE
+
+
+class FramePool:
+    """
+    Fixed set of reusable live view buffers. The camera thread fits each frame into a free
+    buffer and lends it, by slot number, to the consumer of the frame, which must give it
+    back with release() once it has copied what it needs. When every buffer is lent the
+    camera drops frames instead of allocating more, so a slow consumer only sees fresh frames.
+    """
+
+    def __init__(self, size: int = CAMERA_FRAME_POOL_SIZE) -> None:
+        """
+        Initialize the pool; buffers are allocated by the first frames, at the camera's size.
+        """
+        self._buffers: List[Optional[np.ndarray]] = [None] * max(1, size)
+        self._free = collections.deque(range(len(self._buffers)))
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def acquire(self) -> Optional[int]:
+        """
+        Take a free slot, None when every buffer is lent.
+        """
+        with self._lock:
+            if not self._free:
+                self.dropped += 1
+                if DEBUG_FramePool_FULL:
+                    logger.info(f"[DEBUG][FramePool] No free buffer, frame dropped ({self.dropped} so far)")
+                return None
+            return self._free.popleft()
+
+    def buffer(self, slot: int) -> Optional[np.ndarray]:
+        """
+        Buffer of slot, None before its first frame.
+        """
+        return self._buffers[slot]
+
+    def adopt(self, slot: int, frame: np.ndarray) -> None:
+        """
+        Make frame the buffer of slot, when a new one had to be allocated
+        (first frame, or a change of the view geometry).
+        """
+        if DEBUG_FramePool:
+            logger.info(f"[DEBUG][FramePool] Slot {slot} now holds a {frame.shape[1]}x{frame.shape[0]} buffer")
+        self._buffers[slot] = frame
+
+    def release(self, slot: int) -> None:
+        """
+        Give slot back to the pool.
+        """
+        with self._lock:
+            if slot not in self._free:
+                self._free.append(slot)
+
+
+class FrameMailbox:
+    """
+    Single-slot, latest-frame-wins handoff from the camera thread to the GUI frame clock.
+    Posting over a frame that was not taken yet gives its buffer back to the pool, so a
+    stalled GUI thread never finds more than one frame waiting.
+    """
+
+    def __init__(self, pool: FramePool) -> None:
+        """
+        Initialize an empty mailbox returning overwritten frames to pool.
+        """
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._item: Optional[Tuple[QImage, int]] = None
+        self.posted = 0
+        self.dropped = 0
+        self.taken = 0
+
+    def post(self, qimg: QImage, slot: int) -> None:
+        """
+        Camera side: leave qimg (a view over pool slot) as the latest frame.
+        """
+        with self._lock:
+            previous, self._item = self._item, (qimg, slot)
+            self.posted += 1
+            if previous is not None:
+                self.dropped += 1
+        if previous is not None:
+            self._pool.release(previous[1])
+
+    def take(self) -> Optional[Tuple[QImage, int]]:
+        """
+        GUI side: the latest frame and its slot, None when nothing new arrived. The caller
+        gives the slot back to the pool once it has copied the frame.
+        """
+        with self._lock:
+            item, self._item = self._item, None
+            if item is not None:
+                self.taken += 1
+        return item
+
+    def clear(self) -> None:
+        """
+        Drop the waiting frame, if any.
+        """
+        with self._lock:
+            item, self._item = self._item, None
+        if item is not None:
+            self._pool.release(item[1])
+
+    def stats(self) -> dict:
+        """
+        Frame counters: posted by the camera, taken by the GUI, dropped for a newer one,
+        and dropped by the camera for lack of a free buffer.
+        """
+        with self._lock:
+            return {'posted': self.posted, 'taken': self.taken, 'dropped': self.dropped, 'no_buffer': self._pool.dropped}
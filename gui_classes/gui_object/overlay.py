@@ -12,6 +12,7 @@ from constant import TITLE_LABEL_STYLE, GRID_WIDTH, COUNTDOWN_FONT_STYLE,OVERLAY
 from gui_classes.gui_object.btn import Btns
 from gui_classes.gui_object.toolbox import normalize_btn_name, LoadingBar
 from gui_classes.gui_manager.language_manager import language_manager
+from gui_classes.gui_manager.frame_clock import FrameClock, PRIORITY_VIEW
 import os
 
 import logging
@@ -38,6 +39,9 @@ DEBUG_OverlayCountdown_FULL = DEBUG_FULL
 DEBUG_OverlayLang = DEBUG
 DEBUG_OverlayLang_FULL = DEBUG_FULL
 
+# Seconds a countdown number stays on screen
+COUNTDOWN_NUMBER_SECONDS = 0.5
+
 class Overlay(QWidget):
     def __init__(self, parent: QWidget = None, center_on_screen: bool = True) -> None:
         """
@@ -443,6 +447,12 @@ class OverlayLoading(OverlayWhite):
         self._overlay_layout.setContentsMargins(0, 0, 0, 0)
         self._overlay_layout.setSpacing(20)
         self._loading_bar = LoadingBar(width_percent, height_percent, border_thickness, parent=self)
+        self._preview_width_percent = width_percent
+
+        self._preview_label = QLabel("", self._overlay_widget)
+        self._preview_label.setAlignment(Qt.AlignCenter)
+        self._preview_label.setStyleSheet("background: transparent;")
+        self._preview_label.hide()
 
         self._title_label = QLabel("", self._overlay_widget)
         self._title_label.setStyleSheet(OVERLAY_LOADING_TITLE_STYLE)
@@ -453,6 +463,7 @@ class OverlayLoading(OverlayWhite):
         self._msg_label.setAlignment(Qt.AlignCenter)
 
         self._overlay_layout.addStretch(1) 
+        self._overlay_layout.addWidget(self._preview_label, alignment=Qt.AlignCenter)
         self._overlay_layout.addWidget(self._title_label, alignment=Qt.AlignCenter)
         self._overlay_layout.addWidget(self._loading_bar, alignment=Qt.AlignCenter)
         self._overlay_layout.addWidget(self._msg_label, alignment=Qt.AlignCenter)
@@ -579,6 +590,23 @@ class OverlayLoading(OverlayWhite):
         if DEBUG_OverlayLoading: 
             logger.info(f"[DEBUG][OverlayLoading] Exiting set_percent: return=None")
 
+    def set_preview(self, qimg: QImage) -> None:
+        """
+        Show the latest sampler preview above the loading bar.
+        """
+        if DEBUG_OverlayLoading_FULL:
+            logger.info(f"[DEBUG][OverlayLoading] Entering set_preview: args={(qimg,)}")
+        if qimg is None or qimg.isNull():
+            return
+        max_w = int(self.width() * self._preview_width_percent)
+        max_h = int(self.height() * 0.55)
+        pix = QPixmap.fromImage(qimg).scaled(max_w, max_h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._preview_label.setPixmap(pix)
+        if not self._preview_label.isVisible():
+            self._preview_label.show()
+        if DEBUG_OverlayLoading_FULL:
+            logger.info(f"[DEBUG][OverlayLoading] Exiting set_preview: return=None")
+
 class OverlayRules(OverlayWhite):
     def __init__(
         self,
@@ -981,9 +1009,8 @@ class OverlayCountdown(Overlay):
         layout.setSpacing(0)
         layout.addWidget(self._overlay_widget)
         self.setLayout(layout)
-        self._anim_timer = QTimer(self)
-        self._anim_timer.setSingleShot(True)
-        self._anim_timer.timeout.connect(self._hide_number)
+        # Age of the number shown, advanced by the frame clock; None when no number is shown
+        self._number_age = None
         self.showFullScreen()
         screen = QApplication.primaryScreen()
         if screen:
@@ -1030,9 +1057,29 @@ class OverlayCountdown(Overlay):
         opacity = 0.65 if value > 0 else 1.0
         self._overlay_widget.setStyleSheet(f"background-color: rgba(255,255,255,{int(opacity*255)});")
         self._label.setVisible(True)
-        self._anim_timer.start(500)
+        self._number_age = 0.0
+        FrameClock.get_instance().subscribe(self._on_frame, PRIORITY_VIEW)
         if DEBUG_OverlayCountdown: logger.info(f"[DEBUG][OverlayCountdown] Exiting show_number: return=None")
 
+    def _on_frame(self, dt: float) -> None:
+        """
+        Frame clock tick: hide the number once it has been shown long enough.
+        """
+        if self._number_age is None:
+            self._stop_number()
+            return
+        self._number_age += dt
+        if self._number_age >= COUNTDOWN_NUMBER_SECONDS:
+            self._stop_number()
+            self._hide_number()
+
+    def _stop_number(self) -> None:
+        """
+        Stop ageing the number shown.
+        """
+        self._number_age = None
+        FrameClock.get_instance().unsubscribe(self._on_frame)
+
     def _hide_number(self) -> None:
         """
         Hide the countdown number from the overlay.
@@ -1057,17 +1104,17 @@ class OverlayCountdown(Overlay):
         Clean up and remove the countdown overlay from the UI.
         """
         if DEBUG_OverlayCountdown: logger.info(f"[DEBUG][OverlayCountdown] Entering clean_overlay: args=()")
-        self._anim_timer.stop()
+        self._stop_number()
         super().clean_overlay()
         if DEBUG_OverlayCountdown: logger.info(f"[DEBUG][OverlayCountdown] Exiting clean_overlay: return=None")
 
 
     def hide_overlay(self) -> None:
         """
-        Hide the countdown overlay and stop the animation timer.
+        Hide the countdown overlay and stop ageing its number.
         """
         if DEBUG_OverlayCountdown: logger.info(f"[DEBUG][OverlayCountdown] Entering hide_overlay: args=()")
-        self._anim_timer.stop()
+        self._stop_number()
         super().hide_overlay()
         if DEBUG_OverlayCountdown: logger.info(f"[DEBUG][OverlayCountdown] Exiting hide_overlay: return=None")
 
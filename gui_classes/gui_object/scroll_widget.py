@@ -30,6 +30,8 @@ DEBUG_InfiniteScrollWidget_FULL = DEBUG_FULL
 DEBUG_ScrollOverlay = DEBUG
 DEBUG_ScrollOverlay_FULL = DEBUG_FULL
 
+from constant import FRAME_CLOCK_ANIMATION_FPS
+
 
 
 def get_monitor_for_widget(widget: QWidget) -> object:
@@ -517,24 +519,26 @@ class InfiniteScrollView(QGraphicsView):
         if DEBUG_InfiniteScrollView:
             logger.info(f"[DEBUG][InfiniteScrollView] Exiting start: return=None")
 
-    def update_frame(self) -> None:
+    def update_frame(self, dt: Optional[float] = None) -> None:
         """
-        Update the current animation frame.
+        Update the current animation frame. Speeds are in pixels per frame, at fps when idle
+        and at FRAME_CLOCK_ANIMATION_FPS while starting or stopping; with dt (seconds since
+        the previous frame) the step follows the time elapsed, without it it is one frame.
         """
         if DEBUG_InfiniteScrollView_FULL:        
-            logger.info(f"[DEBUG][InfiniteScrollView] Entering update_frame: args={{}}")
+            logger.info(f"[DEBUG][InfiniteScrollView] Entering update_frame: args={{'dt':{dt}}}")
         if self._stopping:
-            self._on_stop_frame()
+            self._on_stop_frame(1.0 if dt is None else dt * FRAME_CLOCK_ANIMATION_FPS)
         elif self._starting:
-            self._on_start_frame()
+            self._on_start_frame(1.0 if dt is None else dt * FRAME_CLOCK_ANIMATION_FPS)
         else:
-            self._on_frame()
+            self._on_frame(1.0 if dt is None else dt * self.fps)
         if DEBUG_InfiniteScrollView_FULL:
             logger.info(f"[DEBUG][InfiniteScrollView] Exiting update_frame: return=None")
 
-    def _on_frame(self) -> None:
+    def _on_frame(self, frames: float = 1.0) -> None:
         """
-        Perform a single animation frame update.
+        Scroll by the given number of frames at the idle speed.
         """
         if DEBUG_InfiniteScrollView_FULL:
             logger.info(f"[DEBUG][InfiniteScrollView] Entering _on_frame: args={{}}")
@@ -543,7 +547,7 @@ class InfiniteScrollView(QGraphicsView):
                 logger.info(f"[DEBUG][InfiniteScrollView] Exiting _on_frame: return=None (no scroll_tab)")
             return
         for col in self.scroll_tab.columns:
-            col.scroll(self.speed, infinite=True)
+            col.scroll(self.speed * frames, infinite=True)
         if DEBUG_InfiniteScrollView_FULL:
             logger.info(f"[DEBUG][InfiniteScrollView] Exiting _on_frame: return=None")
 
@@ -571,9 +575,9 @@ class InfiniteScrollView(QGraphicsView):
         if DEBUG_InfiniteScrollView:
             logger.info(f"[DEBUG][InfiniteScrollView] Exiting _begin_start_animation: return=None")
 
-    def _on_stop_frame(self) -> None:
+    def _on_stop_frame(self, frames: float = 1.0) -> None:
         """
-        Handle a frame update during the stop animation.
+        Handle a frame update during the stop animation, scrolling by the given number of frames.
         """
         if DEBUG_InfiniteScrollView:
             logger.info(f"[DEBUG][InfiniteScrollView] Entering _on_stop_frame: args={{}}")
@@ -584,7 +588,7 @@ class InfiniteScrollView(QGraphicsView):
                 self._stop_callback()
             return
         for col in self.scroll_tab.columns:
-            col.scroll(self._stop_speed, infinite=False)
+            col.scroll(self._stop_speed * frames, infinite=False)
         if self.scroll_tab.get_remaining_images() == 0:
             self._stopping = False
             self._scene.clear()
@@ -593,15 +597,15 @@ class InfiniteScrollView(QGraphicsView):
         if DEBUG_InfiniteScrollView:
             logger.info(f"[DEBUG][InfiniteScrollView] Exiting _on_stop_frame: return=None")
 
-    def _on_start_frame(self) -> None:
+    def _on_start_frame(self, frames: float = 1.0) -> None:
         """
-        Handle a frame update during the start animation.
+        Handle a frame update during the start animation, scrolling by the given number of frames.
         """
         try:
             if DEBUG_InfiniteScrollView:
                 logger.info(f"[DEBUG][InfiniteScrollView] Entering _on_start_frame: args={{}}")
             for col in self.scroll_tab.columns:
-                col.scroll(self._start_speed, infinite=True)
+                col.scroll(self._start_speed * frames, infinite=True)
                 if  self.scroll_tab.get_endstart() and self._starting:
                     self._starting = False
                     if self._start_callback:
@@ -716,13 +720,13 @@ class InfiniteScrollWidget(QWidget):
         if DEBUG_InfiniteScrollWidget:
             logger.info(f"[DEBUG][InfiniteScrollWidget] Exiting __init__: return=None")
 
-    def update_frame(self) -> None:
+    def update_frame(self, dt: Optional[float] = None) -> None:
         """
-        Update the current animation frame in the underlying view.
+        Update the current animation frame in the underlying view, dt seconds after the previous one.
         """
         if DEBUG_InfiniteScrollWidget_FULL:
-            logger.info(f"[DEBUG][InfiniteScrollWidget] Entering update_frame: args={{}}")
-        self._view.update_frame()
+            logger.info(f"[DEBUG][InfiniteScrollWidget] Entering update_frame: args={{'dt':{dt}}}")
+        self._view.update_frame(dt)
         if DEBUG_InfiniteScrollWidget_FULL:
             logger.info(f"[DEBUG][InfiniteScrollWidget] Exiting update_frame: return=None")
 
@@ -1049,13 +1053,13 @@ class ScrollOverlay(QWidget):
             logger.info(f"[DEBUG][ScrollOverlay] Exiting show_overlay: return=None")
         self.update_frame()
 
-    def update_frame(self) -> None:
+    def update_frame(self, dt: Optional[float] = None) -> None:
         """
-        Update the current animation frame of the overlay and its
+        Update the current animation frame of the overlay, dt seconds after the previous one.
         """
         if DEBUG_ScrollOverlay_FULL:
-            logger.info(f"[DEBUG][ScrollOverlay] Entering update_frame: args={{}}")
+            logger.info(f"[DEBUG][ScrollOverlay] Entering update_frame: args={{'dt':{dt}}}")
         if self.scroll_widget:
-            self.scroll_widget.update_frame()
+            self.scroll_widget.update_frame(dt)
         if DEBUG_ScrollOverlay_FULL:
             logger.info(f"[DEBUG][ScrollOverlay] Exiting update_frame: return=None")
@@ -6,24 +6,31 @@ from constant import DEBUG, DEBUG_FULL
 DEBUG_MainWindow = DEBUG
 DEBUG_MainWindow_FULL = DEBUG_FULL
 
+import time
 from typing import Optional, Callable
 
 from PySide6.QtCore import Qt, QEvent
 from PySide6.QtGui import QPainter, QColor, QImage
-from PySide6.QtWidgets import QApplication, QLabel
+from PySide6.QtWidgets import QApplication
 
 from gui_classes.gui_window.base_window import BaseWindow
-from constant import HOTSPOT_URL, TOOLTIP_STYLE, TOOLTIP_DURATION_MS, SLEEP_TIMER_SECONDS_QRCODE_OVERLAY, MAIN_WINDOW_MSG_STYLE
+from constant import HOTSPOT_URL, TOOLTIP_STYLE, TOOLTIP_DURATION_MS, SLEEP_TIMER_SECONDS_QRCODE_OVERLAY, MAIN_WINDOW_MSG_STYLE, FACE_GATE_ENABLED
 from prompts import dico_styles
-from gui_classes.gui_manager.thread_manager import CountdownThread, ImageGenerationThread
+from gui_classes.gui_manager.thread_manager import CountdownTicker, ImageGenerationThread
 from comfy_classes.comfy_class_API import ImageGeneratorAPIWrapper
+from comfy_classes.comfy_class_speculative import SpeculativeScheduler
+from comfy_classes.comfy_class_face import FaceDetector
 from gui_classes.gui_manager.standby_manager import StandbyManager
 from gui_classes.gui_manager.background_manager import BackgroundManager
+from gui_classes.gui_manager.frame_clock import FrameClock
+from gui_classes.gui_object.camera_view import CameraView
 from gui_classes.gui_object.overlay import OverlayRules, OverlayQrcode
 from gui_classes.gui_object.toolbox import QRCodeUtils
 from gui_classes.gui_manager.language_manager import language_manager
 from constant import ShareByHotspot
 
+# Layers update_frame() can mark dirty: the camera/photo background and the window widgets
+FRAME_LAYERS = ('background', 'window')
 
 class MainWindow(BaseWindow):
 
@@ -34,28 +41,32 @@ class MainWindow(BaseWindow):
         if DEBUG_MainWindow:
             logger.info(f"[DEBUG][MainWindow] Entering __init__: args={{'parent':{parent}}}")
         super().__init__(parent)
+        # update_frame() only marks layers dirty; they are rendered once on the next frame tick
+        self._dirty_layers = set()
+        self._frame_clock = None
+        self._frame_requests = 0
+        self._frame_renders = 0
         self._default_texts = language_manager.get_texts('main_window') or {}
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setStyleSheet("background: transparent;")
         self.setAutoFillBackground(False)
         self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
         self._default_background_color = QColor(0, 0, 0)
-        self.countdown_overlay_manager = CountdownThread(self, 5)
+        self.countdown_overlay_manager = CountdownTicker(self, 5)
         self._generation_task = None
         self._generation_in_progress = False
         self._countdown_callback_active = False
         self.api = ImageGeneratorAPIWrapper()
+        self.speculative = SpeculativeScheduler(self.api)
         self.standby_manager = StandbyManager(parent) if hasattr(parent, 'set_view') else None
         QApplication.instance().installEventFilter(self.standby_manager)
-        self.bg_label = QLabel(self)
-        self.bg_label.setAlignment(Qt.AlignCenter)
-        self.bg_label.setStyleSheet("background: black;")
-        self.bg_label.lower()
-        self.bg_label.setGeometry(0, 0, self.width(), self.height())
-        self.background_manager = BackgroundManager(self.bg_label)
+        self.camera_view = CameraView(self)
+        self.camera_view.lower()
+        self.camera_view.setGeometry(0, 0, self.width(), self.height())
+        self.background_manager = BackgroundManager(self.camera_view)
         if hasattr(self, 'overlay_widget'):
             self.overlay_widget.raise_()
-        self.bg_label.lower()
+        self.camera_view.lower()
         self.background_manager.update_background()
         self._texts = {}
         self.flag_show_generation = False
@@ -106,6 +117,8 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Entering on_leave: args={{}}")
         if hasattr(self, 'background_manager'):
             self.background_manager.on_leave()
+        self._frame_clock = None
+        logger.info(f"[MainWindow] Frame updates: {self._frame_requests} requested, {self._frame_renders} rendered")
         super().on_leave()
         self.cleanup()
         self.hide_loading()
@@ -145,7 +158,8 @@ class MainWindow(BaseWindow):
 
     def set_generation_style(self, checked: bool, style_name: str, generate_image: bool = False) -> None:
         """
-        Set the selected style for image generation and optionally generate an image.
+        Set the selected style for image generation, or with generate_image (the style row of
+        the validation state) switch the result to another style of the same capture.
         """
         self.update_frame()
         if DEBUG_MainWindow:
@@ -155,13 +169,15 @@ class MainWindow(BaseWindow):
                 logger.info(f"[DEBUG][MainWindow] Exiting set_generation_style: return=None")
             self.update_frame()
             return
-        if checked:
+        if generate_image:
+            # Unchecking the style shown keeps it: the result on screen is still of that style
+            if checked and self.original_photo and style_name != self.selected_style:
+                self.selected_style = style_name
+                self.generation(style_name, self.original_photo, callback=self.show_generation)
+        elif checked:
             self.selected_style = style_name
         else:
             self.selected_style = None
-        if generate_image:
-            if self.original_photo and self.selected_style:
-                self.start(self.selected_style, self.original_photo)
         if DEBUG_MainWindow:
             logger.info(f"[DEBUG][MainWindow] Exiting set_generation_style: return=None")
         self.update_frame()
@@ -206,6 +222,8 @@ class MainWindow(BaseWindow):
         self.update_frame()
         self.hide_header_label()
         self.btns.clear_style2_btns()
+        if hasattr(self, 'background_manager'):
+            self.background_manager.arm_capture()
         self.countdown_overlay_manager.start_countdown(on_finished=on_finished)
         self.update_frame()
         if DEBUG_MainWindow:
@@ -220,17 +238,28 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Entering selfie: args={{'callback':{callback}}}")
         self.cleanup()
         if hasattr(self, 'background_manager'):
-            self.background_manager.capture()
-            pixmap = self.background_manager.get_background_image()
+            self.background_manager.capture_still(on_ready=lambda: self._on_selfie_captured(callback))
+        elif not self._generation_in_progress and self.original_photo and callback:
+            callback()
+        if DEBUG_MainWindow:
+            logger.info(f"[DEBUG][MainWindow] Exiting selfie: return=None")
+        self.update_frame()
 
-            if pixmap is not None and not pixmap.isNull():
-                self.original_photo = pixmap.toImage()
-            else:
-                self.original_photo = None
+    def _on_selfie_captured(self, callback: Optional[Callable[[], None]] = None) -> None:
+        """
+        Keep the captured photo and call the callback when done.
+        """
+        if DEBUG_MainWindow:
+            logger.info(f"[DEBUG][MainWindow] Entering _on_selfie_captured: args={{'callback':{callback}}}")
+        pixmap = self.background_manager.get_background_image()
+        if pixmap is not None and not pixmap.isNull():
+            self.original_photo = pixmap.toImage()
+        else:
+            self.original_photo = None
         if not self._generation_in_progress and self.original_photo and callback:
             callback()
         if DEBUG_MainWindow:
-            logger.info(f"[DEBUG][MainWindow] Exiting selfie: return=None")
+            logger.info(f"[DEBUG][MainWindow] Exiting _on_selfie_captured: return=None")
         self.update_frame()
 
     def generation(self, style_name: str, input_image: QImage, callback: Optional[Callable[[], None]] = None) -> None:
@@ -242,16 +271,44 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Entering generation: args={{'style_name':{style_name},'input_image':<QImage>,'callback':{callback}}}")
         if self._generation_task:
             self.cleanup()
+        if not self.has_face(input_image):
+            self.set_state_default()
+            if hasattr(self, 'btns'):
+                retry_msg = self._texts.get("no_face", "No face detected, please try again")
+                self.show_message(self.btns.get_style1_btns(), retry_msg, TOOLTIP_DURATION_MS)
+            if DEBUG_MainWindow:
+                logger.info(f"[DEBUG][MainWindow] Exiting generation: return=None (no face)")
+            self.update_frame()
+            return
         self.hide_header_label()
 
-        self._generation_task = ImageGenerationThread(style=style_name, input_image=input_image, api=self.api, parent=self)
+        job = self.speculative.take(style_name, input_image)
+        self._generation_task = ImageGenerationThread(style=style_name, input_image=input_image, api=self.api, parent=self, job=job)
         if callback:
             self._generation_task.finished.connect(callback)
         self._generation_task.start()
+        self.speculative.record_request(style_name)
+        self.speculative.fill(input_image, style_name)
         if DEBUG_MainWindow:
             logger.info(f"[DEBUG][MainWindow] Exiting generation: return=None")
         self.update_frame()
 
+    def has_face(self, input_image: QImage) -> bool:
+        """
+        Fast CPU check that the capture shows a face, so empty frames are not sent to the GPU.
+        Lets the capture through when the gate is disabled or no detector is available.
+        """
+        if not FACE_GATE_ENABLED:
+            return True
+        detector = FaceDetector.get_instance()
+        if not detector.available:
+            return True
+        started = time.monotonic()
+        found = bool(detector.detect(input_image))
+        if not found:
+            logger.info(f"[MainWindow] No face in the capture, generation skipped ({(time.monotonic() - started) * 1000:.0f} ms).")
+        return found
+
     def show_generation(self, qimg: QImage) -> None:
         """
         Display the generated image and update the UI to validation state.
@@ -342,22 +399,11 @@ class MainWindow(BaseWindow):
             if DEBUG_MainWindow:
                 logger.info(f"[DEBUG][MainWindow] Entering _on_accept_close: args={{}}")
             self.flag_show_generation = not self.flag_show_generation
-            if self.flag_show_generation:
-                if DEBUG_MainWindow:
-                    logger.info("[DEBUG][MainWindow] Showing generated image.")
-                if hasattr(self, 'background_manager') and self.background_manager:
-                    self.background_manager.set_generated(self.generated_image)
-                    if DEBUG_MainWindow:
-                        logger.info("[DEBUG][MainWindow] Generated image set in background manager.")
-                self.update_frame()
-            else:
-                if DEBUG_MainWindow:
-                    logger.info("[DEBUG][MainWindow] Showing original image.")
-                if hasattr(self, 'background_manager') and self.background_manager:
-                    self.background_manager.set_generated(self.original_photo)
-                    if DEBUG_MainWindow:
-                        logger.info("[DEBUG][MainWindow] Original image set in background manager.")
-                self.update_frame()
+            if DEBUG_MainWindow:
+                shown = "generated" if self.flag_show_generation else "original"
+                logger.info(f"[DEBUG][MainWindow] Showing {shown} image.")
+            # flush_frame sets the image matching flag_show_generation
+            self.update_frame('background')
         else:
             self.set_state_default()
         if DEBUG_MainWindow:
@@ -373,6 +419,7 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Entering reset_generation_state: args={{}}")
         self._generation_in_progress = False
         self._generation_task = None
+        self.speculative.cancel_all()
         self.generated_image = None
         self.original_photo = None
         self.selected_style = None
@@ -408,10 +455,9 @@ class MainWindow(BaseWindow):
         )
 
         
-        self.bg_label.lower()
+        self.camera_view.lower()
         if hasattr(self, 'background_manager'):
             self.background_manager.set_live()
-            self.background_manager.update_background()
         if self.standby_manager:
             self.standby_manager.put_standby(True)
             self.standby_manager.set_timer_from_constant()
@@ -427,14 +473,25 @@ class MainWindow(BaseWindow):
         if DEBUG_MainWindow:
             logger.info(f"[DEBUG][MainWindow] Entering set_state_validation: args={{}}")
         self.hide_header_label()
-        self.setup_buttons_style_1(['accept', 'close','regenerate', 'view'], slot_style1=self._on_accept_close)
+        # The style row switches the result to another style of the same capture, which the
+        # speculative renders can serve at once
+        style2 = [
+            (name, f"style.{name}") for name in dico_styles.keys()
+        ]
+        self.setup_buttons(
+            style1_names=['accept', 'close', 'regenerate', 'view'],
+            style2_names=style2,
+            slot_style1=self._on_accept_close,
+            slot_style2=lambda checked, btn=None: self.set_generation_style(checked, btn.get_name(), generate_image=True)
+        )
         if hasattr(self, 'btns'):
             
             self.btns.raise_()
             for btn in self.btns.get_style1_btns():
                 btn.show()
                 btn.setEnabled(True)
-            self.btns.clear_style2_btns()            
+            for btn in self.btns.get_style2_btns():
+                btn.setChecked(btn.get_name() == self.selected_style)
         self.update_frame()
         if self.standby_manager:
             self.standby_manager.put_standby(False)
@@ -461,13 +518,31 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Exiting set_state_wait: return=None")
         self.update_frame()
 
-    def update_frame(self) -> None:
+    def update_frame(self, *layers: str) -> None:
         """
-        Update the background and UI frame.
+        Mark layers (all of FRAME_LAYERS by default) dirty. They are rendered once on the next
+        tick of the frame clock, however many times this is called before it; without a
+        request the clock does not tick for this window.
         """
         if DEBUG_MainWindow_FULL:
-            logger.info(f"[DEBUG][MainWindow] Entering update_frame: args={{}}")
-        if hasattr(self, 'background_manager') and self.background_manager:            
+            logger.info(f"[DEBUG][MainWindow] Entering update_frame: args={{'layers':{layers}}}")
+        self._dirty_layers.update(layers or FRAME_LAYERS)
+        self._frame_requests += 1
+        (self._frame_clock or FrameClock.get_instance()).request_frame(self.flush_frame)
+        if DEBUG_MainWindow_FULL:
+            logger.info(f"[DEBUG][MainWindow] Exiting update_frame: return=None")
+
+    def flush_frame(self, dt: float = 0.0) -> None:
+        """
+        Frame clock tick: render the layers marked dirty since the last tick, if any.
+        """
+        if not self._dirty_layers:
+            return
+        layers, self._dirty_layers = self._dirty_layers, set()
+        self._frame_renders += 1
+        if DEBUG_MainWindow_FULL:
+            logger.info(f"[DEBUG][MainWindow] Entering flush_frame: layers={sorted(layers)}")
+        if 'background' in layers and hasattr(self, 'background_manager') and self.background_manager:
             if hasattr(self, 'generated_image') and self.generated_image and not isinstance(self.generated_image, str):
                 if self.flag_show_generation:
                     self.background_manager.set_generated(self.generated_image)
@@ -476,10 +551,10 @@ class MainWindow(BaseWindow):
             elif hasattr(self, 'original_photo') and self.original_photo:
                 self.background_manager.capture(self.original_photo)
             self.background_manager.update_background()
-        if hasattr(self, 'update') and callable(self.update):
+        if 'window' in layers:
             self.update()
         if DEBUG_MainWindow_FULL:
-            logger.info(f"[DEBUG][MainWindow] Exiting update_frame: return=None")
+            logger.info(f"[DEBUG][MainWindow] Exiting flush_frame: return=None")
 
     def user_activity(self) -> None:
         """
@@ -499,13 +574,13 @@ class MainWindow(BaseWindow):
         if DEBUG_MainWindow_FULL:
             logger.info(f"[DEBUG][MainWindow] Entering resizeEvent: args={{'event':{event}}}")
         super().resizeEvent(event)
-        self.bg_label.setGeometry(0, 0, self.width(), self.height())
+        self.camera_view.setGeometry(0, 0, self.width(), self.height())
         if hasattr(self, 'overlay_widget'):
             self.overlay_widget.setGeometry(0, 0, self.width(), self.height())
             self.overlay_widget.raise_()
         if hasattr(self, 'btns') and self.btns is not None:
             self.btns.raise_()
-        self.bg_label.lower()
+        self.camera_view.lower()
         if DEBUG_MainWindow_FULL:
             logger.info(f"[DEBUG][MainWindow] Exiting resizeEvent: return=None")
 
@@ -517,6 +592,10 @@ class MainWindow(BaseWindow):
             logger.info(f"[DEBUG][MainWindow] Entering closeEvent: args={{'event':{event}}}")
         if hasattr(self, 'background_manager'):
             self.background_manager.close()
+        if hasattr(self, 'speculative'):
+            self.speculative.cancel_all()
+        if hasattr(self, 'api') and self.api:
+            self.api.close()
         super().closeEvent(event)
         if DEBUG_MainWindow_FULL:
             logger.info(f"[DEBUG][MainWindow] Exiting closeEvent: return=None")
@@ -539,14 +618,16 @@ class MainWindow(BaseWindow):
         if DEBUG_MainWindow_FULL:
             logger.info(f"[DEBUG][MainWindow] Exiting paintEvent: return=None")
 
-    def preset(self) -> None:
+    def preset(self, timer: object = None) -> None:
         """
-        Call the preset method on the background manager if present.
+        Call the preset method on the background manager if present, with the frame clock driving the live view and the renders.
         """
         if DEBUG_MainWindow:
-            logger.info(f"[DEBUG][MainWindow] Entering preset: args={{}}")
+            logger.info(f"[DEBUG][MainWindow] Entering preset: args={{'timer':{timer}}}")
             logger.info("[DEBUG][MainWindow] Calling preset on background_manager")
         if hasattr(self, 'background_manager'):
-            self.background_manager.preset()
+            self.background_manager.preset(timer)
+        if timer is not None:
+            self._frame_clock = timer
         if DEBUG_MainWindow:
             logger.info(f"[DEBUG][MainWindow] Exiting preset: return=None")
\ No newline at end of file